@@ -0,0 +1,324 @@
+"""Columnar store of older posts for vectorized, long-range analysis.
+
+Posts published before the hot window (ANALYTICS_HOT_DAYS) no longer
+change except through late arrivals and sentiment backfill, so
+compaction copies them, by publish month, into NumPy column files under
+ANALYTICS_DIR::
+
+    month=2024-01.g7/id.npy, published_at.npy, source.npy, ticker.npy,
+                     sentiment.npy, score.npy, representative.npy
+
+Columns are sorted by published_at and loaded memory-mapped, so a read
+touches only the pages of the months and rows it slices out. Sources and
+tickers are stored as small integer codes; manifest.json holds their
+dictionaries and, per month, its directory and the row count, highest
+post id and number of unscored posts it was written with. A month whose
+figures in SQLite have since changed is rewritten on the next compaction.
+Reads combine the compacted months with the posts after them, which are
+read from SQLite.
+
+Month directories are never modified: each compaction writes changed
+months into new directories tagged with its generation number, then
+replaces manifest.json atomically. A reader sees either the old manifest
+and the old directories, or the new manifest and the new ones. The
+previous generation's directories are deleted by the compaction after.
+
+Posts are not removed from SQLite: the store is a derived copy, and
+rebuilding it only takes deleting ANALYTICS_DIR.
+"""
+import copy
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import config
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 2
+
+COLUMNS = {
+    "id": np.int64,
+    "published_at": "datetime64[s]",
+    "source": np.uint8,
+    "ticker": np.uint16,
+    "sentiment": np.float32,
+    "score": np.float64,
+    "representative": np.bool_,
+}
+
+_SELECT = """SELECT id, published_at, source, ticker, CAST(sentiment AS REAL),
+                    score, cluster_id = id
+             FROM posts"""
+_FETCH_SIZE = 50_000
+
+
+def _empty_manifest() -> dict:
+    # Ticker code 0 is reserved for posts attributed to no ticker
+    return {
+        "version": FORMAT_VERSION, "generation": 0, "sources": [], "tickers": [None], "months": {},
+    }
+
+
+def load_manifest(directory=None) -> dict:
+    path = os.path.join(directory or config.ANALYTICS_DIR, MANIFEST)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return _empty_manifest()
+    if manifest.get("version") != FORMAT_VERSION:
+        logger.warning("Ignoring columnar store in an old format; run compaction to rebuild it.")
+        return _empty_manifest()
+    return manifest
+
+
+def _save_manifest(directory, manifest):
+    tmp = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def _month_bounds(month: str):
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _codes(values, dictionary: list) -> np.ndarray:
+    """Map values to their index in ``dictionary``, appending new ones."""
+    positions = {value: i for i, value in enumerate(dictionary)}
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = code
+    return codes
+
+
+def _write_month(conn, directory, month, rows, manifest) -> str:
+    """Write a month's columns into a new directory; returns its name."""
+    start, end = _month_bounds(month)
+    columns = {name: np.empty(rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+    cursor = conn.execute(
+        f"{_SELECT} WHERE published_at >= ? AND published_at < ? ORDER BY published_at, id",
+        (start, end),
+    )
+    filled = 0
+    while chunk := cursor.fetchmany(_FETCH_SIZE):
+        ids, published, sources, tickers, sentiments, scores, representative = zip(*chunk)
+        part = slice(filled, filled + len(chunk))
+        columns["id"][part] = ids
+        columns["published_at"][part] = np.asarray(published, dtype="datetime64[s]")
+        columns["source"][part] = _codes(sources, manifest["sources"])
+        columns["ticker"][part] = _codes(tickers, manifest["tickers"])
+        columns["sentiment"][part] = np.asarray(sentiments, dtype=float)
+        columns["score"][part] = np.asarray(scores, dtype=float)
+        columns["representative"][part] = representative
+        filled += len(chunk)
+    if filled != rows:
+        raise RuntimeError(f"month {month} changed while being compacted")
+
+    name = f"month={month}.g{manifest['generation']}"
+    staging = os.path.join(directory, f"{name}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for column, values in columns.items():
+        np.save(os.path.join(staging, f"{column}.npy"), values)
+    os.replace(staging, os.path.join(directory, name))
+    return name
+
+
+def _remove_unreferenced(directory, *manifests):
+    """Delete month directories that none of ``manifests`` refers to."""
+    keep = {entry["dir"] for manifest in manifests for entry in manifest["months"].values()}
+    for name in os.listdir(directory):
+        if name.startswith("month=") and name not in keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def compact(now=None, directory=None) -> dict:
+    """Write every month older than the hot window that changed since its last compaction.
+
+    Returns {"written": [months], "unchanged": count, "through": first day not compacted}.
+    """
+    directory = directory or config.ANALYTICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(directory)
+    manifest = copy.deepcopy(previous)
+    manifest["generation"] += 1
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    # Only whole months entirely before the hot window
+    through = (now - timedelta(days=config.ANALYTICS_HOT_DAYS)).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    # A longer hot window moves through back; months compacted past it are
+    # read from SQLite again, so they must leave the manifest
+    for month in [m for m in manifest["months"] if m >= through.strftime("%Y-%m")]:
+        del manifest["months"][month]
+
+    conn = get_connection()
+    written = []
+    try:
+        months = conn.execute(
+            """SELECT substr(published_at, 1, 7), COUNT(*), MAX(id), SUM(sentiment IS NULL)
+               FROM posts WHERE published_at < ? GROUP BY 1""",
+            (through.strftime("%Y-%m-%d %H:%M:%S"),),
+        ).fetchall()
+        for month, rows, max_id, unscored in months:
+            signature = {"rows": rows, "max_id": max_id, "unscored": unscored}
+            entry = manifest["months"].get(month, {})
+            if {key: entry.get(key) for key in signature} == signature:
+                continue
+            signature["dir"] = _write_month(conn, directory, month, rows, manifest)
+            manifest["months"][month] = signature
+            written.append(month)
+    finally:
+        conn.close()
+
+    manifest["through"] = through.strftime("%Y-%m-%d %H:%M:%S")
+    _save_manifest(directory, manifest)
+    # Readers may still be opening the directories of the manifest just
+    # replaced; anything older, and any failed write, can go
+    _remove_unreferenced(directory, previous, manifest)
+    logger.info(
+        "Compacted %d months (%d unchanged) through %s",
+        len(written), len(months) - len(written), manifest["through"],
+    )
+    return {"written": written, "unchanged": len(months) - len(written), "through": manifest["through"]}
+
+
+def _load_month(directory, entry) -> dict:
+    path = os.path.join(directory, entry["dir"])
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+
+
+def _recent(conn, since, until, manifest) -> dict:
+    conditions, params = [], []
+    for op, bound in ((">=", since), ("<", until)):
+        if bound is not None:
+            conditions.append(f"published_at {op} ?")
+            params.append(bound)
+    rows = conn.execute(
+        f"{_SELECT} WHERE {' AND '.join(conditions) or '1'} ORDER BY published_at, id", params
+    ).fetchall()
+    if not rows:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+    ids, published, sources, tickers, sentiments, scores, representative = zip(*rows)
+    return {
+        "id": np.asarray(ids, dtype=np.int64),
+        "published_at": np.asarray(published, dtype="datetime64[s]"),
+        "source": _codes(sources, manifest["sources"]).astype(np.uint8),
+        "ticker": _codes(tickers, manifest["tickers"]).astype(np.uint16),
+        "sentiment": np.asarray(sentiments, dtype=float).astype(np.float32),
+        "score": np.asarray(scores, dtype=float),
+        "representative": np.asarray(representative, dtype=bool),
+    }
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def read_posts(since=None, until=None, ticker=None, directory=None):
+    """Return (columns, manifest) for posts published in [since, until).
+
+    ``columns`` maps each name in COLUMNS to an array, sorted by publish
+    time; source and ticker are codes into manifest["sources"] and
+    manifest["tickers"]. Compacted months are read memory-mapped; posts
+    after them come from SQLite.
+
+    Compacted months are read as of their last compaction: a post that
+    arrives late for one of them, or is scored after it was compacted,
+    is left out until the next compaction rewrites that month.
+    """
+    directory = directory or config.ANALYTICS_DIR
+    since, until = _timestamp(since), _timestamp(until)
+    lower = np.datetime64(since) if since else None
+    upper = np.datetime64(until) if until else None
+
+    for attempt in range(2):
+        manifest = load_manifest(directory)
+        try:
+            parts = []
+            through = manifest.get("through")
+            for month in sorted(manifest["months"]):
+                start, end = _month_bounds(month)
+                if (since and end <= since) or (until and start >= until):
+                    continue
+                # Posts from through onwards are read from SQLite below
+                if through and start >= through:
+                    continue
+                columns = _load_month(directory, manifest["months"][month])
+                published = columns["published_at"]
+                lo = 0 if lower is None else np.searchsorted(published, lower, "left")
+                hi = len(published) if upper is None else np.searchsorted(published, upper, "left")
+                parts.append({name: values[lo:hi] for name, values in columns.items()})
+            break
+        except FileNotFoundError:
+            # Two compactions ran since the manifest was read; read the new one
+            if attempt:
+                raise
+
+    conn = get_connection()
+    try:
+        recent_since = max(filter(None, (since, through)), default=None)
+        if not (until and recent_since and recent_since >= until):
+            parts.append(_recent(conn, recent_since, until, manifest))
+    finally:
+        conn.close()
+
+    columns = {
+        name: np.concatenate([part[name] for part in parts]) if parts
+        else np.empty(0, dtype=dtype)
+        for name, dtype in COLUMNS.items()
+    }
+    if ticker is not None:
+        code = manifest["tickers"].index(ticker) if ticker in manifest["tickers"] else -1
+        mask = columns["ticker"] == code
+        columns = {name: values[mask] for name, values in columns.items()}
+    return columns, manifest
+
+
+def daily_series(since=None, until=None, ticker=None, directory=None) -> dict:
+    """Per-day sentiment sums for one ticker, as the daily_sentiment rollup keeps them.
+
+    Counts scored cluster representatives only, weighting Reddit posts by
+    upvotes. Returns arrays aligned on "day" (datetime64[D]): for each of
+    "reddit" and "news" (every other source), "<bucket>_sum",
+    "<bucket>_weight" and "<bucket>_count".
+    """
+    columns, manifest = read_posts(since, until, ticker or config.TICKERS[0], directory)
+    keep = columns["representative"] & ~np.isnan(columns["sentiment"])
+    published = columns["published_at"][keep]
+    sentiment = columns["sentiment"][keep].astype(np.float64)
+    source = columns["source"][keep]
+    score = columns["score"][keep]
+
+    reddit_code = manifest["sources"].index("reddit") if "reddit" in manifest["sources"] else -1
+    is_reddit = source == reddit_code
+    weight = np.where(is_reddit, np.maximum(np.nan_to_num(score, nan=1.0), 1.0), 1.0)
+
+    days, day_index = np.unique(published.astype("datetime64[D]"), return_inverse=True)
+    series = {"day": days}
+    for bucket, mask in (("reddit", is_reddit), ("news", ~is_reddit)):
+        index = day_index[mask]
+        series[f"{bucket}_sum"] = np.bincount(
+            index, weights=sentiment[mask] * weight[mask], minlength=len(days)
+        )
+        series[f"{bucket}_weight"] = np.bincount(index, weights=weight[mask], minlength=len(days))
+        series[f"{bucket}_count"] = np.bincount(index, minlength=len(days))
+    return series
@@ -0,0 +1,251 @@
+"""Read-only HTTP API over the collected data, for dashboards.
+
+``main.py --serve`` answers GET requests on API_HOST:API_PORT with JSON:
+
+    /api/posts?source=&ticker=&limit=            newest posts
+    /api/search?q=&source=&ticker=&since=&until=&limit=
+                                                 full-text search
+    /api/daily?ticker=&days=                     per-day sentiment and volume
+    /api/trend?ticker=&days=                     predict_trend's output
+    /api/charts/<sentiment|volume>.<png|svg|json>?ticker=&days=
+    /api/health
+
+The process opens the database read-only. Responses are kept in memory
+and reused until the data changes: before serving, PRAGMA data_version
+tells whether any other connection has committed, and only then is the
+newest post id and unscored post count compared with the cached
+responses'. A crawl or scoring pass therefore clears the cache, while
+repeated polls are answered without touching the tables. Responses carry
+an ETag, so unchanged ones cost pollers a 304.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "svg": "image/svg+xml",
+    "png": "image/png",
+}
+MAX_LIMIT = 500
+MAX_DAYS = 3650
+
+
+class BadRequest(Exception):
+    """A request parameter is missing or invalid."""
+
+
+class ResponseCache:
+    """Responses by request, dropped whenever posts are added or scored."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or config.API_CACHE_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._marker = None
+        # Bumped on every clear, so responses computed before it aren't stored after
+        self.generation = 0
+        self.hits = self.misses = 0
+
+    def _check(self):
+        # Called with the lock held
+        if self._conn is None:
+            # Held for the process's life, outside the pool
+            self._conn = db.get_connection()
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        marker = tuple(db.get_change_marker(self._conn))
+        if marker != self._marker:
+            self._marker = marker
+            self._entries.clear()
+            self.generation += 1
+
+    def get(self, key):
+        """Return (cached response or None, generation to pass to put())."""
+        with self._lock:
+            self._check()
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return response, self.generation
+
+    def put(self, key, response, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = response
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _param(params, name, default=None, kind=str, upper=None):
+    values = params.get(name)
+    if not values or values[0] == "":
+        return default
+    try:
+        value = kind(values[0])
+    except ValueError:
+        raise BadRequest(f"invalid {name}: {values[0]!r}")
+    if kind is int and not 1 <= value <= upper:
+        raise BadRequest(f"{name} must be between 1 and {upper}")
+    return value
+
+
+def _ticker(params):
+    return _param(params, "ticker", config.TICKERS[0], str.upper)
+
+
+def _json(value):
+    return "json", json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def posts(params):
+    rows = db.get_recent_posts(
+        source=_param(params, "source"),
+        ticker=_param(params, "ticker", kind=str.upper),
+        limit=_param(params, "limit", 20, int, MAX_LIMIT),
+    )
+    return _json([dict(row) for row in rows])
+
+
+def search(params):
+    query = _param(params, "q")
+    if not query:
+        raise BadRequest("q is required")
+    rows = db.search_posts(
+        query,
+        source=_param(params, "source"),
+        ticker=_param(params, "ticker", kind=str.upper),
+        since=_param(params, "since"),
+        until=_param(params, "until"),
+        limit=_param(params, "limit", 20, int, MAX_LIMIT),
+    )
+    return _json([dict(row) for row in rows])
+
+
+def daily(params):
+    from sentiment import get_daily_sentiment
+
+    return _json(get_daily_sentiment(_param(params, "days", 14, int, MAX_DAYS), _ticker(params)))
+
+
+def trend(params):
+    from sentiment import predict_trend
+
+    return _json(predict_trend(_param(params, "days", 14, int, MAX_DAYS), _ticker(params)))
+
+
+def chart(params, name):
+    import charts
+    from sentiment import get_daily_sentiment
+
+    kind, _, fmt = name.partition(".")
+    if kind not in ("sentiment", "volume") or fmt not in CONTENT_TYPES:
+        raise LookupError(name)
+    ticker = _ticker(params)
+    data = get_daily_sentiment(_param(params, "days", 14, int, MAX_DAYS), ticker)
+    if not data:
+        raise LookupError(f"no data for {ticker}")
+    with open(charts.chart_artifact(kind, data, fmt, ticker), "rb") as f:
+        return fmt, f.read()
+
+
+ROUTES = {
+    "/api/posts": posts,
+    "/api/search": search,
+    "/api/daily": daily,
+    "/api/trend": trend,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pollers reuse connections
+    # Headers and body are written separately; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/api/health":
+            self._send(200, *_json({"ok": True}))
+            return
+        params = parse_qs(url.query)
+        # Windows like "the last 14 days" move at midnight even if the data doesn't
+        today = datetime.utcnow().date()
+        key = (url.path, today, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        cache = self.server.cache
+        response, generation = cache.get(key)
+        if response is None:
+            try:
+                if url.path.startswith("/api/charts/"):
+                    fmt, body = chart(params, url.path[len("/api/charts/"):])
+                elif url.path in ROUTES:
+                    fmt, body = ROUTES[url.path](params)
+                else:
+                    raise LookupError(url.path)
+            except BadRequest as e:
+                self._send(400, *_json({"error": str(e)}))
+                return
+            except LookupError as e:
+                self._send(404, *_json({"error": f"not found: {e}"}))
+                return
+            except Exception:
+                logger.exception("API request %s failed", self.path)
+                self._send(500, *_json({"error": "internal error"}))
+                return
+            response = (fmt, body, '"%s"' % hashlib.sha1(body).hexdigest())
+            cache.put(key, response, generation)
+
+        fmt, body, etag = response
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, fmt, b"", etag)
+        else:
+            self._send(200, fmt, body, etag)
+
+    def _send(self, status, fmt, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPES[fmt])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("api %s", format % args)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        self.cache = ResponseCache()
+        super().__init__(address, _Handler)
+
+
+def serve(host=None, port=None):
+    """Serve the API until interrupted; the database must already be initialized."""
+    db.use_read_only_connections()
+    server = _Server((host or config.API_HOST, port or config.API_PORT))
+    logger.info("Serving the API on http://%s:%d/api/", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
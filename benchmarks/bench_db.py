@@ -0,0 +1,177 @@
+"""Compare the batched insert path against the original per-row one.
+
+Usage: python -m benchmarks.bench_db [--posts N] [--runs N]
+
+Each run inserts N synthetic posts into an empty database, then inserts
+the same posts again so the duplicate-skipping path is timed too. A
+second scenario times per-post ``insert_post`` calls, where the old path
+opened, committed and closed a connection for every row. The batched
+path also tags posts and assigns near-duplicate clusters, which the
+original did not; both index posts for full-text search.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import config
+import db
+
+
+# Distinct word draws keep synthetic news posts from all being near-duplicates
+_VOCABULARY = [f"word{i}" for i in range(5000)]
+
+
+def make_posts(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    posts = []
+    for i in range(n):
+        source = rng.choice(["reddit", "news", "twitter"])
+        posts.append(
+            {
+                "source": source,
+                "external_id": f"{source}_{i}",
+                "title": f"NVDA post {i} " + " ".join(rng.choices(_VOCABULARY, k=rng.randint(3, 15))),
+                "content": " ".join(rng.choices(_VOCABULARY, k=rng.randint(10, 300))),
+                "author": f"user{rng.randint(1, 5000)}",
+                "url": f"https://example.com/{source}/{i}",
+                "subreddit": "stocks" if source == "reddit" else None,
+                "score": rng.randint(0, 5000) if source != "news" else None,
+                "num_comments": rng.randint(0, 500) if source != "news" else None,
+                "sentiment": None,
+                "published_at": (start + timedelta(minutes=i)).isoformat(),
+            }
+        )
+    return posts
+
+
+def _legacy_connection():
+    """A plain connection, as the original db.get_connection() opened.
+
+    db.get_connection() now lends pooled connections, which the original
+    path never had.
+    """
+    conn = sqlite3.connect(config.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_insert_posts(posts):
+    """The original insert path: one execute and one dict per row."""
+    count = 0
+    conn = _legacy_connection()
+    try:
+        for post in posts:
+            cur = conn.execute(
+                """INSERT OR IGNORE INTO posts
+                   (source, external_id, title, content, author, url,
+                    subreddit, score, num_comments, sentiment, published_at)
+                   VALUES (:source, :external_id, :title, :content, :author, :url,
+                           :subreddit, :score, :num_comments, :sentiment, :published_at)""",
+                {column: post.get(column) for column in db.POST_COLUMNS},
+            )
+            if cur.rowcount > 0:
+                count += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+
+def legacy_insert_post(post):
+    """The original single-row path: a fresh connection per call."""
+    conn = _legacy_connection()
+    try:
+        conn.execute(
+            """INSERT OR IGNORE INTO posts
+               (source, external_id, title, content, author, url,
+                subreddit, score, num_comments, sentiment, published_at)
+               VALUES (:source, :external_id, :title, :content, :author, :url,
+                       :subreddit, :score, :num_comments, :sentiment, :published_at)""",
+            {column: post.get(column) for column in db.POST_COLUMNS},
+        )
+        conn.commit()
+        return conn.total_changes > 0
+    finally:
+        conn.close()
+
+
+def _time_single(insert_one, posts, workdir, name):
+    config.DB_PATH = os.path.join(workdir, f"{name}.db")
+    db.close_writer()
+    db.init_db()
+    start = time.perf_counter()
+    new = sum(1 for post in posts if insert_one(post))
+    elapsed = time.perf_counter() - start
+    db.close_writer()
+    return {"new": new, "elapsed_s": elapsed}
+
+
+def _time_insert(insert, posts, workdir, name):
+    path = os.path.join(workdir, f"{name}.db")
+    config.DB_PATH = path
+    db.close_writer()
+    db.init_db()
+
+    start = time.perf_counter()
+    new = insert(posts)
+    fresh = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dup = insert(posts)
+    repeat = time.perf_counter() - start
+
+    db.close_writer()
+    with sqlite3.connect(path) as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    return {"new": new, "dup_new": dup, "fresh_s": fresh, "repeat_s": repeat, "journal": mode}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--single", type=int, default=1000,
+                        help="posts for the one-call-per-post scenario")
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+    paths = {"legacy": legacy_insert_posts, "batched": db.insert_posts}
+    best = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for run in range(args.runs):
+            for name, insert in paths.items():
+                result = _time_insert(insert, posts, workdir, f"{name}{run}")
+                if name not in best or result["fresh_s"] < best[name]["fresh_s"]:
+                    best[name] = result
+
+    print(f"{args.posts} posts, best of {args.runs} runs")
+    for name, r in best.items():
+        print(
+            f"  {name:8s} insert {r['fresh_s']:.3f}s ({args.posts / r['fresh_s']:,.0f}/s), "
+            f"re-insert {r['repeat_s']:.3f}s, new={r['new']} dup_new={r['dup_new']} "
+            f"journal={r['journal']}"
+        )
+    speedup = best["legacy"]["fresh_s"] / best["batched"]["fresh_s"]
+    repeat = best["legacy"]["repeat_s"] / best["batched"]["repeat_s"]
+    print(f"  speedup: {speedup:.1f}x, re-insert {repeat:.1f}x")
+
+    singles = {"legacy": legacy_insert_post, "batched": db.insert_post}
+    with tempfile.TemporaryDirectory() as workdir:
+        timings = {
+            name: _time_single(insert_one, posts[: args.single], workdir, name)
+            for name, insert_one in singles.items()
+        }
+    print(f"{args.single} single-post calls")
+    for name, r in timings.items():
+        print(f"  {name:8s} {r['elapsed_s']:.3f}s ({args.single / r['elapsed_s']:,.0f}/s), new={r['new']}")
+    speedup = timings["legacy"]["elapsed_s"] / timings["batched"]["elapsed_s"]
+    print(f"  speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Synthetic post corpora for benchmarks.
+
+Posts are built from headline and comment templates over the ticker
+registry, with a vocabulary that mixes words VADER scores with neutral
+market jargon, so tagging, clustering and scoring do realistic work. A
+share of news posts are reworded copies of a recent story, as
+syndication produces. Posts are generated lazily, so corpora of millions
+never have to sit in memory.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import config
+
+MOVES = [
+    "surge", "slump", "rally", "tumble", "climb", "slide", "jump", "sink",
+    "edge higher", "fall sharply", "hit a record high", "drop to a three-month low",
+]
+EVENTS = [
+    "an earnings beat", "weak guidance", "record data center revenue", "new export restrictions",
+    "an analyst downgrade", "an analyst upgrade", "strong AI demand", "supply chain concerns",
+    "a patent lawsuit", "a $25 billion buyback", "a delayed product launch", "a key customer win",
+]
+OUTLOOKS = ["double", "crash", "outperform", "disappoint", "keep winning", "stall", "recover"]
+PERIODS = ["week", "quarter", "year", "earnings season"]
+ADJECTIVES = [
+    "great", "terrible", "excellent", "awful", "bullish", "bearish", "solid", "risky",
+    "overvalued", "cheap", "amazing", "worrying",
+]
+ACTIONS = ["buy", "sell", "hold", "trim", "load up on", "avoid"]
+FIRMS = [
+    "Morgan Stanley", "Goldman Sachs", "JPMorgan", "Bank of America", "Citi", "UBS",
+    "Bernstein", "Jefferies", "Wedbush", "Piper Sandler", "Evercore", "Mizuho",
+]
+DETAILS = [
+    "Volume was {volume} million shares, against a 30-day average of {average} million.",
+    "{firm} set a ${target} price target and {verb} its rating.",
+    "The move added roughly ${cap} billion in market value in {session} trading.",
+    "Options traders bought {contracts},000 calls expiring in {month}.",
+    "Revenue guidance of ${revenue} billion compared with consensus near ${consensus} billion.",
+]
+VERBS = ["reiterated", "raised", "cut", "maintained"]
+SESSIONS = ["early", "midday", "late", "after-hours", "premarket"]
+MONTHS = ["January", "March", "June", "September", "December"]
+
+NEWS_TITLES = [
+    "{name} shares {move} {pct}% after {event}",
+    "{symbol} stock {move} as Wall Street weighs {event}",
+    "Why {alias} could {outlook} this {period}, says {firm}",
+    "Is it time to {action} {name}? {firm} weighs in after {event}",
+    "Chip stocks {move}; {name} leads with a {pct}% move after {event}",
+]
+NEWS_SUMMARIES = [
+    "{name} ({symbol}) stock moved on {event}, with traders calling the outlook {adjective}.",
+    "Investors reacted to {event}. Analysts said {alias} remains {adjective} for the {period}.",
+    "The semiconductor sector was volatile as {name} reported {event}.",
+]
+SOCIAL_TITLES = [
+    "${symbol} to the moon after {event}",
+    "Thoughts on {name} this {period}?",
+    "{symbol} is {adjective}, change my mind",
+    "Should I {action} {symbol} before earnings?",
+    "{alias} {event} - {adjective} or overblown?",
+]
+SOCIAL_BODIES = [
+    "I think {name} is {adjective} here. Going to {action} more.",
+    "Honestly {event} looks {adjective} for {symbol}. Not financial advice.",
+    "Been holding {symbol} for a year, this {period} feels {adjective}.",
+    "",
+]
+SUBREDDITS = ["wallstreetbets", "stocks", "investing", "nvidia", "StockMarket"]
+OUTLETS = ["Reuters", "Bloomberg", "CNBC", "MarketWatch", "Barron's", "Yahoo Finance"]
+
+SOURCE_WEIGHTS = {"reddit": 0.5, "news": 0.35, "twitter": 0.15}
+SYNDICATED_SHARE = 0.15
+
+
+def _fields(rng, tickers):
+    symbol = rng.choice(tickers)
+    entry = config.TICKER_REGISTRY.get(symbol, {})
+    names = [entry.get("name", symbol), *entry.get("aliases", [])]
+    revenue = rng.randint(8, 60)
+    return {
+        "pct": rng.randint(1, 15),
+        "firm": rng.choice(FIRMS),
+        "volume": rng.randint(20, 600),
+        "average": rng.randint(20, 600),
+        "target": rng.randint(50, 1500),
+        "verb": rng.choice(VERBS),
+        "cap": rng.randint(5, 300),
+        "session": rng.choice(SESSIONS),
+        "contracts": rng.randint(2, 90),
+        "month": rng.choice(MONTHS),
+        "revenue": revenue,
+        "consensus": revenue + rng.randint(-3, 3),
+        "symbol": symbol,
+        "name": names[0],
+        "alias": rng.choice(names),
+        "move": rng.choice(MOVES),
+        "event": rng.choice(EVENTS),
+        "outlook": rng.choice(OUTLOOKS),
+        "period": rng.choice(PERIODS),
+        "adjective": rng.choice(ADJECTIVES),
+        "action": rng.choice(ACTIONS),
+    }
+
+
+def _reword(rng, title):
+    words = title.split()
+    i = rng.randrange(len(words))
+    replacement = rng.choice(["shares", "stock", "today", "sharply", "again"])
+    return " ".join(words[:i] + [replacement] + words[i + 1:])
+
+
+def generate_posts(n, seed=0, days=30, tickers=None, end=None):
+    """Yield ``n`` synthetic post dicts, published evenly over the last ``days``.
+
+    Posts are in publish order and carry no sentiment, ticker or tags,
+    like freshly crawled ones.
+    """
+    rng = random.Random(seed)
+    tickers = list(tickers or config.TICKERS)
+    end = end or datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = (end - start) / max(n, 1)
+    sources = list(SOURCE_WEIGHTS)
+    weights = list(SOURCE_WEIGHTS.values())
+    recent_news = []
+
+    for i in range(n):
+        source = rng.choices(sources, weights)[0]
+        fields = _fields(rng, tickers)
+        published_at = (start + step * i).strftime("%Y-%m-%d %H:%M:%S")
+        post = {
+            "source": source,
+            "external_id": f"{source}_{seed}_{i}",
+            "author": None,
+            "subreddit": None,
+            "score": None,
+            "num_comments": None,
+            "sentiment": None,
+            "published_at": published_at,
+        }
+        if source == "news":
+            if recent_news and rng.random() < SYNDICATED_SHARE:
+                title, content = rng.choice(recent_news)
+                title = _reword(rng, title)
+            else:
+                title = rng.choice(NEWS_TITLES).format(**fields)
+                content = " ".join(
+                    [rng.choice(NEWS_SUMMARIES), *rng.sample(DETAILS, 2)]
+                ).format(**fields)
+                recent_news = (recent_news + [(title, content)])[-50:]
+            post.update(
+                title=title,
+                content=content,
+                author=rng.choice(OUTLETS),
+                url=f"https://news.example.com/{seed}/{i}",
+            )
+        else:
+            post.update(
+                title=rng.choice(SOCIAL_TITLES).format(**fields),
+                content=rng.choice(SOCIAL_BODIES).format(**fields),
+                author=f"user{rng.randint(1, 50000)}",
+                url=f"https://{source}.example.com/{seed}/{i}",
+                score=rng.randint(0, 5000),
+                num_comments=rng.randint(0, 800),
+            )
+            if source == "reddit":
+                post["subreddit"] = rng.choice(SUBREDDITS)
+        yield post
+
+
+def batched(iterable, size):
+    """Yield lists of up to ``size`` items."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
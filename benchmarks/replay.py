@@ -0,0 +1,154 @@
+"""Serve crawler HTTP requests from recorded fixtures.
+
+Usage: python -m benchmarks.replay --record [--fixtures DIR]
+
+ReplayAdapter is a requests transport adapter: mounted on the shared
+crawler session, it answers every request from the fixtures directory
+instead of the network, so crawlers can be timed offline and repeatably.
+``fixtures/index.json`` lists one entry per fixture with its host, a path
+glob, the file holding the body and its content type; requests matching
+no entry get a 404.
+
+With --record, every crawler runs once against the live sites through
+RecordingAdapter, which saves each successful response as a fixture.
+Twitter goes through snscrape rather than the shared session, so it
+cannot be recorded or replayed.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import tempfile
+from fnmatch import fnmatch
+from urllib.parse import urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import config
+import db
+from crawlers import ALL_CRAWLERS, http_client
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = "index.json"
+
+
+def load_manifest(fixtures_dir=FIXTURES_DIR) -> list:
+    path = os.path.join(fixtures_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests with recorded bodies, never touching the network."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        super().__init__()
+        self.fixtures = []
+        for entry in load_manifest(fixtures_dir):
+            with open(os.path.join(fixtures_dir, entry["file"]), "rb") as f:
+                self.fixtures.append((entry, f.read()))
+        self.requests = 0
+        self.bytes = 0
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.status_code, response.reason, response._content = 404, "Not Found", b""
+        response.headers = CaseInsensitiveDict()
+        for entry, body in self.fixtures:
+            if entry["host"] == parts.hostname and fnmatch(parts.path, entry["path"]):
+                response.status_code, response.reason, response._content = 200, "OK", body
+                response.headers["Content-Type"] = entry["content_type"]
+                response.headers["Content-Length"] = str(len(body))
+                break
+        self.requests += 1
+        self.bytes += len(response._content)
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Fetches from the network and saves each 200 response as a fixture."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures_dir = fixtures_dir
+        self.manifest = load_manifest(fixtures_dir)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            self._save(request.url, response)
+        return response
+
+    def _save(self, url, response):
+        parts = urlsplit(url)
+        name = re.sub(r"[^\w.-]+", "_", f"{parts.hostname}{parts.path}").strip("_")
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        if "." not in name.rsplit("_", 1)[-1]:
+            name += ".json" if "json" in content_type else ".xml"
+        with open(os.path.join(self.fixtures_dir, name), "wb") as f:
+            f.write(response.content)
+        entry = {
+            "host": parts.hostname,
+            "path": parts.path,
+            "file": name,
+            "content_type": content_type,
+        }
+        self.manifest = [
+            e for e in self.manifest if (e["host"], e["path"]) != (entry["host"], entry["path"])
+        ] + [entry]
+        with open(os.path.join(self.fixtures_dir, MANIFEST), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        logger.info("Recorded %s (%d bytes)", url, len(response.content))
+
+
+def install(adapter):
+    """Route every request of the shared crawler session through ``adapter``."""
+    session = http_client.get_session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
+
+
+def record(fixtures_dir=FIXTURES_DIR):
+    """Crawl every source once, live, saving the responses as fixtures."""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    install(RecordingAdapter(fixtures_dir))
+    with tempfile.TemporaryDirectory() as workdir:
+        # An empty database, so nothing is skipped and nothing is revalidated
+        config.DB_PATH = os.path.join(workdir, "record.db")
+        db.close_writer()
+        db.init_db()
+        for crawler_cls in ALL_CRAWLERS:
+            posts = sum(1 for _ in crawler_cls().crawl())
+            logger.info("%s: %d posts", crawler_cls.name, posts)
+        db.close_writer()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="record fixtures from the live sites")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+    if not args.record:
+        for entry in load_manifest(args.fixtures):
+            print(f"{entry['host']}{entry['path']} -> {entry['file']}")
+        return
+    record(args.fixtures)
+
+
+if __name__ == "__main__":
+    main()
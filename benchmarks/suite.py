@@ -0,0 +1,212 @@
+"""Offline benchmark suite for crawling, storage, scoring and reporting.
+
+Usage: python -m benchmarks.suite [--posts N] [--repeat N] [--output FILE]
+                                  [--baseline FILE] [--tolerance F]
+
+Crawlers run against recorded fixtures (see benchmarks.replay) with rate
+limits lifted, so their stage measures fetching overhead and parsing.
+A synthetic corpus of --posts posts (benchmarks.corpus) is then
+inserted, scored with backfill_sentiment, summarized with
+get_daily_sentiment and predict_trend, backtested and charted (rendered,
+from the chart cache, and as SVG). Timings are written as JSON; with
+--baseline, any stage slower than the baseline by more than --tolerance
+is reported and the exit status is 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import config
+import db
+import ratelimit
+from benchmarks import replay
+from benchmarks.corpus import batched, generate_posts
+from crawlers import ALL_CRAWLERS
+
+
+def _stage(runs, items=None, **extra) -> dict:
+    seconds = statistics.median(runs)
+    result = {"seconds": seconds, "best": min(runs), "runs": runs}
+    if items is not None:
+        result["items"] = items
+        result["per_second"] = items / seconds if seconds else None
+    result.update(extra)
+    return result
+
+
+def _repeat(fn, repeat):
+    """Call fn once to warm up, then ``repeat`` times; return (timings, last result)."""
+    value = fn()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+def bench_crawlers(repeat) -> dict:
+    adapter = replay.install(replay.ReplayAdapter())
+    results = {}
+    for crawler_cls in ALL_CRAWLERS:
+        if not crawler_cls().tasks():
+            continue
+        before = (adapter.requests, adapter.bytes)
+        runs, posts = _repeat(lambda: sum(1 for _ in crawler_cls().crawl()), repeat)
+        calls = repeat + 1
+        results[f"crawl.{crawler_cls.name}"] = _stage(
+            runs, posts,
+            requests=(adapter.requests - before[0]) // calls,
+            bytes=(adapter.bytes - before[1]) // calls,
+        )
+    return results
+
+
+def bench_insert(posts) -> dict:
+    elapsed = 0.0
+    new = 0
+    for batch in batched(generate_posts(posts), config.DB_BATCH_SIZE):
+        start = time.perf_counter()
+        new += db.insert_posts(batch)
+        elapsed += time.perf_counter() - start
+    return {"insert_posts": _stage([elapsed], new)}
+
+
+def bench_analysis(repeat, workdir) -> dict:
+    from sentiment import backfill_sentiment, get_daily_sentiment, predict_trend
+
+    results = {}
+    start = time.perf_counter()
+    scored = backfill_sentiment()
+    results["backfill_sentiment"] = _stage([time.perf_counter() - start], scored)
+
+    runs, daily = _repeat(get_daily_sentiment, repeat)
+    results["get_daily_sentiment"] = _stage(runs, len(daily))
+    runs, prediction = _repeat(predict_trend, repeat)
+    results["predict_trend"] = _stage(runs)
+
+    import signals
+
+    series = signals.load()
+    runs, _ = _repeat(lambda: signals.backtest(series), repeat)
+    results["backtest"] = _stage(runs, len(series["day"]))
+
+    from charts import generate_sentiment_chart, generate_volume_chart
+
+    def charts(fmt="png", cached=False):
+        if not cached:
+            shutil.rmtree(config.CHART_CACHE_DIR, ignore_errors=True)
+        generate_sentiment_chart(prediction["daily_scores"], os.path.join(workdir, f"s.{fmt}"))
+        generate_volume_chart(prediction["daily_scores"], os.path.join(workdir, f"v.{fmt}"))
+        return 2
+
+    runs, count = _repeat(charts, repeat)
+    results["charts"] = _stage(runs, count)
+    runs, count = _repeat(lambda: charts(cached=True), repeat)
+    results["charts.cached"] = _stage(runs, count)
+    runs, count = _repeat(lambda: charts("svg"), repeat)
+    results["charts.svg"] = _stage(runs, count)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(posts, repeat) -> dict:
+    # Fixtures are local, so pacing would only measure the sleeps
+    ratelimit.limiter = ratelimit.RateLimiter(limits={}, default=(1e9, 1_000_000))
+    stages = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        config.DB_PATH = os.path.join(workdir, "bench.db")
+        config.ANALYTICS_DIR = os.path.join(workdir, "bench_columns")
+        config.CHART_CACHE_DIR = os.path.join(workdir, "bench_charts")
+        db.close_writer()
+        db.init_db()
+        stages.update(bench_crawlers(repeat))
+        stages.update(bench_insert(posts))
+        stages.update(bench_analysis(repeat, workdir))
+        db.close_writer()
+        db_bytes = os.path.getsize(config.DB_PATH)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "posts": posts,
+            "repeat": repeat,
+            "db_bytes": db_bytes,
+            "config": {
+                "DB_BATCH_SIZE": config.DB_BATCH_SIZE,
+                "FEED_PARSE_WORKERS": config.FEED_PARSE_WORKERS,
+                "SENTIMENT_WORKERS": config.SENTIMENT_WORKERS,
+                "TICKERS": config.TICKERS,
+            },
+        },
+        "stages": stages,
+    }
+
+
+def compare(current, baseline, tolerance) -> list:
+    """Return (stage, baseline s, current s) for stages that got slower than tolerance."""
+    regressions = []
+    for name, stage in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before and before["seconds"] and stage["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append((name, before["seconds"], stage["seconds"]))
+    return regressions
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    results = run(args.posts, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{args.posts} posts, median of {args.repeat} runs -> {args.output}")
+    for name, stage in results["stages"].items():
+        rate = f"{stage['per_second']:12,.0f}/s" if stage.get("per_second") else ""
+        print(f"  {name:22s} {stage['seconds']:9.4f}s {rate}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than the baseline by more than {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
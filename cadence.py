@@ -0,0 +1,139 @@
+"""Adaptive crawl cadence: how often each crawl source is polled.
+
+A source is one crawler fetch task (a subreddit and query, a feed, a
+search term). Each keeps an estimate of the new posts it yields per hour,
+updated by the workers (see db.record_source_fetch). A budget of fetches
+per hour shared by all sources is split in proportion to the square root
+of their yield, which for a fixed number of requests minimizes how long
+new posts wait to be picked up: busy sources are polled more often and
+quiet ones back off, within CADENCE_MIN/MAX_INTERVAL_MINUTES.
+
+The budget follows the US market clock. It is weighted up during trading
+hours, most of all around the open and close, and down overnight and at
+weekends; the weights average 1 over a week, so the weekly spend is that
+of a flat budget. Market holidays are treated as ordinary days.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import config
+from db import get_source_stats, mark_sources_enqueued
+from taskqueue import enqueue_crawl, get_queue, list_crawl_tasks, source_key
+
+logger = logging.getLogger(__name__)
+
+
+def _minutes(hour_minute) -> int:
+    hour, minute = hour_minute
+    return hour * 60 + minute
+
+
+def _market_weight(when: datetime) -> float:
+    local = when.astimezone(ZoneInfo(config.MARKET_TIMEZONE))
+    if local.weekday() >= 5:
+        return config.MARKET_CLOSED_WEIGHT
+    minute = local.hour * 60 + local.minute
+    market_open, market_close = _minutes(config.MARKET_OPEN), _minutes(config.MARKET_CLOSE)
+    if min(abs(minute - market_open), abs(minute - market_close)) <= config.MARKET_EDGE_MINUTES:
+        return config.MARKET_EDGE_WEIGHT
+    if market_open < minute < market_close:
+        return config.MARKET_HOURS_WEIGHT
+    return config.MARKET_CLOSED_WEIGHT
+
+
+@lru_cache(maxsize=1)
+def _mean_market_weight() -> float:
+    # Sampled every 15 minutes over one week, starting on a Monday
+    start = datetime(2024, 1, 1, tzinfo=ZoneInfo(config.MARKET_TIMEZONE))
+    steps = 7 * 24 * 4
+    return sum(_market_weight(start + timedelta(minutes=15 * i)) for i in range(steps)) / steps
+
+
+def market_factor(at: float) -> float:
+    """Budget multiplier at unix time ``at``; it averages 1 over a week."""
+    return _market_weight(datetime.fromtimestamp(at, timezone.utc)) / _mean_market_weight()
+
+
+def base_budget(sources: int) -> float:
+    """Average fetches per hour for ``sources`` crawl sources."""
+    return config.CRAWL_BUDGET_PER_HOUR or sources * 60 / config.CRAWL_INTERVAL_MINUTES
+
+
+def intervals(rates: dict, budget: float) -> dict:
+    """Split ``budget`` fetches per hour between sources.
+
+    ``rates`` maps each source to its new posts per hour (None if not yet
+    known). Returns {source: hours between fetches}.
+    """
+    weights = {
+        key: math.sqrt(max(rate or 0.0, config.CADENCE_MIN_RATE)) for key, rate in rates.items()
+    }
+    total = sum(weights.values())
+    shortest = config.CADENCE_MIN_INTERVAL_MINUTES / 60
+    longest = config.CADENCE_MAX_INTERVAL_MINUTES / 60
+    return {
+        key: min(max(total / (budget * weight), shortest), longest)
+        for key, weight in weights.items()
+    }
+
+
+class Cadence:
+    """Queues the crawl sources that are due, a tick at a time.
+
+    Fetches are paid for from a token bucket that refills at the current
+    budget, so clamped intervals and sources that were never fetched
+    cannot push the spend over it. The bucket holds one full round of
+    sources, which the first tick may spend at once.
+    """
+
+    def __init__(self, queue=None):
+        self.queue = queue or get_queue()
+        self._tokens = None
+        self._updated = None
+
+    def _refill(self, now, budget, capacity):
+        if self._tokens is None:
+            self._tokens = capacity
+        else:
+            hours = (now - self._updated) / 3600
+            self._tokens = min(self._tokens + hours * budget, capacity)
+        self._updated = now
+
+    def tick(self) -> int:
+        """Queue the most overdue sources the budget allows. Returns the number added."""
+        now = time.time()
+        tasks = {
+            source_key(crawler, task.method, task.args): (crawler, task)
+            for crawler, task in list_crawl_tasks()
+        }
+        if not tasks:
+            return 0
+        stats = get_source_stats()
+        budget = base_budget(len(tasks)) * market_factor(now)
+        self._refill(now, budget, capacity=max(len(tasks), budget))
+
+        every = intervals(
+            {key: stats[key]["new_per_hour"] if key in stats else None for key in tasks}, budget
+        )
+        overdue = {}
+        for key in tasks:
+            last = stats[key]["last_enqueued_at"] if key in stats else None
+            wait = now - last - every[key] * 3600 if last else math.inf
+            if wait >= 0:
+                overdue[key] = wait
+        due = sorted(overdue, key=overdue.get, reverse=True)[:int(self._tokens)]
+        if not due:
+            return 0
+
+        added = enqueue_crawl(self.queue, [tasks[key] for key in due])
+        self._tokens -= added
+        mark_sources_enqueued(due, now)
+        logger.info(
+            "Cadence: %d of %d sources due, %d queued (budget %.1f fetches/hour)",
+            len(overdue), len(tasks), added, budget,
+        )
+        return added
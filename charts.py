@@ -1,80 +1,313 @@
-import matplotlib
-matplotlib.use("Agg")  # Non-interactive backend
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime
+"""Sentiment and volume charts, cached by the data they show.
 
+The output format follows the file extension: ``.png`` is rendered with
+matplotlib, while ``.svg`` and ``.json`` (the chart's data and styling,
+for dashboards to draw) are written directly and take milliseconds.
 
-def generate_sentiment_chart(daily_data, output_path="sentiment_chart.png"):
-    """Line chart of daily sentiment over time.
+Every chart is stored in CHART_CACHE_DIR under a hash of its data, kind,
+ticker and format, then copied to the requested path; a chart whose
+inputs haven't changed since it was last drawn is copied without being
+rendered again. PNG figures are built once per process and reused, with
+only their data artists replaced on each render.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+from xml.sax.saxutils import escape
 
-    X-axis: dates, Y-axis: sentiment score (-1 to +1).
-    Separate lines for reddit vs news, plus combined.
-    Green zone above 0, red zone below 0.
-    """
-    if not daily_data:
-        return
+import config
+import metrics
 
-    dates = [datetime.strptime(d["date"], "%Y-%m-%d") for d in daily_data]
-    reddit = [d["reddit_avg"] for d in daily_data]
-    news = [d["news_avg"] for d in daily_data]
-    combined = [d["combined_avg"] for d in daily_data]
+# Bump when chart output changes, so cached artifacts are redrawn
+CHART_VERSION = 2
+DPI = 150
 
-    fig, ax = plt.subplots(figsize=(12, 6))
+SENTIMENT_SERIES = [
+    # (label, daily_data key, color, PNG format string)
+    ("Combined", "combined_avg", "blue", "b-o"),
+    ("Reddit", "reddit_avg", "orange", "s--"),
+    ("News", "news_avg", "purple", "^--"),
+]
+VOLUME_SERIES = [
+    ("Reddit", "reddit_count", "orange"),
+    ("News", "news_count", "purple"),
+]
 
-    # Color zones
-    ax.axhspan(0, 1, alpha=0.05, color="green")
-    ax.axhspan(-1, 0, alpha=0.05, color="red")
-    ax.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
+_render_lock = threading.Lock()
+_templates = {}
 
-    # Plot lines
-    ax.plot(dates, combined, "b-o", linewidth=2, markersize=4, label="Combined", zorder=3)
-    ax.plot(dates, reddit, "s--", color="orange", linewidth=1.5, markersize=3, label="Reddit", alpha=0.8)
-    ax.plot(dates, news, "^--", color="purple", linewidth=1.5, markersize=3, label="News", alpha=0.8)
 
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Sentiment Score")
-    ax.set_title("NVDA Sentiment Over Time")
-    ax.set_ylim(-1, 1)
-    ax.legend(loc="upper left")
-    ax.grid(True, alpha=0.3)
+def _matplotlib():
+    """Import matplotlib on first use; it is slow to load and only PNG charts need it."""
+    import matplotlib
+    matplotlib.use("Agg")  # Non-interactive backend
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+    return Figure, mdates
 
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
-    ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates) // 10)))
-    fig.autofmt_xdate()
 
-    plt.tight_layout()
-    fig.savefig(output_path, dpi=150)
-    plt.close(fig)
-    return output_path
+def _cache_key(kind, daily_data, ticker, fmt) -> str:
+    payload = json.dumps(
+        [CHART_VERSION, kind, ticker, fmt, DPI, daily_data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
 
 
-def generate_volume_chart(daily_data, output_path="volume_chart.png"):
-    """Stacked bar chart of post volume per day by source."""
-    if not daily_data:
+def _prune_cache(directory):
+    entries = [entry for entry in os.scandir(directory) if entry.is_file()]
+    if len(entries) <= config.CHART_CACHE_ENTRIES:
         return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[config.CHART_CACHE_ENTRIES:]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
 
-    dates = [datetime.strptime(d["date"], "%Y-%m-%d") for d in daily_data]
-    reddit_counts = [d["reddit_count"] for d in daily_data]
-    news_counts = [d["news_count"] for d in daily_data]
 
-    fig, ax = plt.subplots(figsize=(12, 5))
+def chart_artifact(kind, daily_data, fmt="png", ticker="NVDA") -> str:
+    """Return the path of the cached ``kind`` chart ("sentiment" or "volume") of daily_data.
 
-    bar_width = 0.8
-    ax.bar(dates, reddit_counts, bar_width, label="Reddit", color="orange", alpha=0.8)
-    ax.bar(dates, news_counts, bar_width, bottom=reddit_counts, label="News", color="purple", alpha=0.8)
+    The chart is rendered into the cache first unless an identical one is there.
+    """
+    renderers = _RENDERERS[kind]
+    if fmt not in renderers:
+        raise ValueError(f"unsupported chart format {fmt!r}; use one of {', '.join(renderers)}")
 
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Post Count")
-    ax.set_title("NVDA Post Volume by Source")
-    ax.legend(loc="upper left")
-    ax.grid(True, alpha=0.3, axis="y")
+    directory = config.CHART_CACHE_DIR
+    os.makedirs(directory, exist_ok=True)
+    artifact = os.path.join(directory, f"{kind}-{_cache_key(kind, daily_data, ticker, fmt)}.{fmt}")
+    if os.path.exists(artifact):
+        metrics.CHART_CACHE.inc(chart=kind, result="hit")
+        os.utime(artifact)
+    else:
+        metrics.CHART_CACHE.inc(chart=kind, result="miss")
+        tmp = f"{artifact}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with metrics.CHART_SECONDS.time(chart=kind, format=fmt):
+            renderers[fmt](daily_data, tmp, ticker)
+        os.replace(tmp, artifact)
+        _prune_cache(directory)
+    return artifact
 
-    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
-    ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates) // 10)))
-    fig.autofmt_xdate()
 
-    plt.tight_layout()
-    fig.savefig(output_path, dpi=150)
-    plt.close(fig)
+def _copy_chart(kind, daily_data, output_path, ticker):
+    fmt = os.path.splitext(output_path)[1].lstrip(".").lower() or "png"
+    artifact = chart_artifact(kind, daily_data, fmt, ticker)
+    if os.path.abspath(artifact) != os.path.abspath(output_path):
+        shutil.copyfile(artifact, output_path)
     return output_path
+
+
+def _dates(daily_data):
+    return [datetime.strptime(d["date"], "%Y-%m-%d") for d in daily_data]
+
+
+def _set_date_axis(ax, mdates, dates):
+    # Bound the axis to the data: a lone date would otherwise autoscale
+    # to a span of years and the day locator would try to tick every day
+    span = (dates[-1] - dates[0]).days
+    ax.set_xlim(dates[0] - timedelta(days=0.6), dates[-1] + timedelta(days=0.6))
+    ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, (span + 1) // 10)))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+
+
+def _template(kind):
+    """The figure for ``kind``, built once: (fig, ax, data artists)."""
+    if kind in _templates:
+        return _templates[kind]
+    Figure, mdates = _matplotlib()
+    if kind == "sentiment":
+        fig = Figure(figsize=(12, 6), layout="tight")
+        ax = fig.add_subplot()
+        # Color zones
+        ax.axhspan(0, 1, alpha=0.05, color="green")
+        ax.axhspan(-1, 0, alpha=0.05, color="red")
+        ax.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
+        combined, reddit, news = SENTIMENT_SERIES
+        artists = [
+            ax.plot([], [], combined[3], linewidth=2, markersize=4, label=combined[0], zorder=3)[0],
+            *(
+                ax.plot([], [], fmt, color=color, linewidth=1.5, markersize=3, label=label, alpha=0.8)[0]
+                for label, _, color, fmt in (reddit, news)
+            ),
+        ]
+        ax.set_ylabel("Sentiment Score")
+        ax.set_ylim(-1, 1)
+        ax.legend(loc="upper left")
+        ax.grid(True, alpha=0.3)
+    else:
+        from matplotlib.patches import Patch
+
+        fig = Figure(figsize=(12, 5), layout="tight")
+        ax = fig.add_subplot()
+        ax.set_ylabel("Post Count")
+        # Bars are replaced on every render, so the legend uses stand-ins
+        ax.legend(
+            handles=[Patch(color=color, alpha=0.8, label=label) for label, _, color in VOLUME_SERIES],
+            loc="upper left",
+        )
+        ax.grid(True, alpha=0.3, axis="y")
+        artists = []
+    ax.set_xlabel("Date")
+    _templates[kind] = (fig, ax, artists)
+    return _templates[kind]
+
+
+def _render_sentiment_png(daily_data, path, ticker):
+    _, mdates = _matplotlib()
+    dates = _dates(daily_data)
+    with _render_lock:
+        fig, ax, lines = _template("sentiment")
+        for line, (_, key, _, _) in zip(lines, SENTIMENT_SERIES):
+            line.set_data(dates, [d[key] for d in daily_data])
+        ax.set_title(f"{ticker} Sentiment Over Time")
+        _set_date_axis(ax, mdates, dates)
+        fig.autofmt_xdate()
+        fig.savefig(path, dpi=DPI, format="png")
+
+
+def _render_volume_png(daily_data, path, ticker):
+    _, mdates = _matplotlib()
+    dates = _dates(daily_data)
+    with _render_lock:
+        fig, ax, bars = _template("volume")
+        while bars:
+            bars.pop().remove()
+        bottom = [0] * len(dates)
+        for label, key, color in VOLUME_SERIES:
+            counts = [d[key] for d in daily_data]
+            bars.append(ax.bar(dates, counts, 0.8, bottom=bottom, label=label, color=color, alpha=0.8))
+            bottom = [b + c for b, c in zip(bottom, counts)]
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        ax.set_title(f"{ticker} Post Volume by Source")
+        _set_date_axis(ax, mdates, dates)
+        fig.autofmt_xdate()
+        fig.savefig(path, dpi=DPI, format="png")
+
+
+def _spec(kind, daily_data, ticker) -> dict:
+    """The chart as data: what the JSON format writes and the SVG format draws."""
+    dates = [d["date"] for d in daily_data]
+    if kind == "sentiment":
+        return {
+            "chart": kind,
+            "title": f"{ticker} Sentiment Over Time",
+            "type": "line",
+            "y_label": "Sentiment Score",
+            "y_range": [-1, 1],
+            "dates": dates,
+            "series": [
+                {"name": label, "color": color, "values": [round(d[key], 4) for d in daily_data]}
+                for label, key, color, _ in SENTIMENT_SERIES
+            ],
+        }
+    return {
+        "chart": kind,
+        "title": f"{ticker} Post Volume by Source",
+        "type": "stacked_bar",
+        "y_label": "Post Count",
+        "y_range": [0, max((d["reddit_count"] + d["news_count"] for d in daily_data), default=0)],
+        "dates": dates,
+        "series": [
+            {"name": label, "color": color, "values": [d[key] for d in daily_data]}
+            for label, key, color in VOLUME_SERIES
+        ],
+    }
+
+
+def _write_json(kind, daily_data, path, ticker):
+    with open(path, "w") as f:
+        json.dump(_spec(kind, daily_data, ticker), f, separators=(",", ":"))
+
+
+def _write_svg(kind, daily_data, path, ticker):
+    spec = _spec(kind, daily_data, ticker)
+    width, height = 960, 480
+    left, right, top, bottom = 60, 20, 40, 50
+    plot_w, plot_h = width - left - right, height - top - bottom
+    n = len(spec["dates"])
+    low, high = spec["y_range"]
+    high = high if high > low else low + 1
+
+    def x(i):
+        return left + plot_w * (i + 0.5) / n
+
+    def y(value):
+        return top + plot_h * (high - value) / (high - low)
+
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2}" y="22" text-anchor="middle" font-size="15">{escape(spec["title"])}</text>',
+    ]
+    for i in range(5):
+        value = low + (high - low) * i / 4
+        out.append(
+            f'<line x1="{left}" x2="{width - right}" y1="{y(value):.1f}" y2="{y(value):.1f}" '
+            f'stroke="#ddd"/><text x="{left - 6}" y="{y(value) + 4:.1f}" '
+            f'text-anchor="end">{value:g}</text>'
+        )
+    for i in range(0, n, max(1, n // 10)):
+        out.append(
+            f'<text x="{x(i):.1f}" y="{height - bottom + 16}" text-anchor="middle">'
+            f'{spec["dates"][i][5:].replace("-", "/")}</text>'
+        )
+
+    if spec["type"] == "line":
+        out.append(f'<line x1="{left}" x2="{width - right}" y1="{y(0):.1f}" y2="{y(0):.1f}" '
+                   f'stroke="gray" stroke-dasharray="4 3"/>')
+        for series in reversed(spec["series"]):
+            points = " ".join(f"{x(i):.1f},{y(v):.1f}" for i, v in enumerate(series["values"]))
+            out.append(f'<polyline points="{points}" fill="none" stroke="{series["color"]}" '
+                       f'stroke-width="2"/>')
+    else:
+        bar_w = plot_w / n * 0.8
+        base = [0] * n
+        for series in spec["series"]:
+            for i, value in enumerate(series["values"]):
+                if value:
+                    out.append(
+                        f'<rect x="{x(i) - bar_w / 2:.1f}" y="{y(base[i] + value):.1f}" '
+                        f'width="{bar_w:.1f}" height="{y(base[i]) - y(base[i] + value):.1f}" '
+                        f'fill="{series["color"]}" fill-opacity="0.8"/>'
+                    )
+                base[i] += value
+
+    for i, series in enumerate(spec["series"]):
+        out.append(f'<rect x="{left + 10 + i * 100}" y="{top + 6}" width="12" height="12" '
+                   f'fill="{series["color"]}"/><text x="{left + 26 + i * 100}" y="{top + 16}">'
+                   f'{escape(series["name"])}</text>')
+    out.append("</svg>")
+    with open(path, "w") as f:
+        f.write("\n".join(out))
+
+
+def generate_sentiment_chart(daily_data, output_path="sentiment_chart.png", ticker="NVDA"):
+    """Line chart of daily sentiment over time.
+
+    X-axis: dates, Y-axis: sentiment score (-1 to +1).
+    Separate lines for reddit vs news, plus combined.
+    Green zone above 0, red zone below 0.
+    """
+    if not daily_data:
+        return
+    return _copy_chart("sentiment", daily_data, output_path, ticker)
+
+
+def generate_volume_chart(daily_data, output_path="volume_chart.png", ticker="NVDA"):
+    """Stacked bar chart of post volume per day by source."""
+    if not daily_data:
+        return
+    return _copy_chart("volume", daily_data, output_path, ticker)
+
+
+_RENDERERS = {
+    kind: {"png": png, "svg": partial(_write_svg, kind), "json": partial(_write_json, kind)}
+    for kind, png in (("sentiment", _render_sentiment_png), ("volume", _render_volume_png))
+}
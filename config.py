@@ -1,19 +1,210 @@
 import os
 
+# Log line format, shared by the CLI and the worker processes it spawns
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
 # Database
 DB_PATH = os.getenv("NVIDIA_CRAWLER_DB", "nvidia_chatter.db")
+# SQLite page cache for the long-lived write connection, in KiB
+DB_CACHE_KB = int(os.getenv("NVIDIA_CRAWLER_DB_CACHE_KB", "65536"))
+# Idle read connections kept open per process for reuse
+DB_READ_POOL_SIZE = 8
+# Unix socket of the `main.py --daemon` command server
+DAEMON_SOCKET = os.getenv("NVIDIA_CRAWLER_SOCKET", os.path.splitext(DB_PATH)[0] + ".sock")
+# Columnar copy of older posts for long-range analysis (see analytics.py).
+# Whole months published more than ANALYTICS_HOT_DAYS ago are compacted
+# into it daily at ANALYTICS_COMPACT_HOUR (UTC); newer posts are read from SQLite.
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", os.path.splitext(DB_PATH)[0] + "_columns")
+ANALYTICS_HOT_DAYS = int(os.getenv("ANALYTICS_HOT_DAYS", "35"))
+ANALYTICS_COMPACT_HOUR = 4
 
-# Search terms
-SEARCH_TERMS = ["NVDA", "nvidia", "nvidia stock"]
-TWITTER_SEARCH_TERMS = ["$NVDA", "nvidia stock", "NVDA"]
+# Ticker registry. "terms" are searched for on Reddit, Google News and
+# Twitter (alongside the $cashtag); "aliases" are other spellings that
+# also tag a post with the ticker. Matching is on whole words only, and
+# case-insensitive except for the bare symbol, which must be written as
+# is ("MU", not "mu"). A post's sentiment counts for the ticker it
+# mentions most (see matcher.tag).
+TICKER_REGISTRY = {
+    "NVDA": {
+        "name": "NVIDIA",
+        "terms": ["NVDA", "nvidia", "nvidia stock"],
+        "aliases": ["Nvidia Corp", "GeForce", "Jensen Huang"],
+    },
+    "AMD": {
+        "name": "AMD",
+        "terms": ["AMD", "AMD stock"],
+        "aliases": ["Advanced Micro Devices", "Lisa Su"],
+    },
+    "AVGO": {"name": "Broadcom", "terms": ["AVGO", "Broadcom"], "aliases": []},
+    "TSM": {"name": "TSMC", "terms": ["TSM", "TSMC"], "aliases": ["Taiwan Semiconductor"]},
+    "INTC": {"name": "Intel", "terms": ["INTC", "Intel stock"], "aliases": ["Intel Corp"]},
+    "MU": {"name": "Micron", "terms": ["Micron"], "aliases": ["Micron Technology"]},
+    "QCOM": {"name": "Qualcomm", "terms": ["QCOM", "Qualcomm"], "aliases": []},
+    "ARM": {"name": "Arm", "terms": ["Arm Holdings"], "aliases": []},
+    "ASML": {"name": "ASML", "terms": ["ASML"], "aliases": []},
+    "SMCI": {"name": "Super Micro", "terms": ["SMCI", "Super Micro"], "aliases": ["Supermicro"]},
+}
+# Tickers to crawl and analyze, comma-separated; the first is the default
+TICKERS = [
+    symbol.strip().upper()
+    for symbol in os.getenv("TICKERS", "NVDA").split(",")
+    if symbol.strip()
+]
+# Search queries OR together the terms of many tickers, up to this length
+SEARCH_QUERY_MAX_CHARS = 250
 
 # Reddit
 SUBREDDITS = ["wallstreetbets", "stocks", "investing", "nvidia", "stockmarket"]
 REDDIT_USER_AGENT = "NvidiaCrawler/1.0"
 
-# Crawl interval in minutes
+# News feeds. "{query}" in a url is filled in (URL-encoded) from
+# "batch": "terms" ORs the search terms of the active tickers, "symbols"
+# joins their symbols with commas; either way as few queries as fit in
+# SEARCH_QUERY_MAX_CHARS. Feeds without "batch" are fetched once under
+# "query". The name prefixes external ids and, with the query, keys the
+# crawl cursor. "limit" caps the first crawl of a feed (later crawls take
+# every unseen entry), "author" overrides the outlet named by the feed,
+# and "relevant_only" keeps only entries that mention an active ticker
+# (see matcher.py).
+NEWS_FEEDS = [
+    {
+        "name": "gnews",
+        "url": "https://news.google.com/rss/search?q={query}&hl=en-US&gl=US&ceid=US:en",
+        "batch": "terms",
+        "limit": 20,
+        "id_field": "link",
+    },
+    {
+        "name": "yahoo",
+        "url": "https://feeds.finance.yahoo.com/rss/2.0/headline?s={query}&region=US&lang=en-US",
+        "batch": "symbols",
+        "limit": 20,
+        "author": "Yahoo Finance",
+    },
+    {
+        "name": "mw",
+        "url": "https://feeds.content.dowjones.io/public/rss/mw_realtimeheadlines",
+        "query": "realtimeheadlines",
+        "author": "MarketWatch",
+        "relevant_only": True,
+    },
+]
+# Processes parsing fetched feeds (0 = parse in the fetching thread)
+FEED_PARSE_WORKERS = int(os.getenv("FEED_PARSE_WORKERS", "2"))
+
+# Crawl interval in minutes. With adaptive cadence this sets the default
+# budget: on average each source is still fetched once per interval.
 CRAWL_INTERVAL_MINUTES = int(os.getenv("CRAWL_INTERVAL", "720"))
 
+# Adaptive cadence (see cadence.py). Sources are polled in proportion to
+# the square root of their yield of new posts, within a budget of fetches
+# per hour shared by all sources (0 = one fetch per source per
+# CRAWL_INTERVAL_MINUTES, the fixed-interval spend).
+CRAWL_BUDGET_PER_HOUR = float(os.getenv("CRAWL_BUDGET_PER_HOUR", "0"))
+CADENCE_TICK_MINUTES = 5
+CADENCE_MIN_INTERVAL_MINUTES = 15
+CADENCE_MAX_INTERVAL_MINUTES = 1440
+# Smoothing of the per-source yield estimate (weight of the latest fetch)
+CADENCE_EWMA_ALPHA = 0.3
+# Floor on the yield estimate, in new posts per hour, so quiet sources
+# still get a share
+CADENCE_MIN_RATE = 0.05
+# The budget is shifted towards US market hours, most of all around the
+# open and close; the weights are normalized so the weekly spend is unchanged.
+MARKET_TIMEZONE = "America/New_York"
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+MARKET_EDGE_MINUTES = 45
+MARKET_EDGE_WEIGHT = 3.0
+MARKET_HOURS_WEIGHT = 1.5
+MARKET_CLOSED_WEIGHT = 0.5
+
+# Concurrent crawl engine
+CRAWL_MAX_WORKERS = int(os.getenv("CRAWL_MAX_WORKERS", "16"))
+# Max in-flight requests per host
+DEFAULT_HOST_CONCURRENCY = 1
+HOST_CONCURRENCY = {
+    "news.google.com": 3,
+}
+
+# Per-host rate limits as (requests per second, burst)
+DEFAULT_RATE_LIMIT = (2.0, 2)
+RATE_LIMITS = {
+    "www.reddit.com": (1.0, 2),
+    "news.google.com": (2.0, 3),
+}
+# Adaptive limits: errors halve the rate down to this fraction of the
+# configured one; each success adds back this fraction of it.
+RATE_LIMIT_MIN_FRACTION = 0.1
+RATE_LIMIT_RECOVERY = 0.1
+# Pause applied on HTTP 429 when the host sends no Retry-After
+RATE_LIMIT_BACKOFF = 30
+
+# Crawl task queue (see taskqueue.py). The scheduler only enqueues; local
+# worker processes and any started with `main.py --worker` claim tasks
+# under a lease and retry failures with exponential backoff.
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "sqlite")
+QUEUE_DB_PATH = os.getenv("QUEUE_DB_PATH", DB_PATH)
+QUEUE_LOCAL_WORKERS = int(os.getenv("QUEUE_LOCAL_WORKERS", "1"))
+QUEUE_CLAIM_BATCH = int(os.getenv("QUEUE_CLAIM_BATCH", "16"))
+QUEUE_LEASE_SECONDS = 900
+QUEUE_POLL_SECONDS = 5
+QUEUE_MAX_ATTEMPTS = 5
+# Delay before the first retry; doubles with each further attempt
+QUEUE_RETRY_BASE_SECONDS = 60
+# Finished and abandoned tasks are pruned after this long
+QUEUE_RETENTION_HOURS = 48
+
+# Incremental crawling. Queries page back until they reach items already
+# seen (minus a grace window for late arrivals), up to CURSOR_MAX_PAGES
+# per cycle; anything older is picked up from a resume point next cycle.
+CURSOR_GRACE_MINUTES = 30
+CURSOR_MAX_PAGES = 5
+REDDIT_PAGE_SIZE = 100
+TWITTER_MAX_TWEETS = 500
+
+# Streaming pipeline: posts buffered between stages, and the writer's
+# batch size and maximum wait before flushing a partial batch
+PIPELINE_QUEUE_SIZE = 1000
+DB_BATCH_SIZE = 500
+PIPELINE_FLUSH_SECONDS = 2.0
+
+# Seen-post index used to skip already-stored items before parsing them.
+# Set SEEN_INDEX_SNAPSHOT to a file path to warm-start it across runs.
+SEEN_INDEX_SNAPSHOT = os.getenv("SEEN_INDEX_SNAPSHOT", "")
+SEEN_INDEX_LOAD_CHUNK = 50000
+
+# Near-duplicate detection: posts from these sources whose word sets have
+# at least this Jaccard similarity share a cluster and are counted once.
+# Posts with fewer distinct words are never clustered. Reddit and Twitter
+# are left out: similar short posts there are independent opinions.
+NEAR_DUP_SOURCES = ("news",)
+NEAR_DUP_THRESHOLD = 0.6
+NEAR_DUP_MIN_TOKENS = 6
+
+# Sentiment backfill: worker processes (0 = one per CPU) and rows per chunk
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "0"))
+SENTIMENT_CHUNK_SIZE = int(os.getenv("SENTIMENT_CHUNK_SIZE", "2000"))
+# Entries kept in the in-memory front of the sentiment cache
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+
+# Rendered charts, keyed by their data (see charts.py); the least
+# recently used beyond CHART_CACHE_ENTRIES are removed
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", os.path.splitext(DB_PATH)[0] + "_charts")
+CHART_CACHE_ENTRIES = 64
+
+# Telemetry (see metrics.py). METRICS_FILE is rewritten after each crawl
+# cycle; "{process}" in it is replaced by the process name. METRICS_PORT
+# serves /metrics over HTTP from the process started by main.py (0 = off).
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Read-only HTTP API for dashboards (`main.py --serve`, see api.py)
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_CACHE_ENTRIES = 256
+
 # Optional API keys (for future upgrades)
 REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID", "")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET", "")
@@ -21,6 +212,9 @@ TWITTER_BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN", "")
 
 # Request settings
 REQUEST_TIMEOUT = 15
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 10
+HTTP_MAX_RETRIES = 2
 REQUEST_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
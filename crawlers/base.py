@@ -1,4 +1,23 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import config
+import seen_index
+from crawlers import http_client
+from matcher import ticker_terms
+from db import get_cursor, save_cursors, save_http_validators
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class FetchTask(NamedTuple):
+    """A single fetch against one host: ``crawler.<method>(*args)``."""
+
+    host: str
+    method: str
+    args: tuple = ()
 
 
 class BaseCrawler(ABC):
@@ -6,12 +25,122 @@ class BaseCrawler(ABC):
 
     name: str = "base"
 
+    def __init__(self):
+        self._pending_cursors = {}
+        self._pending_validators = {}
+        self.skipped = 0
+        self.errors = []
+
     @abstractmethod
-    def crawl(self) -> list[dict]:
-        """Fetch posts and return a list of post dicts.
+    def tasks(self) -> list[FetchTask]:
+        """Return the independent fetches that make up one crawl.
 
-        Each dict should have keys matching the posts table columns:
+        Each task's method is a generator yielding post dicts as they are
+        parsed, with keys matching the posts table columns:
         source, external_id, title, content, author, url,
         subreddit, score, num_comments, sentiment, published_at
         """
         ...
+
+    def run_task(self, task: FetchTask) -> Iterator[dict]:
+        """Execute one fetch task, yielding its posts."""
+        return getattr(self, task.method)(*task.args)
+
+    def crawl(self) -> Iterator[dict]:
+        """Run every task serially, yielding all posts."""
+        for task in self.tasks():
+            yield from self.run_task(task)
+
+    def is_seen(self, source: str, external_id: str) -> bool:
+        """True if the post is already stored; counts it as skipped."""
+        if seen_index.get_index().contains(source, external_id):
+            self.skipped += 1
+            return True
+        return False
+
+    def record_error(self, error: Exception):
+        """Note a fetch failure handled here to keep the posts parsed so far.
+
+        The engine adds it to the run's errors, so a queued task that hit
+        one is retried rather than completed.
+        """
+        self.errors.append(error)
+
+    def get_cursor(self, source: str, query: str):
+        """Return the stored cursor for a query, including any staged update."""
+        staged = self._pending_cursors.get((source, query))
+        return dict(staged) if staged else get_cursor(self.name, source, query)
+
+    def stage_cursor(self, source: str, query: str, **fields):
+        """Record a new cursor; it is saved by commit_cursors()."""
+        self._pending_cursors[(source, query)] = fields
+
+    def http_get(self, url: str, **kwargs):
+        """GET through http_client; new validators are saved by commit_cursors()."""
+        return http_client.get(url, validators=self._pending_validators, **kwargs)
+
+    def commit_cursors(self):
+        """Persist staged cursors and HTTP validators.
+
+        Call only once the posts are stored.
+        """
+        save_cursors(self.name, self._pending_cursors)
+        save_http_validators(self._pending_validators)
+        self._pending_cursors = {}
+        self._pending_validators = {}
+
+
+def format_timestamp(dt: datetime) -> str:
+    """Format a datetime as the UTC text stored in the database."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value):
+    """Parse stored UTC text back into an aware datetime (None passes through)."""
+    if not value:
+        return None
+    return datetime.strptime(value, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def cursor_floor(value):
+    """The oldest publish time still worth fetching behind a high-water mark.
+
+    Items can appear in search results or feeds a little after they were
+    published, so everything within config.CURSOR_GRACE_MINUTES of the
+    mark is fetched again and left to duplicate detection.
+    """
+    mark = parse_timestamp(value)
+    if mark is None:
+        return None
+    return mark - timedelta(minutes=config.CURSOR_GRACE_MINUTES)
+
+
+def search_terms(cashtags=False) -> list[str]:
+    """Search terms of every active ticker, phrases quoted for OR queries."""
+    terms = []
+    for symbol in config.TICKERS:
+        if cashtags:
+            terms.append(f"${symbol}")
+        terms.extend(f'"{term}"' if " " in term else term for term in ticker_terms(symbol))
+    return list(dict.fromkeys(terms))
+
+
+def batch_queries(parts, separator=" OR ") -> list[str]:
+    """Join parts into as few queries as fit in SEARCH_QUERY_MAX_CHARS each.
+
+    One fetch then serves many tickers; posts are attributed to tickers
+    by matcher.tag() when they are stored.
+    """
+    batches = []
+    current = ""
+    for part in parts:
+        joined = f"{current}{separator}{part}" if current else part
+        if current and len(joined) > config.SEARCH_QUERY_MAX_CHARS:
+            batches.append(current)
+            joined = part
+        current = joined
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,97 @@
+"""Shared HTTP client used by every crawler.
+
+One ``requests.Session`` with a pooled adapter keeps connections alive
+across fetches and crawler threads. Every request is paced through
+``ratelimit`` and, for conditional fetches, carries the ETag and
+Last-Modified validators stored in the ``http_cache`` table so unchanged
+resources come back as an empty 304. New validators are handed back to
+the caller rather than stored: saving them before the response's posts
+are written would turn a failed write into a 304 next time, and the
+posts would never be fetched again.
+"""
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+import ratelimit
+from db import get_http_validators
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=config.HTTP_POOL_CONNECTIONS,
+                pool_maxsize=config.HTTP_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(config.REQUEST_HEADERS)
+            _session = session
+        return _session
+
+
+def get(url: str, params=None, headers=None, conditional=True, validators=None):
+    """GET a URL through the shared session.
+
+    Returns the response, or None if the server answered 304 Not Modified.
+    For a conditional fetch, the ETag and Last-Modified of a fresh
+    response are put in the ``validators`` dict, keyed by URL, to be saved
+    with ``db.save_http_validators`` once its content is stored.
+    Raises ``requests.HTTPError`` for other error statuses. A 429 is retried
+    up to ``config.HTTP_MAX_RETRIES`` times once the host's rate limit,
+    which honors Retry-After, allows it.
+    """
+    session = get_session()
+    url = requests.Request("GET", url, params=params).prepare().url
+    host = urlsplit(url).hostname
+
+    request_headers = dict(headers or {})
+    if conditional:
+        stored = get_http_validators(url)
+        if stored:
+            etag, last_modified = stored
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+
+    for attempt in range(config.HTTP_MAX_RETRIES + 1):
+        ratelimit.acquire(host)
+        try:
+            with metrics.HTTP_SECONDS.time(host=host):
+                resp = session.get(url, headers=request_headers, timeout=config.REQUEST_TIMEOUT)
+        except requests.RequestException:
+            ratelimit.report(host, error=True)
+            metrics.HTTP_ERRORS.inc(host=host)
+            raise
+        ratelimit.report(host, resp.status_code, resp.headers)
+        metrics.HTTP_REQUESTS.inc(host=host, status=resp.status_code)
+        metrics.HTTP_BYTES.inc(len(resp.content), host=host)
+        if resp.status_code != 429:
+            break
+
+    if resp.status_code == 304:
+        logger.debug("Not modified: %s", url)
+        return None
+    resp.raise_for_status()
+
+    if conditional and validators is not None:
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if etag or last_modified:
+            validators[url] = (etag, last_modified)
+    return resp
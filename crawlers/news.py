@@ -1,16 +1,18 @@
 import hashlib
 import logging
-import time
-from datetime import datetime, timezone
-from urllib.parse import quote_plus
+from collections.abc import Iterator
+from datetime import timezone
+from urllib.parse import quote_plus, urlsplit
 
-import feedparser
-import requests
-from bs4 import BeautifulSoup
 from dateutil import parser as dateparser
 
 import config
-from crawlers.base import BaseCrawler
+import matcher
+from crawlers import feeds
+from crawlers.base import (
+    BaseCrawler, FetchTask, batch_queries, format_timestamp, search_terms,
+)
+from db import CURSOR_FIELDS
 
 logger = logging.getLogger(__name__)
 
@@ -18,127 +20,104 @@ logger = logging.getLogger(__name__)
 class NewsCrawler(BaseCrawler):
     name = "news"
 
-    def crawl(self) -> list[dict]:
-        posts = []
-        posts.extend(self._google_news_rss())
-        time.sleep(1)
-        posts.extend(self._yahoo_finance())
-        time.sleep(1)
-        posts.extend(self._marketwatch())
-        logger.info("News: fetched %d articles", len(posts))
-        return posts
-
-    def _google_news_rss(self) -> list[dict]:
-        results = []
-        for term in config.SEARCH_TERMS:
-            url = f"https://news.google.com/rss/search?q={quote_plus(term)}&hl=en-US&gl=US&ceid=US:en"
-            try:
-                feed = feedparser.parse(url)
-                for entry in feed.entries[:20]:
-                    pub_date = None
-                    if hasattr(entry, "published"):
-                        try:
-                            pub_date = dateparser.parse(entry.published).isoformat()
-                        except Exception:
-                            pass
-
-                    ext_id = hashlib.md5(entry.get("link", "").encode()).hexdigest()
-                    results.append(
-                        {
-                            "source": "news",
-                            "external_id": f"gnews_{ext_id}",
-                            "title": entry.get("title", ""),
-                            "content": entry.get("summary", "")[:2000],
-                            "author": entry.get("source", {}).get("title", ""),
-                            "url": entry.get("link", ""),
-                            "subreddit": None,
-                            "score": None,
-                            "num_comments": None,
-                            "sentiment": None,
-                            "published_at": pub_date,
-                        }
-                    )
-            except Exception as e:
-                logger.warning("Google News RSS failed for %s: %s", term, e)
-            time.sleep(0.5)
-        return results
+    def tasks(self) -> list[FetchTask]:
+        return [
+            FetchTask(urlsplit(feed["url"]).hostname, "_news_feed", (feed["name"], query))
+            for feed in config.NEWS_FEEDS
+            for query in self._feed_queries(feed)
+        ]
 
-    def _yahoo_finance(self) -> list[dict]:
-        url = "https://feeds.finance.yahoo.com/rss/2.0/headline?s=NVDA&region=US&lang=en-US"
-        try:
-            feed = feedparser.parse(url)
-        except Exception as e:
-            logger.warning("Yahoo Finance RSS failed: %s", e)
-            return []
+    def _feed_queries(self, feed) -> list[str]:
+        if feed.get("batch") == "terms":
+            return batch_queries(search_terms())
+        if feed.get("batch") == "symbols":
+            return batch_queries(config.TICKERS, ",")
+        return [feed["query"]]
 
-        results = []
-        for entry in feed.entries[:20]:
-            pub_date = None
-            if hasattr(entry, "published"):
-                try:
-                    pub_date = dateparser.parse(entry.published).isoformat()
-                except Exception:
-                    pass
+    def _fetch_feed(self, url: str):
+        """Fetch and parse a feed. Returns None if it has not changed."""
+        resp = self.http_get(url)
+        if resp is None:
+            return None
+        return feeds.parse(resp.content)
 
-            ext_id = entry.get("id", "") or entry.get("link", "")
-            ext_id = hashlib.md5(ext_id.encode()).hexdigest()
-            results.append(
-                {
-                    "source": "news",
-                    "external_id": f"yahoo_{ext_id}",
-                    "title": entry.get("title", ""),
-                    "content": entry.get("summary", "")[:2000],
-                    "author": "Yahoo Finance",
-                    "url": entry.get("link", ""),
-                    "subreddit": None,
-                    "score": None,
-                    "num_comments": None,
-                    "sentiment": None,
-                    "published_at": pub_date,
-                }
-            )
-        return results
+    def _new_entries(self, entries, prefix: str, query: str, limit=None, id_field="id") -> list:
+        """Return (entry, external_id, published_at) for unseen entries.
 
-    def _marketwatch(self) -> list[dict]:
-        """Fetch MarketWatch headlines via Dow Jones RSS, filtered for NVIDIA."""
-        url = "https://feeds.content.dowjones.io/public/rss/mw_realtimeheadlines"
-        try:
-            feed = feedparser.parse(url)
-        except Exception as e:
-            logger.warning("MarketWatch RSS failed: %s", e)
-            return []
+        External ids are ``<prefix>_<md5 of the entry's id_field or link>``.
+        Entries already stored are skipped before their dates are parsed,
+        and only entries that are kept are tagged.
+        Feeds are fetched whole and search feeds are in relevance order, so
+        an article indexed late can sit below newer ones with an older date;
+        every unseen entry is taken rather than cutting at the cursor's
+        date. Only the very first crawl is capped at ``limit``; the rest of
+        the feed is taken on the next.
+        """
+        cursor = self.get_cursor(prefix, query) or dict.fromkeys(CURSOR_FIELDS)
+        if cursor["newest_at"] is None and limit is not None:
+            entries = entries[:limit]
 
-        keywords = {"nvda", "nvidia", "geforce", "jensen"}
         results = []
-        for entry in feed.entries:
-            title = entry.get("title", "")
-            summary = entry.get("summary", "")
-            text = f"{title} {summary}".lower()
-            if not any(kw in text for kw in keywords):
+        newest = cursor["newest_at"]
+        for entry in entries:
+            key = entry.get(id_field) or entry["link"]
+            ext_id = f"{prefix}_{hashlib.md5(key.encode()).hexdigest()}"
+            if self.is_seen("news", ext_id):
                 continue
 
             pub_date = None
-            if hasattr(entry, "published"):
+            if entry["published"]:
                 try:
-                    pub_date = dateparser.parse(entry.published).isoformat()
+                    published = dateparser.parse(entry["published"])
+                    if published.tzinfo is None:
+                        published = published.replace(tzinfo=timezone.utc)
+                    pub_date = format_timestamp(published)
                 except Exception:
                     pass
+            if pub_date and pub_date > (newest or ""):
+                newest = pub_date
+            if "tags" not in entry:
+                entry["tags"], entry["ticker"] = matcher.tag(entry["title"], entry["summary"])
+            results.append((entry, ext_id, pub_date))
 
-            ext_id = entry.get("id", "") or entry.get("link", "")
-            ext_id = hashlib.md5(ext_id.encode()).hexdigest()
-            results.append(
-                {
-                    "source": "news",
-                    "external_id": f"mw_{ext_id}",
-                    "title": title,
-                    "content": summary[:2000],
-                    "author": "MarketWatch",
-                    "url": entry.get("link", ""),
-                    "subreddit": None,
-                    "score": None,
-                    "num_comments": None,
-                    "sentiment": None,
-                    "published_at": pub_date,
-                }
-            )
+        cursor["newest_at"] = newest
+        self.stage_cursor(prefix, query, **cursor)
         return results
+
+    def _news_feed(self, name: str, query: str) -> Iterator[dict]:
+        """Fetch one configured feed for one query."""
+        feed = next(f for f in config.NEWS_FEEDS if f["name"] == name)
+        url = feed["url"].format(query=quote_plus(query))
+        try:
+            entries = self._fetch_feed(url)
+        except Exception as e:
+            logger.warning("%s feed failed for %s: %s", name, query, e)
+            self.record_error(e)
+            return
+        if entries is None:
+            return
+
+        if feed.get("relevant_only"):
+            # Irrelevant entries must not count towards the cursor or limit
+            for entry in entries:
+                entry["tags"], entry["ticker"] = matcher.tag(entry["title"], entry["summary"])
+            entries = [entry for entry in entries if entry["tags"]]
+
+        for entry, ext_id, pub_date in self._new_entries(
+            entries, name, query, feed.get("limit"), feed.get("id_field", "id")
+        ):
+            yield {
+                "source": "news",
+                "external_id": ext_id,
+                "title": entry["title"],
+                "content": entry["summary"][:2000],
+                "author": feed.get("author") or entry["source"],
+                "url": entry["link"],
+                "subreddit": None,
+                "score": None,
+                "num_comments": None,
+                "sentiment": None,
+                "published_at": pub_date,
+                "tags": entry["tags"],
+                "ticker": entry["ticker"],
+            }
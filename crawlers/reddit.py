@@ -1,53 +1,133 @@
 import logging
-import time
-from datetime import datetime, timezone
-
-import requests
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
 
 import config
-from crawlers.base import BaseCrawler
+import metrics
+from crawlers.base import (
+    BaseCrawler, FetchTask, batch_queries, cursor_floor, format_timestamp, search_terms,
+)
+from db import CURSOR_FIELDS
 
 logger = logging.getLogger(__name__)
 
+# Reddit search only filters by these fixed windows (t=...), smallest first
+_TIME_WINDOWS = [
+    ("day", timedelta(days=1)),
+    ("week", timedelta(weeks=1)),
+    ("month", timedelta(days=31)),
+    ("year", timedelta(days=365)),
+]
+
+
+def time_window(floor) -> str:
+    """The narrowest search window that still reaches back to ``floor``."""
+    age = datetime.now(timezone.utc) - floor
+    for window, span in _TIME_WINDOWS:
+        if age < span:
+            return window
+    return "all"
+
 
 class RedditCrawler(BaseCrawler):
     name = "reddit"
+    host = "www.reddit.com"
+
+    def tasks(self) -> list[FetchTask]:
+        return [
+            FetchTask(self.host, "_search_subreddit", (subreddit, query))
+            for subreddit in config.SUBREDDITS
+            for query in batch_queries(search_terms())
+        ]
+
+    def _search_subreddit(self, subreddit: str, query: str) -> Iterator[dict]:
+        """Fetch posts newer than the query's cursor, newest first.
+
+        The first crawl of a query takes one page of the last day. After
+        that, pages are followed until they reach already-seen posts. If a
+        burst is deeper than CURSOR_MAX_PAGES, the unread remainder is
+        recorded as a resume point and paged through on later cycles.
+        Searches span the narrowest Reddit window (day ... all) that still
+        reaches back to the cursor, so a query resumed after a long pause
+        does not silently skip what was posted in between.
+        """
+        cursor = self.get_cursor(subreddit, query)
+        if cursor is None or cursor["newest_at"] is None:
+            cursor = dict.fromkeys(CURSOR_FIELDS)
+            yield from self._fetch_pages(subreddit, query, None, None, 1, "day", cursor)
+            self.stage_cursor(subreddit, query, **cursor)
+            return
 
-    def crawl(self) -> list[dict]:
-        posts = []
-        for subreddit in config.SUBREDDITS:
-            for term in config.SEARCH_TERMS:
-                posts.extend(self._search_subreddit(subreddit, term))
-                time.sleep(1)  # rate-limit courtesy
-        logger.info("Reddit: fetched %d posts", len(posts))
-        return posts
+        floor = cursor_floor(cursor["newest_at"])
+        old_mark = cursor["newest_at"]
+        after, reached = yield from self._fetch_pages(
+            subreddit, query, None, floor, config.CURSOR_MAX_PAGES, time_window(floor), cursor
+        )
+        if not reached and after:
+            logger.warning(
+                "r/%s q=%s: more than %d pages of new posts, resuming from %s next",
+                subreddit, query, config.CURSOR_MAX_PAGES, after,
+            )
+            # Paging back from the new token also covers any older gap
+            cursor["resume_floor"] = cursor["resume_floor"] or old_mark
+            cursor["resume_token"] = after
+        elif cursor["resume_token"]:
+            resume_floor = cursor_floor(cursor["resume_floor"])
+            after, reached = yield from self._fetch_pages(
+                subreddit, query, cursor["resume_token"], resume_floor,
+                config.CURSOR_MAX_PAGES, time_window(resume_floor), cursor,
+            )
+            if reached or not after:
+                cursor["resume_token"] = cursor["resume_floor"] = None
+            else:
+                cursor["resume_token"] = after
+
+        self.stage_cursor(subreddit, query, **cursor)
+
+    def _fetch_pages(self, subreddit, query, after, stop_at, max_pages, window, cursor):
+        """Page through search results from ``after`` until ``stop_at``.
 
-    def _search_subreddit(self, subreddit: str, query: str) -> list[dict]:
+        Yields posts and advances the cursor's newest mark as it goes.
+        Returns (next after token, whether stop_at was reached).
+        """
         url = f"https://www.reddit.com/r/{subreddit}/search.json"
         params = {
             "q": query,
             "sort": "new",
             "restrict_sr": "on",
-            "limit": 25,
-            "t": "day",
+            "limit": config.REDDIT_PAGE_SIZE,
+            "t": window,
         }
         headers = {"User-Agent": config.REDDIT_USER_AGENT}
 
-        try:
-            resp = requests.get(
-                url, params=params, headers=headers, timeout=config.REQUEST_TIMEOUT
-            )
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as e:
-            logger.warning("Reddit search failed for r/%s q=%s: %s", subreddit, query, e)
-            return []
-
-        results = []
-        for child in data.get("data", {}).get("children", []):
-            p = child.get("data", {})
-            results.append(
-                {
+        for _ in range(max_pages):
+            if after:
+                params["after"] = after
+            try:
+                # Only the head of the listing is worth revalidating
+                resp = self.http_get(url, params=params, headers=headers, conditional=not after)
+                if resp is None:
+                    return None, True
+                with metrics.PARSE_SECONDS.time(format="json"):
+                    data = resp.json()
+            except Exception as e:
+                logger.warning("Reddit search failed for r/%s q=%s: %s", subreddit, query, e)
+                self.record_error(e)
+                return after, False
+
+            listing = data.get("data", {})
+            for child in listing.get("children", []):
+                p = child.get("data", {})
+                created = datetime.fromtimestamp(p.get("created_utc", 0), tz=timezone.utc)
+                if stop_at is not None and created < stop_at:
+                    return None, True
+                published_at = format_timestamp(created)
+                if published_at > (cursor["newest_at"] or ""):
+                    cursor["newest_id"] = p.get("id", "")
+                    cursor["newest_at"] = published_at
+                if self.is_seen("reddit", p.get("id", "")):
+                    continue
+                yield {
                     "source": "reddit",
                     "external_id": p.get("id", ""),
                     "title": p.get("title", ""),
@@ -58,9 +138,9 @@ class RedditCrawler(BaseCrawler):
                     "score": p.get("score", 0),
                     "num_comments": p.get("num_comments", 0),
                     "sentiment": None,
-                    "published_at": datetime.fromtimestamp(
-                        p.get("created_utc", 0), tz=timezone.utc
-                    ).isoformat(),
+                    "published_at": published_at,
                 }
-            )
-        return results
+            after = listing.get("after")
+            if not after:
+                return None, True
+        return after, False
@@ -1,22 +1,26 @@
 import logging
+from collections.abc import Iterator
 
 import config
-from crawlers.base import BaseCrawler
+import ratelimit
+from crawlers.base import BaseCrawler, FetchTask, batch_queries, format_timestamp, search_terms
+from db import CURSOR_FIELDS
 
 logger = logging.getLogger(__name__)
 
 
 class TwitterCrawler(BaseCrawler):
     name = "twitter"
+    host = "twitter.com"
 
-    def crawl(self) -> list[dict]:
-        """Attempt to scrape Twitter using snscrape.
+    def tasks(self) -> list[FetchTask]:
+        """Scrape Twitter using snscrape, one task per batch of search terms.
 
         snscrape may break if Twitter/X changes their site structure.
         Falls back gracefully with a warning if unavailable.
         """
         try:
-            return self._scrape_with_snscrape()
+            import snscrape.modules.twitter  # noqa: F401
         except ImportError:
             logger.warning(
                 "snscrape not installed or incompatible. "
@@ -27,37 +31,95 @@ class TwitterCrawler(BaseCrawler):
         except Exception as e:
             logger.warning("Twitter crawl failed: %s", e)
             return []
+        return [
+            FetchTask(self.host, "_scrape_with_snscrape", (term,))
+            for term in batch_queries(search_terms(cashtags=True))
+        ]
 
-    def _scrape_with_snscrape(self) -> list[dict]:
+    def _scrape_with_snscrape(self, term: str) -> Iterator[dict]:
+        """Fetch tweets newer than the term's cursor.
+
+        Tweet ids grow over time, so the cursor is the newest id seen. A
+        burst deeper than TWITTER_MAX_TWEETS leaves a max_id resume point
+        that later cycles page back from until they meet the old mark.
+        """
         import snscrape.modules.twitter as sntwitter
 
-        results = []
-        for term in config.TWITTER_SEARCH_TERMS:
-            query = f"{term} lang:en"
-            try:
-                scraper = sntwitter.TwitterSearchScraper(query)
-                for i, tweet in enumerate(scraper.get_items()):
-                    if i >= 50:
-                        break
-                    results.append(
-                        {
-                            "source": "twitter",
-                            "external_id": str(tweet.id),
-                            "title": "",
-                            "content": tweet.rawContent[:2000],
-                            "author": tweet.user.username if tweet.user else "",
-                            "url": tweet.url,
-                            "subreddit": None,
-                            "score": tweet.likeCount,
-                            "num_comments": tweet.replyCount,
-                            "sentiment": None,
-                            "published_at": tweet.date.isoformat()
-                            if tweet.date
-                            else None,
-                        }
-                    )
-            except Exception as e:
-                logger.warning("snscrape search failed for '%s': %s", term, e)
-
-        logger.info("Twitter: fetched %d tweets", len(results))
-        return results
+        query = f"({term}) lang:en"
+        cursor = self.get_cursor("search", term)
+        if cursor is None or cursor["newest_id"] is None:
+            cursor = dict.fromkeys(CURSOR_FIELDS)
+            yield from self._search(sntwitter, query, None, 50, cursor)
+        else:
+            old_mark = cursor["newest_id"]
+            reached, oldest = yield from self._search(
+                sntwitter, query, int(old_mark), config.TWITTER_MAX_TWEETS, cursor
+            )
+            if not reached and oldest is not None:
+                logger.warning(
+                    "Twitter '%s': more than %d new tweets, resuming older ones next cycle",
+                    term, config.TWITTER_MAX_TWEETS,
+                )
+                cursor["resume_floor"] = cursor["resume_floor"] or old_mark
+                cursor["resume_token"] = str(oldest - 1)
+            elif cursor["resume_token"]:
+                reached, oldest = yield from self._search(
+                    sntwitter, f"{query} max_id:{cursor['resume_token']}",
+                    int(cursor["resume_floor"]), config.TWITTER_MAX_TWEETS, cursor,
+                )
+                if reached or oldest is None:
+                    cursor["resume_token"] = cursor["resume_floor"] = None
+                else:
+                    cursor["resume_token"] = str(oldest - 1)
+        self.stage_cursor("search", term, **cursor)
+
+    def _search(self, sntwitter, query, stop_id, limit, cursor):
+        """Yield up to ``limit`` tweets newer than ``stop_id``, newest first.
+
+        Advances the cursor's newest mark as it goes, and reports the
+        search's outcome to the host's rate limiter. Returns (whether
+        stop_id or the end of results was reached, oldest id yielded).
+        """
+        count = 0
+        oldest = None
+        failed = False
+        ratelimit.acquire(self.host)
+        try:
+            scraper = sntwitter.TwitterSearchScraper(query)
+            for tweet in scraper.get_items():
+                if stop_id is not None and tweet.id <= stop_id:
+                    return True, oldest
+                if count >= limit:
+                    return False, oldest
+                count += 1
+                oldest = tweet.id if oldest is None else min(oldest, tweet.id)
+                if tweet.id > int(cursor["newest_id"] or 0):
+                    cursor["newest_id"] = str(tweet.id)
+                    cursor["newest_at"] = format_timestamp(tweet.date) if tweet.date else None
+                if self.is_seen("twitter", str(tweet.id)):
+                    continue
+                yield {
+                    "source": "twitter",
+                    "external_id": str(tweet.id),
+                    "title": "",
+                    "content": tweet.rawContent[:2000],
+                    "author": tweet.user.username if tweet.user else "",
+                    "url": tweet.url,
+                    "subreddit": None,
+                    "score": tweet.likeCount,
+                    "num_comments": tweet.replyCount,
+                    "sentiment": None,
+                    "published_at": format_timestamp(tweet.date)
+                    if tweet.date
+                    else None,
+                }
+        except Exception as e:
+            failed = True
+            ratelimit.report(self.host, error=True)
+            logger.warning("snscrape search failed for '%s': %s", query, e)
+            self.record_error(e)
+            return False, oldest
+        finally:
+            if not failed:
+                ratelimit.report(self.host)
+        return True, oldest
@@ -0,0 +1,129 @@
+"""Long-running daemon answering CLI commands over a local Unix socket.
+
+A one-off ``main.py --show`` or ``--analyze`` pays for opening the
+database, loading the VADER lexicon, warming the sentiment cache and
+importing matplotlib every time. ``main.py --daemon`` does that once and
+then serves commands on ``config.DAEMON_SOCKET``; main.py sends commands
+to it when it is running and runs them itself otherwise.
+
+The protocol is one JSON object per line each way. A request is
+``{"command": name, "args": {...}}`` and the reply is
+``{"ok": true, "output": text}`` or ``{"ok": false, "error": message}``,
+where output is what the command printed. Commands run one at a time.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Unavailable(Exception):
+    """No daemon is listening on the socket."""
+
+
+class CommandFailed(Exception):
+    """The daemon ran the command and it raised."""
+
+
+def request(command: str, path=None, **args) -> str:
+    """Run ``command`` in the daemon and return its output."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path or config.DAEMON_SOCKET)
+        except OSError as e:
+            raise Unavailable(str(e)) from e
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps({"command": command, "args": args}).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise Unavailable("daemon closed the connection")
+    reply = json.loads(line)
+    if not reply["ok"]:
+        raise CommandFailed(reply["error"])
+    return reply["output"]
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, commands):
+        self.commands = commands
+        self.command_lock = threading.Lock()
+        super().__init__(path, _Handler)
+
+    def run(self, command, args) -> str:
+        handler = self.commands.get(command)
+        if handler is None:
+            raise ValueError(f"unknown command {command!r}")
+        output = io.StringIO()
+        # Commands print their results; one at a time, so stdout can be captured
+        with self.command_lock, contextlib.redirect_stdout(output):
+            handler(**args)
+        return output.getvalue()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            message = json.loads(line)
+            output = self.server.run(message["command"], message.get("args", {}))
+            reply = {"ok": True, "output": output}
+        except Exception as e:
+            logger.exception("Daemon command failed")
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    try:
+        request("ping", path=path)
+    except Unavailable:
+        os.unlink(path)
+        return
+    raise RuntimeError(f"a daemon is already listening on {path}")
+
+
+def serve(commands: dict, warm=None, path=None):
+    """Serve ``commands`` ({name: function printing its result}) until stopped.
+
+    ``warm`` is called first to load whatever the commands should find
+    ready. The socket is only accessible to the current user.
+    """
+    path = path or config.DAEMON_SOCKET
+    _remove_stale_socket(path)
+    if warm:
+        warm()
+    commands = {"ping": lambda: print("pong"), **commands}
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(path, commands)
+    finally:
+        os.umask(old_umask)
+    logger.info("Daemon listening on %s", path)
+    # Stop cleanly, removing the socket, when terminated as a service
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
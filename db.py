@@ -1,5 +1,17 @@
+import atexit
+import logging
+import os
+import re
 import sqlite3
-from config import DB_PATH
+import threading
+import urllib.parse
+
+import config
+import matcher
+import metrics
+import neardup
+
+logger = logging.getLogger(__name__)
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS posts (
@@ -18,83 +30,660 @@ CREATE TABLE IF NOT EXISTS posts (
     crawled_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(source, external_id)
 );
+
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sentiment_cache (
+    text_hash TEXT NOT NULL,
+    analyzer_version TEXT NOT NULL,
+    sentiment REAL NOT NULL,
+    PRIMARY KEY (text_hash, analyzer_version)
+) WITHOUT ROWID;
+
+-- High-water marks per (crawler, source, query) for incremental crawls.
+-- resume_token/resume_floor mark a backlog gap still being paged through.
+CREATE TABLE IF NOT EXISTS crawl_cursors (
+    crawler TEXT NOT NULL,
+    source TEXT NOT NULL,
+    query TEXT NOT NULL,
+    newest_id TEXT,
+    newest_at DATETIME,
+    resume_token TEXT,
+    resume_floor TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (crawler, source, query)
+);
+
+-- Yield per crawl source (one crawler fetch task) for adaptive cadence.
+-- Times are unix seconds; new_per_hour is an EWMA of new posts per hour.
+CREATE TABLE IF NOT EXISTS source_stats (
+    crawler TEXT NOT NULL,
+    method TEXT NOT NULL,
+    args TEXT NOT NULL,
+    new_per_hour REAL,
+    fetches INTEGER NOT NULL DEFAULT 0,
+    last_new INTEGER,
+    last_fetched_at REAL,
+    last_enqueued_at REAL,
+    PRIMARY KEY (crawler, method, args)
+) WITHOUT ROWID;
+
+-- One row per crawl cycle, for tracking performance over time. Stage
+-- seconds are summed over threads; metrics holds every metric's change
+-- during the cycle as JSON.
+CREATE TABLE IF NOT EXISTS crawl_runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    started_at DATETIME NOT NULL,
+    duration_seconds REAL NOT NULL,
+    tasks INTEGER NOT NULL,
+    fetched INTEGER NOT NULL,
+    new_posts INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    requests INTEGER NOT NULL,
+    response_bytes INTEGER NOT NULL,
+    fetch_seconds REAL NOT NULL,
+    parse_seconds REAL NOT NULL,
+    score_seconds REAL NOT NULL,
+    write_seconds REAL NOT NULL,
+    metrics TEXT
+);
+
+-- Per-day, per-source sentiment rollup maintained as posts are scored.
+-- Migration 4 re-keys it by ticker (_DAILY_SENTIMENT_TABLE).
+CREATE TABLE IF NOT EXISTS daily_sentiment (
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    weighted_sum REAL NOT NULL DEFAULT 0,
+    weight_total REAL NOT NULL DEFAULT 0,
+    post_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, source)
+) WITHOUT ROWID;
+"""
+
+# Per-ticker, per-day, per-source sentiment rollup maintained as posts are
+# scored. Only cluster representatives (cluster_id = id) are counted, so a
+# story syndicated by several outlets counts once. A post counts toward its
+# primary ticker (posts.ticker) only, not every ticker in its tags.
+_DAILY_SENTIMENT_TABLE = """
+CREATE TABLE IF NOT EXISTS daily_sentiment (
+    ticker TEXT NOT NULL,
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    weighted_sum REAL NOT NULL DEFAULT 0,
+    weight_total REAL NOT NULL DEFAULT 0,
+    post_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ticker, day, source)
+) WITHOUT ROWID;
+"""
+
+# Reddit posts are weighted by upvotes, everything else counts once
+SENTIMENT_WEIGHT_SQL = (
+    "CASE WHEN p.source = 'reddit' THEN MAX(COALESCE(p.score, 1), 1) ELSE 1 END"
+)
+
+# Read by sentiment.get_daily_sentiment()
+DAILY_SENTIMENT_SQL = """SELECT day, source, weighted_sum, weight_total, post_count
+    FROM daily_sentiment
+    WHERE ticker = ? AND day >= ? AND post_count > 0
+    ORDER BY day"""
+
+_UPSERT_DAILY_SENTIMENT = """
+    ON CONFLICT(ticker, day, source) DO UPDATE SET
+        weighted_sum = weighted_sum + excluded.weighted_sum,
+        weight_total = weight_total + excluded.weight_total,
+        post_count = post_count + excluded.post_count
 """
 
 
+POST_COLUMNS = (
+    "source", "external_id", "title", "content", "author", "url",
+    "subreddit", "score", "num_comments", "sentiment", "published_at", "tags",
+    "ticker",
+)
+
+# published_at is stored as UTC 'YYYY-MM-DD HH:MM:SS' so it sorts and
+# compares as text; posts without a usable date get the crawl time.
+_POST_VALUE_SQL = {"published_at": "COALESCE(datetime({}), CURRENT_TIMESTAMP)"}
+
+_SENTIMENT = POST_COLUMNS.index("sentiment")
+
+INSERT_POST_SQL = (
+    f"INSERT OR IGNORE INTO posts ({', '.join(POST_COLUMNS)}) "
+    f"VALUES ({', '.join(_POST_VALUE_SQL.get(c, '{}').format('?') for c in POST_COLUMNS)})"
+)
+
+# Batches are staged in a temp table and copied into posts by one
+# statement. Every INSERT on posts opens a savepoint for its triggers, and
+# FTS5 writes out its pending index at each savepoint, so inserting a batch
+# row by row built and merged one full-text segment per post.
+_POST_STAGE_TABLE = f"CREATE TEMP TABLE IF NOT EXISTS post_stage ({', '.join(POST_COLUMNS)})"
+
+_STAGE_POST_SQL = f"INSERT INTO temp.post_stage VALUES ({', '.join('?' * len(POST_COLUMNS))})"
+
+_INSERT_STAGED_POSTS_SQL = (
+    f"INSERT OR IGNORE INTO posts ({', '.join(POST_COLUMNS)}) "
+    f"SELECT {', '.join(_POST_VALUE_SQL.get(c, '{}').format(c) for c in POST_COLUMNS)} "
+    f"FROM temp.post_stage ORDER BY rowid"
+)
+
+# Stay well under SQLite's bound-parameter limit in IN (...) lookups
+_MAX_PARAMS = 500
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.RLock()
+
+
+class _PooledConnection(sqlite3.Connection):
+    """A read connection whose close() hands it back to the pool."""
+
+    def close(self):
+        _release(self)
+
+
+_idle = {}
+_idle_lock = threading.Lock()
+_read_only = False
+
+
+def use_read_only_connections(enabled=True):
+    """Open this process's pooled connections read-only from now on.
+
+    For processes that only serve queries, so no code path in them can
+    write to the database. The writer connection is unaffected.
+    """
+    global _read_only
+    _read_only = enabled
+
+
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+    """Borrow a connection from this process's pool, opening one if none is idle.
+
+    Callers close() it when done, as with a plain connection; it is then
+    kept for reuse (up to DB_READ_POOL_SIZE idle) instead of closed, so
+    repeated reads skip the open and the schema parse.
+    """
+    key = (os.getpid(), config.DB_PATH, _read_only)
+    with _idle_lock:
+        idle = _idle.get(key)
+        if idle:
+            return idle.pop()
+    if _read_only:
+        uri = f"file:{urllib.parse.quote(os.path.abspath(config.DB_PATH))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, factory=_PooledConnection, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(config.DB_PATH, factory=_PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.pool_key = key
     return conn
 
 
+def _release(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    with _idle_lock:
+        idle = _idle.setdefault(conn.pool_key, [])
+        if conn.pool_key[0] == os.getpid() and len(idle) < config.DB_READ_POOL_SIZE:
+            idle.append(conn)
+            return
+    sqlite3.Connection.close(conn)
+
+
+def close_connections():
+    """Close this process's idle pooled connections."""
+    with _idle_lock:
+        for (pid, _, _), idle in list(_idle.items()):
+            if pid == os.getpid():
+                for conn in idle:
+                    sqlite3.Connection.close(conn)
+                idle.clear()
+
+
+def get_writer():
+    """Return the long-lived write connection for this process.
+
+    The connection runs in WAL mode so readers never block it, and is
+    shared across threads; callers must hold ``_writer_lock`` while using
+    it. A forked child opens its own instead of reusing the parent's.
+    """
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            conn = sqlite3.connect(config.DB_PATH, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{config.DB_CACHE_KB}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(_POST_STAGE_TABLE)
+            _writer, _writer_pid = conn, os.getpid()
+        return _writer
+
+
+def close_writer():
+    """Close the write connection, if this process opened one."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.close()
+        _writer = None
+
+
+atexit.register(close_writer)
+atexit.register(close_connections)
+
+
+# Shipped migrations are never edited, and neither is this helper they
+# call: it rebuilds the rollup as keyed before tickers, counting every
+# scored post. Whatever it builds is replaced once migrate() finishes.
+def _rebuild_daily_sentiment(conn):
+    conn.execute("DELETE FROM daily_sentiment")
+    conn.execute(
+        f"""INSERT INTO daily_sentiment
+                (day, source, weighted_sum, weight_total, post_count)
+            SELECT date(p.published_at), p.source,
+                   SUM(CAST(p.sentiment AS REAL) * {SENTIMENT_WEIGHT_SQL}),
+                   SUM({SENTIMENT_WEIGHT_SQL}),
+                   COUNT(*)
+            FROM posts p
+            WHERE p.sentiment IS NOT NULL AND date(p.published_at) IS NOT NULL
+            GROUP BY 1, 2"""
+    )
+
+
+def _migrate_published_at_and_indexes(conn):
+    """Normalize published_at to UTC text and index the hot queries."""
+    conn.execute(
+        """UPDATE posts
+           SET published_at = COALESCE(datetime(published_at), datetime(crawled_at))"""
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_posts_unscored ON posts(id) WHERE sentiment IS NULL"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_posts_published_source ON posts(published_at, source)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_posts_source_published ON posts(source, published_at)"
+    )
+    _rebuild_daily_sentiment(conn)
+
+
+def _migrate_near_duplicate_clusters(conn):
+    """Cluster near-duplicate posts through a MinHash LSH index."""
+    conn.execute("ALTER TABLE posts ADD COLUMN cluster_id INTEGER")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS lsh_bands (
+               band_key INTEGER NOT NULL,
+               post_id INTEGER NOT NULL,
+               PRIMARY KEY (band_key, post_id)
+           ) WITHOUT ROWID"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_cluster ON posts(cluster_id)")
+    _assign_clusters(conn, 0)
+    _rebuild_daily_sentiment(conn)
+
+
+def _migrate_post_tags(conn):
+    """Tag posts with the search terms they mention."""
+    conn.execute("ALTER TABLE posts ADD COLUMN tags TEXT")
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, title, content FROM posts WHERE id > ? ORDER BY id LIMIT 1000",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        conn.executemany(
+            "UPDATE posts SET tags = ? WHERE id = ?",
+            [(matcher.tags(title, content), post_id) for post_id, title, content in rows],
+        )
+
+
+def _migrate_tickers(conn):
+    """Attribute posts to tickers and key the daily rollup by ticker."""
+    conn.execute("ALTER TABLE posts ADD COLUMN ticker TEXT")
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, title, content FROM posts WHERE id > ? ORDER BY id LIMIT 1000",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for post_id, title, content in rows:
+            tags, ticker = matcher.tag(title, content)
+            # Everything stored before tickers existed was crawled for NVDA
+            updates.append((tags, ticker or "NVDA", post_id))
+        conn.executemany("UPDATE posts SET tags = ?, ticker = ? WHERE id = ?", updates)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_posts_ticker_published ON posts(ticker, published_at)"
+    )
+    conn.execute("DROP TABLE daily_sentiment")
+    conn.execute(_DAILY_SENTIMENT_TABLE)
+
+
+def _migrate_full_text_search(conn):
+    """Index post titles and content for full-text search."""
+    # External content: the index stores no copy of the text, and triggers
+    # keep it in step with posts. Sentiment and cluster updates don't touch it.
+    conn.execute(
+        """CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+               title, content,
+               content='posts', content_rowid='id',
+               tokenize='porter unicode61 remove_diacritics 2'
+           )"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+               INSERT INTO posts_fts (rowid, title, content)
+               VALUES (new.id, new.title, new.content);
+           END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+               INSERT INTO posts_fts (posts_fts, rowid, title, content)
+               VALUES ('delete', old.id, old.title, old.content);
+           END"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts
+           BEGIN
+               INSERT INTO posts_fts (posts_fts, rowid, title, content)
+               VALUES ('delete', old.id, old.title, old.content);
+               INSERT INTO posts_fts (rowid, title, content)
+               VALUES (new.id, new.title, new.content);
+           END"""
+    )
+    conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+# Schema changes applied in order on top of SCHEMA. The database's
+# PRAGMA user_version records how many have run; append, never reorder.
+MIGRATIONS = [
+    _migrate_published_at_and_indexes,
+    _migrate_near_duplicate_clusters,
+    _migrate_post_tags,
+    _migrate_tickers,
+    _migrate_full_text_search,
+]
+
+
+def migrate():
+    """Apply pending migrations, each in its own transaction.
+
+    Migrations may change what the daily_sentiment rollup counts, so it
+    is rebuilt once after any have run.
+    """
+    with _writer_lock:
+        conn = get_writer()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+            logger.info("Applied migration %d: %s", number, migration.__doc__)
+        if version < len(MIGRATIONS):
+            with conn:
+                _recompute_daily_sentiment(conn)
+
+
 def init_db():
     conn = get_connection()
     conn.executescript(SCHEMA)
+    needs_rollup = conn.execute(
+        """SELECT NOT EXISTS (SELECT 1 FROM daily_sentiment)
+                  AND EXISTS (SELECT 1 FROM posts WHERE sentiment IS NOT NULL)"""
+    ).fetchone()[0]
     conn.close()
+    migrate()
+    if needs_rollup:
+        rebuild_daily_sentiment()
+
+
+def _tag_posts(conn, after_id):
+    """Tag posts with id > after_id that arrived without tags or a ticker.
+
+    Crawlers that tag posts themselves (news) pass both along; the few of
+    those that matched nothing are checked again here, and match nothing.
+    """
+    # Unary + keeps the ticker index, which holds every untagged post, out
+    rows = conn.execute(
+        "SELECT id, title, content FROM posts WHERE id > ? AND +ticker IS NULL AND tags IS NULL",
+        (after_id,),
+    ).fetchall()
+    conn.executemany(
+        "UPDATE posts SET tags = ?, ticker = ? WHERE id = ?",
+        [(*matcher.tag(title, content), post_id) for post_id, title, content in rows],
+    )
+
+
+def _assign_clusters(conn, after_id):
+    """Give every post with id > after_id a cluster_id, in id order.
+
+    A post from NEAR_DUP_SOURCES joins the lowest cluster among earlier
+    posts at least NEAR_DUP_THRESHOLD similar to it, found through the
+    lsh_bands index; otherwise it starts its own cluster, so the earliest
+    post of a story is its representative (cluster_id = id). Posts from
+    other sources are never clustered.
+    """
+    sources = config.NEAR_DUP_SOURCES
+    in_sources = f"source IN ({', '.join('?' * len(sources))})"
+    conn.execute(
+        f"UPDATE posts SET cluster_id = id WHERE id > ? AND NOT {in_sources}",
+        (after_id, *sources),
+    )
+    while True:
+        # Unary + keeps the source index out: the new rows are a short id range
+        rows = conn.execute(
+            f"""SELECT id, title, content FROM posts
+                WHERE id > ? AND +{in_sources} ORDER BY id LIMIT 1000""",
+            (after_id, *sources),
+        ).fetchall()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        # A stored post is compared with every new post sharing a band with
+        # it, so word sets are kept by post id for the rest of the chunk
+        words_by_id = {post_id: neardup.shingles(title, content) for post_id, title, content in rows}
+        comparable = [post_id for post_id, _, _ in rows if words_by_id[post_id] is not None]
+        signatures = neardup.signatures([words_by_id[post_id] for post_id in comparable])
+        keys_by_id = dict(zip(comparable, map(neardup.band_keys, signatures)))
+
+        # The chunk's bands and clusters are written at its end, so earlier
+        # posts of the same chunk are looked up here instead
+        chunk_bands = {}
+        clusters = {}
+        stored = {}
+        for post_id, _, _ in rows:
+            cluster_id = post_id
+            keys = keys_by_id.get(post_id)
+            if keys is not None:
+                candidates = {
+                    (clusters[other_id], other_id)
+                    for key in keys for other_id in chunk_bands.get(key, ())
+                }
+                for other_id, other_title, other_content, other_cluster in conn.execute(
+                    f"""SELECT p.id, p.title, p.content, p.cluster_id FROM posts p
+                        WHERE p.id IN (SELECT post_id FROM lsh_bands
+                                       WHERE band_key IN ({', '.join('?' * len(keys))}))
+                          AND p.id < ?""",
+                    (*keys, post_id),
+                ):
+                    stored[other_id] = (other_title, other_content)
+                    candidates.add((other_cluster, other_id))
+                # Lowest cluster first, so the first similar candidate decides
+                words = words_by_id[post_id]
+                for other_cluster, other_id in sorted(candidates):
+                    if other_id not in words_by_id:
+                        words_by_id[other_id] = neardup.shingles(*stored[other_id])
+                    other = words_by_id[other_id]
+                    if other and neardup.similarity(words, other) >= config.NEAR_DUP_THRESHOLD:
+                        cluster_id = other_cluster
+                        break
+                for key in keys:
+                    chunk_bands.setdefault(key, []).append(post_id)
+            clusters[post_id] = cluster_id
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO lsh_bands (band_key, post_id) VALUES (?, ?)",
+            [(key, post_id) for post_id, keys in keys_by_id.items() for key in keys],
+        )
+        conn.executemany(
+            "UPDATE posts SET cluster_id = ? WHERE id = ?",
+            [(cluster_id, post_id) for post_id, cluster_id in clusters.items()],
+        )
+        if len(rows) < 1000:
+            return
 
 
 def insert_post(post: dict) -> bool:
     """Insert a post, ignoring duplicates. Returns True if inserted."""
+    return insert_posts([post]) == 1
+
+
+@metrics.DB_WRITE_SECONDS.time(operation="insert_posts")
+def insert_posts(posts) -> int:
+    """Insert multiple posts in one transaction, skipping duplicates.
+
+    Accepts any iterable of post dicts. Returns count of new posts.
+    """
+    rows = [tuple(map(post.get, POST_COLUMNS)) for post in posts]
+    scored = any(row[_SENTIMENT] is not None for row in rows)
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            # Take the write lock first, so no other process can commit
+            # posts between reading last_id and inserting after it
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM posts").fetchone()[0]
+            # rowcount, unlike total_changes, leaves out rows written by triggers
+            if len(rows) == 1:
+                count = conn.execute(INSERT_POST_SQL, rows[0]).rowcount
+            else:
+                conn.executemany(_STAGE_POST_SQL, rows)
+                count = conn.execute(_INSERT_STAGED_POSTS_SQL).rowcount
+                conn.execute("DELETE FROM temp.post_stage")
+            if count:
+                # Only new rows are tagged, not the duplicates the insert skipped
+                _tag_posts(conn, last_id)
+                _assign_clusters(conn, last_id)
+            if count and scored:
+                # Posts that arrive already scored go straight into the rollup
+                conn.execute(
+                    f"""INSERT INTO daily_sentiment
+                            (ticker, day, source, weighted_sum, weight_total, post_count)
+                        SELECT p.ticker, date(p.published_at), p.source,
+                               SUM(CAST(p.sentiment AS REAL) * {SENTIMENT_WEIGHT_SQL}),
+                               SUM({SENTIMENT_WEIGHT_SQL}),
+                               COUNT(*)
+                        FROM posts p
+                        WHERE p.id > ? AND p.cluster_id = p.id
+                          AND p.ticker IS NOT NULL
+                          AND p.sentiment IS NOT NULL
+                          AND date(p.published_at) IS NOT NULL
+                        GROUP BY 1, 2, 3
+                        {_UPSERT_DAILY_SENTIMENT}""",
+                    (last_id,),
+                )
+        metrics.DB_ROWS.inc(count, operation="insert_posts")
+        return count
+
+
+def _recent_posts_query(source, ticker, limit):
+    """SQL and parameters for get_recent_posts()."""
+    query = "SELECT source, ticker, title, url, author, score, published_at FROM posts"
+    conditions = []
+    params = []
+    if source:
+        conditions.append("source = ?")
+        params.append(source)
+    if ticker:
+        conditions.append("ticker = ?")
+        params.append(ticker)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY published_at DESC LIMIT ?"
+    params.append(limit)
+    return query, tuple(params)
+
+
+def get_recent_posts(source=None, limit=20, ticker=None):
+    """Return the newest posts, optionally for one source and/or ticker."""
     conn = get_connection()
     try:
-        conn.execute(
-            """INSERT OR IGNORE INTO posts
-               (source, external_id, title, content, author, url,
-                subreddit, score, num_comments, sentiment, published_at)
-               VALUES (:source, :external_id, :title, :content, :author, :url,
-                       :subreddit, :score, :num_comments, :sentiment, :published_at)""",
-            {
-                "source": post.get("source"),
-                "external_id": post.get("external_id"),
-                "title": post.get("title"),
-                "content": post.get("content"),
-                "author": post.get("author"),
-                "url": post.get("url"),
-                "subreddit": post.get("subreddit"),
-                "score": post.get("score"),
-                "num_comments": post.get("num_comments"),
-                "sentiment": post.get("sentiment"),
-                "published_at": post.get("published_at"),
-            },
-        )
-        conn.commit()
-        return conn.total_changes > 0
+        return conn.execute(*_recent_posts_query(source, ticker, limit)).fetchall()
     finally:
         conn.close()
 
 
-def insert_posts(posts: list[dict]) -> int:
-    """Insert multiple posts, skipping duplicates. Returns count of new posts."""
-    count = 0
+# Title matches rank above content matches
+_SEARCH_WEIGHTS = "bm25(posts_fts, 4.0, 1.0)"
+
+
+def search_posts(query, source=None, ticker=None, since=None, until=None, limit=20,
+                 highlight=("[", "]")):
+    """Full-text search over post titles and content, best matches first.
+
+    ``query`` uses FTS5 syntax (words, "phrases", OR, NOT, prefix*); input
+    that isn't valid syntax is searched for as plain words. ``since`` and
+    ``until`` bound published_at ('YYYY-MM-DD[ HH:MM:SS]', until exclusive).
+    Each row has a ``snippet`` of the best matching column with matches
+    wrapped in ``highlight``, and its BM25 ``rank`` (lower is better).
+    """
+    sql = f"""SELECT p.id, p.source, p.ticker, p.title, p.url, p.author, p.score,
+                     p.published_at,
+                     snippet(posts_fts, -1, ?, ?, '…', 16) AS snippet,
+                     {_SEARCH_WEIGHTS} AS rank
+              FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid
+              WHERE posts_fts MATCH ?"""
+    filters = []
+    for condition, value in (
+        ("p.source = ?", source),
+        ("p.ticker = ?", ticker),
+        ("p.published_at >= ?", since),
+        ("p.published_at < ?", until),
+    ):
+        if value:
+            sql += f" AND {condition}"
+            filters.append(value)
+    sql += " ORDER BY rank LIMIT ?"
+
     conn = get_connection()
     try:
-        for post in posts:
-            cur = conn.execute(
-                """INSERT OR IGNORE INTO posts
-                   (source, external_id, title, content, author, url,
-                    subreddit, score, num_comments, sentiment, published_at)
-                   VALUES (:source, :external_id, :title, :content, :author, :url,
-                           :subreddit, :score, :num_comments, :sentiment, :published_at)""",
-                {
-                    "source": post.get("source"),
-                    "external_id": post.get("external_id"),
-                    "title": post.get("title"),
-                    "content": post.get("content"),
-                    "author": post.get("author"),
-                    "url": post.get("url"),
-                    "subreddit": post.get("subreddit"),
-                    "score": post.get("score"),
-                    "num_comments": post.get("num_comments"),
-                    "sentiment": post.get("sentiment"),
-                    "published_at": post.get("published_at"),
-                },
-            )
-            if cur.rowcount > 0:
-                count += 1
-        conn.commit()
+        try:
+            return conn.execute(sql, (*highlight, query, *filters, limit)).fetchall()
+        except sqlite3.OperationalError:
+            # Not FTS5 syntax ("H-200" and "nvidia:" read as column filters,
+            # an unbalanced quote, an empty query): search the words instead.
+            # Any other error recurs on this second query and is raised.
+            words = " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+            if not words:
+                return []
+            return conn.execute(sql, (*highlight, words, *filters, limit)).fetchall()
     finally:
         conn.close()
-    return count
+
+
+def get_change_marker(conn) -> tuple:
+    """A value that changes whenever posts are added or scored.
+
+    The newest post id and the unscored count, both read from indexes.
+    """
+    return conn.execute(
+        """SELECT (SELECT MAX(id) FROM posts),
+                  (SELECT COUNT(*) FROM posts WHERE sentiment IS NULL)"""
+    ).fetchone()
 
 
 def get_post_counts():
@@ -109,17 +698,267 @@ def get_post_counts():
 
 def update_sentiment(post_id, sentiment_score):
     """Update the sentiment score for a single post."""
+    update_sentiments([(sentiment_score, post_id)])
+
+
+@metrics.DB_WRITE_SECONDS.time(operation="update_sentiments")
+def update_sentiments(scores) -> int:
+    """Bulk-update sentiment from an iterable of (sentiment, post_id) pairs.
+
+    The daily_sentiment rollup is adjusted in the same transaction, taking
+    out any previous score before adding the new one. Returns the number
+    of rows updated.
+    """
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.execute(
+                """CREATE TEMP TABLE IF NOT EXISTS scored_batch (
+                       id INTEGER PRIMARY KEY, sentiment REAL)"""
+            )
+            conn.execute("DELETE FROM scored_batch")
+            conn.executemany(
+                "INSERT OR REPLACE INTO scored_batch (sentiment, id) VALUES (?, ?)",
+                scores,
+            )
+            conn.execute(
+                f"""INSERT INTO daily_sentiment
+                        (ticker, day, source, weighted_sum, weight_total, post_count)
+                    SELECT p.ticker, date(p.published_at), p.source,
+                           SUM((b.sentiment - COALESCE(CAST(p.sentiment AS REAL), 0))
+                               * {SENTIMENT_WEIGHT_SQL}),
+                           SUM(CASE WHEN p.sentiment IS NULL
+                                    THEN {SENTIMENT_WEIGHT_SQL} ELSE 0 END),
+                           SUM(p.sentiment IS NULL)
+                    FROM scored_batch b JOIN posts p ON p.id = b.id
+                    WHERE p.cluster_id = p.id AND p.ticker IS NOT NULL
+                      AND date(p.published_at) IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    {_UPSERT_DAILY_SENTIMENT}"""
+            )
+            updated = conn.execute(
+                """UPDATE posts SET sentiment =
+                       (SELECT sentiment FROM scored_batch b WHERE b.id = posts.id)
+                   WHERE id IN (SELECT id FROM scored_batch)"""
+            ).rowcount
+        metrics.DB_ROWS.inc(updated, operation="update_sentiments")
+        return updated
+
+
+def rebuild_daily_sentiment():
+    """Recompute the daily_sentiment rollup from every scored representative post."""
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            _recompute_daily_sentiment(conn)
+
+
+def _recompute_daily_sentiment(conn):
+    conn.execute("DELETE FROM daily_sentiment")
+    conn.execute(
+        f"""INSERT INTO daily_sentiment
+                (ticker, day, source, weighted_sum, weight_total, post_count)
+            SELECT p.ticker, date(p.published_at), p.source,
+                   SUM(CAST(p.sentiment AS REAL) * {SENTIMENT_WEIGHT_SQL}),
+                   SUM({SENTIMENT_WEIGHT_SQL}),
+                   COUNT(*)
+            FROM posts p
+            WHERE p.cluster_id = p.id AND p.ticker IS NOT NULL
+              AND p.sentiment IS NOT NULL
+              AND date(p.published_at) IS NOT NULL
+            GROUP BY 1, 2, 3"""
+    )
+
+
+CURSOR_FIELDS = ("newest_id", "newest_at", "resume_token", "resume_floor")
+
+
+def get_cursor(crawler, source, query):
+    """Return the stored cursor fields for a crawl query, or None."""
     conn = get_connection()
     try:
-        conn.execute(
-            "UPDATE posts SET sentiment = ? WHERE id = ?",
-            (sentiment_score, post_id),
-        )
-        conn.commit()
+        row = conn.execute(
+            f"""SELECT {', '.join(CURSOR_FIELDS)} FROM crawl_cursors
+                WHERE crawler = ? AND source = ? AND query = ?""",
+            (crawler, source, query),
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def save_cursors(crawler, cursors: dict):
+    """Upsert {(source, query): fields} cursors for a crawler."""
+    if not cursors:
+        return
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO crawl_cursors
+                        (crawler, source, query, {', '.join(CURSOR_FIELDS)}, updated_at)
+                    VALUES (?, ?, ?, {', '.join('?' * len(CURSOR_FIELDS))}, CURRENT_TIMESTAMP)""",
+                [
+                    (crawler, source, query, *(fields.get(f) for f in CURSOR_FIELDS))
+                    for (source, query), fields in cursors.items()
+                ],
+            )
+
+
+def get_source_stats() -> dict:
+    """Return {(crawler, method, args): row} for every tracked crawl source."""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT * FROM source_stats").fetchall()
+    finally:
+        conn.close()
+    return {(row["crawler"], row["method"], row["args"]): row for row in rows}
+
+
+def mark_sources_enqueued(keys, at):
+    """Record that the (crawler, method, args) sources were queued at ``at``."""
+    if not keys:
+        return
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.executemany(
+                """INSERT INTO source_stats (crawler, method, args, last_enqueued_at)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(crawler, method, args) DO UPDATE SET
+                       last_enqueued_at = excluded.last_enqueued_at""",
+                [(*key, at) for key in keys],
+            )
+
+
+def record_source_fetch(key, new, at, prior_hours, alpha):
+    """Fold a fetch that found ``new`` posts into a source's yield estimate.
+
+    The sample is new posts per hour since the source's previous fetch
+    (``prior_hours`` for a first fetch), smoothed with weight ``alpha``.
+    """
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            row = conn.execute(
+                """SELECT new_per_hour, last_fetched_at FROM source_stats
+                   WHERE crawler = ? AND method = ? AND args = ?""",
+                key,
+            ).fetchone()
+            previous = row["new_per_hour"] if row else None
+            last = row["last_fetched_at"] if row else None
+            hours = (at - last) / 3600 if last else prior_hours
+            sample = new / max(hours, 1 / 60)
+            rate = sample if previous is None else alpha * sample + (1 - alpha) * previous
+            conn.execute(
+                """INSERT INTO source_stats
+                       (crawler, method, args, new_per_hour, fetches, last_new, last_fetched_at)
+                   VALUES (?, ?, ?, ?, 1, ?, ?)
+                   ON CONFLICT(crawler, method, args) DO UPDATE SET
+                       new_per_hour = excluded.new_per_hour,
+                       fetches = fetches + 1,
+                       last_new = excluded.last_new,
+                       last_fetched_at = excluded.last_fetched_at""",
+                (*key, rate, new, at),
+            )
+
+
+def save_crawl_run(run: dict):
+    """Record a crawl cycle summary (the crawl_runs columns, minus id)."""
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.execute(
+                f"""INSERT INTO crawl_runs ({', '.join(run)})
+                    VALUES ({', '.join('?' * len(run))})""",
+                tuple(run.values()),
+            )
+
+
+def get_crawl_runs(limit=20):
+    """Return the most recent crawl cycle summaries, newest first."""
+    conn = get_connection()
+    try:
+        return conn.execute(
+            "SELECT * FROM crawl_runs ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
     finally:
         conn.close()
 
 
+UNSCORED_POSTS_SQL = """SELECT id, title, content FROM posts
+    WHERE sentiment IS NULL AND cluster_id = id AND id > ?
+    ORDER BY id LIMIT ?"""
+
+
+def iter_unscored_posts(chunk_size):
+    """Yield lists of (id, title, content) for unscored posts, chunk by chunk.
+
+    Only cluster representatives are returned; near-duplicates take their
+    representative's score via inherit_cluster_sentiment(). Pages by id so
+    memory stays bounded and rows scored mid-iteration are never revisited.
+    """
+    conn = get_connection()
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute(UNSCORED_POSTS_SQL, (last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [tuple(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def inherit_cluster_sentiment() -> int:
+    """Copy each scored representative's sentiment to its unscored duplicates.
+
+    Duplicates are outside the daily_sentiment rollup, so it is untouched.
+    Returns the number of posts updated.
+    """
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            return conn.execute(
+                """UPDATE posts SET sentiment =
+                       (SELECT r.sentiment FROM posts r WHERE r.id = posts.cluster_id)
+                   WHERE sentiment IS NULL AND cluster_id != id
+                     AND EXISTS (SELECT 1 FROM posts r
+                                 WHERE r.id = posts.cluster_id AND r.sentiment IS NOT NULL)"""
+            ).rowcount
+
+
+def iter_post_keys(after_id, chunk_size):
+    """Yield lists of (id, source, external_id) for posts with id > after_id."""
+    conn = get_connection()
+    try:
+        while True:
+            rows = conn.execute(
+                """SELECT id, source, external_id FROM posts
+                   WHERE id > ? ORDER BY id LIMIT ?""",
+                (after_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                return
+            after_id = rows[-1]["id"]
+            yield [tuple(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def get_post_key(post_id):
+    """Return (source, external_id) of the post with this id, or None."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT source, external_id FROM posts WHERE id = ?", (post_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return tuple(row) if row else None
+
+
 def get_posts_without_sentiment():
     """Return all posts where sentiment IS NULL."""
     conn = get_connection()
@@ -130,19 +969,117 @@ def get_posts_without_sentiment():
     return rows
 
 
+POSTS_BY_DATE_RANGE_SQL = """SELECT id, source, title, content, score, num_comments,
+        CAST(sentiment AS REAL) as sentiment, published_at
+    FROM posts
+    WHERE sentiment IS NOT NULL AND published_at >= ?
+    ORDER BY published_at DESC"""
+
+
 def get_posts_by_date_range(days=14):
     """Return posts with sentiment scores from the last N days."""
     from datetime import datetime, timedelta
 
     cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
     conn = get_connection()
-    rows = conn.execute(
-        """SELECT id, source, title, content, score, num_comments,
-                  CAST(sentiment AS REAL) as sentiment, published_at
-           FROM posts
-           WHERE sentiment IS NOT NULL AND published_at >= ?
-           ORDER BY published_at DESC""",
-        (cutoff,),
-    ).fetchall()
+    rows = conn.execute(POSTS_BY_DATE_RANGE_SQL, (cutoff,)).fetchall()
     conn.close()
     return rows
+
+
+def get_http_validators(url):
+    """Return (etag, last_modified) stored for a URL, or None."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return (row["etag"], row["last_modified"]) if row else None
+
+
+def save_http_validators(validators: dict):
+    """Upsert {url: (etag, last_modified)} from the latest successful fetches."""
+    if not validators:
+        return
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.executemany(
+                """INSERT INTO http_cache (url, etag, last_modified, updated_at)
+                   VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT(url) DO UPDATE SET
+                       etag = excluded.etag,
+                       last_modified = excluded.last_modified,
+                       updated_at = excluded.updated_at""",
+                [(url, etag, last_modified) for url, (etag, last_modified) in validators.items()],
+            )
+
+
+def get_cached_sentiments(text_hashes, analyzer_version) -> dict:
+    """Return {text_hash: sentiment} for the hashes present in the cache."""
+    found = {}
+    conn = get_connection()
+    try:
+        for i in range(0, len(text_hashes), _MAX_PARAMS):
+            batch = text_hashes[i:i + _MAX_PARAMS]
+            rows = conn.execute(
+                f"""SELECT text_hash, sentiment FROM sentiment_cache
+                    WHERE analyzer_version = ?
+                      AND text_hash IN ({', '.join('?' * len(batch))})""",
+                (analyzer_version, *batch),
+            ).fetchall()
+            found.update((row["text_hash"], row["sentiment"]) for row in rows)
+    finally:
+        conn.close()
+    return found
+
+
+def save_cached_sentiments(scores, analyzer_version):
+    """Persist (text_hash, sentiment) pairs for an analyzer version."""
+    with _writer_lock:
+        conn = get_writer()
+        with conn:
+            conn.executemany(
+                """INSERT OR IGNORE INTO sentiment_cache
+                   (text_hash, analyzer_version, sentiment) VALUES (?, ?, ?)""",
+                ((text_hash, analyzer_version, score) for text_hash, score in scores),
+            )
+
+
+# Queries on the crawl/analysis hot path, with sample parameters, that
+# must be answered from an index rather than a full table scan. They are
+# the statements the functions run, so the plan check cannot drift.
+HOT_QUERIES = {
+    "iter_unscored_posts": (UNSCORED_POSTS_SQL, (0, 1000)),
+    "get_posts_by_date_range": (POSTS_BY_DATE_RANGE_SQL, ("2024-01-01",)),
+    "get_recent_posts": _recent_posts_query(None, None, 20),
+    "get_recent_posts_by_source": _recent_posts_query("reddit", None, 20),
+    "get_recent_posts_by_ticker": _recent_posts_query(None, "NVDA", 20),
+    "get_daily_sentiment": (DAILY_SENTIMENT_SQL, ("NVDA", "2024-01-01")),
+}
+
+# Older SQLite versions say "SCAN TABLE posts", newer ones "SCAN posts"
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$|USE TEMP B-TREE FOR ORDER BY")
+
+
+def find_full_scans(conn=None) -> dict:
+    """Run EXPLAIN QUERY PLAN over HOT_QUERIES.
+
+    Returns {query name: offending plan steps} for every query that scans a
+    whole table or sorts in a temp b-tree; empty when all are indexed.
+    """
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        problems = {}
+        for name, (sql, params) in HOT_QUERIES.items():
+            steps = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            bad = [step for step in steps if _FULL_SCAN.search(step)]
+            if bad:
+                problems[name] = bad
+        return problems
+    finally:
+        if own:
+            conn.close()
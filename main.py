@@ -1,26 +1,40 @@
 import argparse
 import logging
+import re
+import sys
+from datetime import date, datetime, timedelta
 
 import os
 
-from db import init_db, get_post_counts, get_connection
-from scheduler import run_all_crawlers, start_scheduler
-from sentiment import backfill_sentiment, predict_trend
-from charts import generate_sentiment_chart, generate_volume_chart
+import config
+import daemon
+import metrics
+from db import init_db, get_crawl_runs, get_post_counts, get_recent_posts, search_posts
 
+# Crawling, scoring and charting modules are imported where they are used,
+# so --show and other quick commands do not load nltk or matplotlib.
+
+
+def run_analysis(ticker, chart_format="png"):
+    """Run the full sentiment analysis pipeline for one ticker."""
+    from charts import generate_sentiment_chart, generate_volume_chart
+    from sentiment import backfill_sentiment, predict_trend, cache as sentiment_cache
 
-def run_analysis():
-    """Run the full sentiment analysis pipeline."""
     # 1. Backfill sentiment on any unscored posts
     scored = backfill_sentiment()
-    print(f"Sentiment scoring: {scored} posts scored.\n")
+    stats = sentiment_cache.stats()
+    print(f"Sentiment scoring: {scored} posts scored.")
+    print(
+        f"Sentiment cache: {stats['memory_hits'] + stats['db_hits']} hits, "
+        f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate).\n"
+    )
 
     # 2. Generate prediction
-    prediction = predict_trend()
+    prediction = predict_trend(ticker=ticker)
 
     # 3. Print prediction summary
     print("=" * 60)
-    print(f"  NVDA PREDICTION: {prediction['direction']}")
+    print(f"  {ticker} PREDICTION: {prediction['direction']}")
     print(f"  Confidence: {prediction['confidence']}/10")
     print("=" * 60)
     print(f"\n{prediction['summary']}\n")
@@ -29,11 +43,12 @@ def run_analysis():
     daily = prediction["daily_scores"]
     if daily:
         project_dir = os.path.dirname(os.path.abspath(__file__))
-        sentiment_path = os.path.join(project_dir, "sentiment_chart.png")
-        volume_path = os.path.join(project_dir, "volume_chart.png")
+        suffix = "" if ticker == config.TICKERS[0] else f"_{ticker}"
+        sentiment_path = os.path.join(project_dir, f"sentiment_chart{suffix}.{chart_format}")
+        volume_path = os.path.join(project_dir, f"volume_chart{suffix}.{chart_format}")
 
-        generate_sentiment_chart(daily, sentiment_path)
-        generate_volume_chart(daily, volume_path)
+        generate_sentiment_chart(daily, sentiment_path, ticker=ticker)
+        generate_volume_chart(daily, volume_path, ticker=ticker)
 
         print(f"Charts saved:")
         print(f"  Sentiment: {sentiment_path}")
@@ -42,19 +57,9 @@ def run_analysis():
         print("No data available to generate charts.")
 
 
-def show_posts(source=None, limit=20):
+def show_posts(source=None, limit=20, ticker=None):
     """Display recent posts from the database."""
-    conn = get_connection()
-    query = "SELECT source, title, url, author, score, published_at FROM posts"
-    params = []
-    if source:
-        query += " WHERE source = ?"
-        params.append(source)
-    query += " ORDER BY published_at DESC LIMIT ?"
-    params.append(limit)
-
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
+    rows = get_recent_posts(source=source, limit=limit, ticker=ticker)
 
     if not rows:
         print("No posts found.")
@@ -66,15 +71,158 @@ def show_posts(source=None, limit=20):
     for r in rows:
         score = f" [{r['score']} pts]" if r["score"] is not None else ""
         date = r["published_at"][:16] if r["published_at"] else "N/A"
-        print(f"[{r['source']:8s}] {date}  {r['title'][:80]}{score}")
-        print(f"           {r['url']}")
+        print(f"[{r['source']:8s}] {r['ticker'] or '-':5s} {date}  {r['title'][:80]}{score}")
+        print(f"                 {r['url']}")
+        print()
+
+
+def show_search(query, source=None, ticker=None, since=None, until=None, limit=20):
+    """Display the posts best matching a full-text query."""
+    rows = search_posts(query, source=source, ticker=ticker, since=since, until=until, limit=limit)
+    if not rows:
+        print(f"No posts match {query!r}.")
+        return
+
+    for r in rows:
+        score = f" [{r['score']} pts]" if r["score"] is not None else ""
+        date = r["published_at"][:16] if r["published_at"] else "N/A"
+        print(f"[{r['source']:8s}] {r['ticker'] or '-':5s} {date}  {r['title'][:80]}{score}")
+        print(f"                 {' '.join(r['snippet'].split())}")
+        print(f"                 {r['url']}")
         print()
 
 
+def _day(value):
+    """Parse a --since/--until date: YYYY-MM-DD, or Nd for N days ago."""
+    match = re.fullmatch(r"(\d+)d", value)
+    if match:
+        return datetime.utcnow().date() - timedelta(days=int(match.group(1)))
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD or a number of days like 7d, not {value!r}")
+
+
+def show_runs(limit=20):
+    """Display recent crawl cycle summaries."""
+    runs = get_crawl_runs(limit)
+    if not runs:
+        print("No crawl runs recorded.")
+        return
+
+    print(f"{'started (UTC)':19s}  {'kind':5s} {'secs':>7s} {'tasks':>5s} {'reqs':>5s} "
+          f"{'KiB':>7s} {'new':>5s} {'err':>3s}  fetch/parse/score/write s")
+    for r in runs:
+        print(
+            f"{r['started_at']:19s}  {r['kind']:5s} {r['duration_seconds']:7.1f} {r['tasks']:5d} "
+            f"{r['requests']:5d} {r['response_bytes'] / 1024:7.0f} {r['new_posts']:5d} "
+            f"{r['errors']:3d}  {r['fetch_seconds']:.1f}/{r['parse_seconds']:.1f}/"
+            f"{r['score_seconds']:.1f}/{r['write_seconds']:.1f}"
+        )
+
+
+def crawl_once():
+    """Run all crawlers once and print post counts."""
+    from scheduler import run_all_crawlers
+
+    run_all_crawlers()
+    counts = get_post_counts()
+    print("\nPost counts by source:")
+    for source, count in sorted(counts.items()):
+        print(f"  {source}: {count}")
+    if not counts:
+        print("  (no posts collected)")
+
+
+def run_backtest(ticker, horizon=7):
+    """Check how often the rule's calls held up in later sentiment, and sweep its parameters.
+
+    This scores calls against sentiment, not prices: a sentiment-persistence
+    check, not a trading backtest.
+    """
+    import signals
+
+    series = signals.load(ticker)
+    if not len(series["day"]):
+        print(f"No sentiment data for {ticker}.")
+        return
+    print(f"Sentiment-persistence check for {ticker}: {len(series['day'])} days from "
+          f"{series['day'][0]} to {series['day'][-1]}.\n"
+          f"A call is a hit if the next {horizon} days' average sentiment moved further "
+          f"in its direction than the recent window's. Prices are not used.")
+
+    result = signals.backtest(series, horizon)
+    print(f"\nCurrent rule: {result['calls']} calls, {result['hit_rate']:.1%} hit rate")
+    for confidence, (calls, hit_rate) in sorted(result["by_confidence"].items()):
+        print(f"  confidence {confidence:2d}: {calls:5d} calls, {hit_rate:.1%}")
+
+    print("\nBest parameters (window/lookback days, threshold):")
+    for r in signals.sweep(series, horizon=horizon)[:5]:
+        print(f"  {r['window']:3d}/{r['lookback']:3d}  {r['threshold']:.2f}  "
+              f"{r['calls']:5d} calls, {r['hit_rate']:.1%} hit rate")
+
+
+def compact_columns():
+    """Copy older posts into the columnar analytics store and print what changed."""
+    import analytics
+
+    result = analytics.compact()
+    print(
+        f"Compacted {len(result['written'])} months "
+        f"({result['unchanged']} unchanged) published before {result['through'][:10]} "
+        f"into {config.ANALYTICS_DIR}"
+    )
+    for month in result["written"]:
+        print(f"  {month}")
+
+
+# Commands a running daemon can serve
+COMMANDS = {
+    "show": show_posts,
+    "search": show_search,
+    "analyze": run_analysis,
+    "crawl-now": crawl_once,
+    "runs": show_runs,
+    "compact": compact_columns,
+    "backtest": run_backtest,
+}
+
+
+def warm_up():
+    """Load everything the daemon's commands use, so the first one is fast."""
+    import charts
+    import matcher
+    import scheduler  # noqa: F401 - imports the crawlers and pipeline
+    import seen_index
+    import sentiment
+
+    init_db()
+    sentiment.get_analyzer()
+    matcher.get_matcher()
+    seen_index.get_index()
+    charts._template("sentiment")
+    charts._template("volume")
+
+
+def run_command(command, local=False, **kwargs):
+    """Run a command in the daemon if one is listening, otherwise here."""
+    if not local:
+        try:
+            print(daemon.request(command, **kwargs), end="")
+            return
+        except daemon.Unavailable:
+            pass
+        except daemon.CommandFailed as e:
+            sys.exit(f"Daemon: {e}")
+    init_db()
+    metrics.start_server()
+    COMMANDS[command](**kwargs)
+
+
 def main():
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        format=config.LOG_FORMAT,
     )
 
     parser = argparse.ArgumentParser(description="NVIDIA Stock Chatter Crawler")
@@ -94,31 +242,140 @@ def main():
         "--limit",
         type=int,
         default=20,
-        help="Number of posts to show with --show (default: 20)",
+        help="Number of posts to show with --show or --search (default: 20)",
+    )
+    parser.add_argument(
+        "--search",
+        metavar="QUERY",
+        help='Full-text search of post titles and content, e.g. "Blackwell OR H200"',
+    )
+    parser.add_argument(
+        "--source",
+        help="Only --search posts from this source: reddit, news, twitter",
+    )
+    parser.add_argument(
+        "--since",
+        type=_day,
+        metavar="DATE",
+        help="Only --search posts published on or after DATE (YYYY-MM-DD, or 7d for 7 days ago)",
+    )
+    parser.add_argument(
+        "--until",
+        type=_day,
+        metavar="DATE",
+        help="Only --search posts published on or before DATE",
     )
     parser.add_argument(
         "--analyze",
         action="store_true",
         help="Run sentiment analysis, generate charts, and print prediction",
     )
+    parser.add_argument(
+        "--chart-format",
+        choices=["png", "svg", "json"],
+        default="png",
+        help="Chart output for --analyze: png, or lightweight svg or json for dashboards",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Run a crawl queue worker, claiming tasks enqueued by the scheduler",
+    )
+    parser.add_argument(
+        "--ticker",
+        type=str.upper,
+        metavar="SYMBOL",
+        help=f"Ticker for --analyze and --backtest (default: {config.TICKERS[0]}) "
+        "or to filter --show and --search",
+    )
+    parser.add_argument(
+        "--runs",
+        action="store_true",
+        help="Show recent crawl cycle timings (up to --limit)",
+    )
+    parser.add_argument(
+        "--backtest",
+        action="store_true",
+        help="Check the prediction rule's calls against later sentiment (not prices) "
+        "over all history for --ticker",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Copy older posts into the columnar analytics store now",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=f"Keep models and caches loaded and serve commands on {config.DAEMON_SOCKET}",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=f"Serve the read-only HTTP API on {config.API_HOST}:{config.API_PORT}",
+    )
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Run the command in this process even if a daemon is running",
+    )
     args = parser.parse_args()
 
-    init_db()
-
-    if args.analyze:
-        run_analysis()
+    if args.search:
+        run_command(
+            "search", args.local, query=args.search, source=args.source, ticker=args.ticker,
+            since=args.since and args.since.isoformat(),
+            until=args.until and (args.until + timedelta(days=1)).isoformat(),
+            limit=args.limit,
+        )
+    elif args.analyze:
+        run_command(
+            "analyze", args.local,
+            ticker=args.ticker or config.TICKERS[0], chart_format=args.chart_format,
+        )
+    elif args.backtest:
+        run_command("backtest", args.local, ticker=args.ticker or config.TICKERS[0])
+    elif args.compact:
+        run_command("compact", args.local)
+    elif args.runs:
+        run_command("runs", args.local, limit=args.limit)
     elif args.show:
         source = None if args.show == "all" else args.show
-        show_posts(source=source, limit=args.limit)
+        run_command("show", args.local, source=source, limit=args.limit, ticker=args.ticker)
     elif args.once:
-        run_all_crawlers()
-        counts = get_post_counts()
-        print("\nPost counts by source:")
-        for source, count in sorted(counts.items()):
-            print(f"  {source}: {count}")
-        if not counts:
-            print("  (no posts collected)")
+        run_command("crawl-now", args.local)
+    elif args.daemon:
+        metrics.start_server()
+        print(f"Starting daemon on {config.DAEMON_SOCKET}. Press Ctrl+C to stop.")
+        try:
+            daemon.serve(COMMANDS, warm=warm_up)
+        except KeyboardInterrupt:
+            pass
+    elif args.serve:
+        import api
+
+        init_db()
+        metrics.start_server()
+        print(f"Serving the API on http://{config.API_HOST}:{config.API_PORT}/api/. "
+              "Press Ctrl+C to stop.")
+        try:
+            api.serve()
+        except KeyboardInterrupt:
+            pass
+    elif args.worker:
+        from taskqueue import run_worker
+
+        init_db()
+        metrics.start_server()
+        print("Starting crawl worker. Press Ctrl+C to stop.")
+        try:
+            run_worker()
+        except KeyboardInterrupt:
+            pass
     else:
+        from scheduler import start_scheduler
+
+        metrics.start_server()
         print("Starting scheduled crawler. Press Ctrl+C to stop.")
         start_scheduler()
 
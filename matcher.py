@@ -0,0 +1,166 @@
+"""Keyword relevance matching and post tagging.
+
+Posts are tagged with the active tickers they mention. Every symbol,
+search term and alias is compiled into one regex. The alternation is
+built from a character trie, so shared prefixes are tested once and the
+regex engine does not try each keyword in turn. A document is scanned in
+a single pass however many keywords there are. Matches must be whole
+words: "jensen" alone no longer counts, and "nvidia" does not match
+inside "nvidiafan". Names and aliases match in any case, but a bare
+symbol only as written: "ARM" and "MU" are tickers, "arm" and "mu" are
+not. Cashtags ("$arm") match in any case.
+"""
+import re
+
+import config
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def _trie_pattern(node: dict) -> str:
+    alternatives = [
+        (r"\s+" if char == " " else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not alternatives:
+        return ""
+    pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+    # Optional, and greedy, so the longest keyword wins
+    return f"(?:{pattern})?" if "" in node else pattern
+
+
+def _trie(phrases) -> dict:
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return trie
+
+
+class KeywordMatcher:
+    """Finds which terms a text mentions.
+
+    ``terms`` maps each term to its aliases. A match on an alias counts
+    as its term, and a phrase that contains another keyword counts for
+    both terms ("nvidia stock" also counts as "nvidia"). Matching ignores
+    case, except for the phrases in ``exact_case``, which match only as
+    written.
+    """
+
+    def __init__(self, terms: dict, exact_case=()):
+        phrase_terms = {}
+        for term, aliases in terms.items():
+            for phrase in (term, *aliases):
+                phrase_terms.setdefault(_normalize(phrase), set()).add(term)
+
+        exact = {" ".join(phrase.split()) for phrase in exact_case}
+        exact = {phrase for phrase in exact if phrase.lower() in phrase_terms}
+        folded = set(phrase_terms) - {phrase.lower() for phrase in exact}
+        alternatives = []
+        if folded:
+            alternatives.append(f"(?i:{_trie_pattern(_trie(folded))})")
+        if exact:
+            alternatives.append(_trie_pattern(_trie(exact)))
+        self._pattern = re.compile(
+            rf"(?<!\w)(?:{'|'.join(alternatives) or '(?!)'})(?!\w)"
+        )
+
+        # Resolve once which keywords each phrase contains, so matching
+        # stays one pass: walk the trie from every word start in the phrase
+        trie = _trie(phrase_terms)
+        self._terms = {}
+        for phrase in phrase_terms:
+            implied = set()
+            for start in range(len(phrase)):
+                if start and _WORD_CHAR.match(phrase[start - 1]):
+                    continue
+                node = trie
+                for end in range(start, len(phrase)):
+                    node = node.get(phrase[end])
+                    if node is None:
+                        break
+                    if "" in node and not _WORD_CHAR.match(phrase[end + 1:end + 2]):
+                        implied |= phrase_terms[phrase[start:end + 1]]
+            self._terms[phrase] = implied
+
+    def counts(self, text: str) -> dict:
+        """Return {term: mentions} in order of each term's first mention."""
+        found = {}
+        for m in self._pattern.finditer(text or ""):
+            for term in self._terms[_normalize(m.group())]:
+                found[term] = found.get(term, 0) + 1
+        return found
+
+    def match(self, text: str) -> list[str]:
+        """Return the sorted terms mentioned in text."""
+        return sorted(self.counts(text))
+
+    def tag(self, title, content):
+        """Return (tags, primary) for a post.
+
+        tags is the comma-separated sorted terms it mentions, or None;
+        primary is the most-mentioned term, the earliest on a tie.
+        """
+        found = self.counts(f"{title or ''}\n{content or ''}")
+        if not found:
+            return None, None
+        return ",".join(sorted(found)), max(found, key=found.get)
+
+
+def ticker_terms(symbol: str) -> list[str]:
+    """Return a ticker's search terms; unregistered symbols search for themselves."""
+    return config.TICKER_REGISTRY.get(symbol, {}).get("terms", [symbol])
+
+
+_default = None
+
+
+def get_matcher() -> KeywordMatcher:
+    """Return the matcher for the active tickers.
+
+    Each ticker matches its symbol, $cashtag, search terms and aliases,
+    so tags and the primary term are ticker symbols.
+    """
+    global _default
+    if _default is None:
+        _default = KeywordMatcher(
+            {
+                symbol: [
+                    f"${symbol}",
+                    *ticker_terms(symbol),
+                    *config.TICKER_REGISTRY.get(symbol, {}).get("aliases", []),
+                ]
+                for symbol in config.TICKERS
+            },
+            exact_case=config.TICKERS,
+        )
+    return _default
+
+
+def match(text: str) -> list[str]:
+    return get_matcher().match(text)
+
+
+def tags(title, content):
+    """Return the comma-separated active tickers a post mentions, or None."""
+    return get_matcher().tag(title, content)[0]
+
+
+def tag(title, content):
+    """Return (tags, ticker) for a post: every active ticker it mentions,
+    and the one it is mostly about.
+
+    With a single active ticker, posts that match nothing (say, a search
+    hit on a comment) are still attributed to it.
+    """
+    tags, ticker = get_matcher().tag(title, content)
+    if ticker is None and len(config.TICKERS) == 1:
+        ticker = config.TICKERS[0]
+    return tags, ticker
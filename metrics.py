@@ -0,0 +1,251 @@
+"""Crawl telemetry: counters and latency histograms in Prometheus format.
+
+Metrics are declared here, in one catalogue, and updated from the code
+they measure (HTTP fetches, feed parsing, crawl tasks, DB writes,
+sentiment scoring, chart rendering). They are exported in the Prometheus
+text format, either written to ``config.METRICS_FILE`` (for node_exporter's
+textfile collector) or served on ``config.METRICS_PORT``.
+
+Each process keeps its own registry. METRICS_FILE may contain
+``{process}``, replaced by the process name, so local worker processes
+write a file each instead of overwriting one another.
+"""
+import atexit
+import bisect
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_registry = {}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names, values, extra="") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        with _lock:
+            _registry[name] = self
+
+    def _key(self, labels) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _lines(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+    def _totals(self):
+        return {self.name: sum(self._values.values())}
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in a ``with`` block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _lines(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _format_labels(self.labels, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+    def _totals(self):
+        return {
+            f"{self.name}_count": sum(sum(counts) for counts, _ in self._values.values()),
+            f"{self.name}_sum": sum(total for _, total in self._values.values()),
+        }
+
+
+HTTP_REQUESTS = Counter(
+    "crawler_http_requests_total", "HTTP requests sent, by host and status.", ("host", "status")
+)
+HTTP_ERRORS = Counter(
+    "crawler_http_errors_total", "HTTP requests that failed without a response.", ("host",)
+)
+HTTP_SECONDS = Histogram(
+    "crawler_http_request_seconds", "HTTP request latency, excluding rate-limit waits.", ("host",)
+)
+HTTP_BYTES = Counter(
+    "crawler_http_response_bytes_total", "Response body bytes received.", ("host",)
+)
+TASK_SECONDS = Histogram(
+    "crawler_task_seconds", "Wall time of one crawl task.", ("crawler", "method", "source")
+)
+TASK_ITEMS = Counter(
+    "crawler_task_items_total", "Posts yielded by crawl tasks.", ("crawler", "method", "source")
+)
+TASK_ERRORS = Counter(
+    "crawler_task_errors_total", "Crawl tasks that raised.", ("crawler", "method", "source")
+)
+PARSE_SECONDS = Histogram(
+    "crawler_parse_seconds", "Time to parse a fetched document.", ("format",)
+)
+DB_WRITE_SECONDS = Histogram(
+    "crawler_db_write_seconds", "Time spent in a database write batch.", ("operation",)
+)
+DB_ROWS = Counter(
+    "crawler_db_rows_total", "Rows written or updated, by operation.", ("operation",)
+)
+SCORE_SECONDS = Histogram(
+    "crawler_sentiment_seconds", "Sentiment scoring time per call.", ("path",)
+)
+SCORED_POSTS = Counter(
+    "crawler_sentiment_posts_total", "Posts given a sentiment score.", ("path",)
+)
+CHART_SECONDS = Histogram(
+    "crawler_chart_render_seconds", "Time to render and save a chart.", ("chart", "format")
+)
+CHART_CACHE = Counter(
+    "crawler_chart_cache_total", "Chart requests answered from the artifact cache or not.",
+    ("chart", "result"),
+)
+
+
+def task_labels(crawler: str, task) -> dict:
+    """Labels identifying a crawl task; ``source`` is its first argument."""
+    return {
+        "crawler": crawler,
+        "method": task.method,
+        "source": str(task.args[0]) if task.args else "",
+    }
+
+
+def render() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for metric in _registry.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric._lines())
+    return "\n".join(lines) + "\n"
+
+
+def totals() -> dict:
+    """Return each metric summed over its labels (histograms as _count and _sum)."""
+    found = {}
+    with _lock:
+        for metric in _registry.values():
+            found.update(metric._totals())
+    return found
+
+
+def metrics_path():
+    """Return this process's METRICS_FILE path, or None if not configured."""
+    if not config.METRICS_FILE:
+        return None
+    process = re.sub(r"[^\w.-]", "_", multiprocessing.current_process().name)
+    return config.METRICS_FILE.format(process=process)
+
+
+def flush():
+    """Write the metrics to METRICS_FILE, atomically, if one is configured."""
+    path = metrics_path()
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(render())
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("Could not write metrics to %s: %s", path, e)
+
+
+atexit.register(flush)
+
+
+def start_server(port=None):
+    """Serve /metrics on ``port`` (default METRICS_PORT) from a daemon thread.
+
+    Returns the server, or None if no port is configured or it is taken.
+    """
+    port = config.METRICS_PORT if port is None else port
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics %s", format % args)
+
+    try:
+        server = ThreadingHTTPServer((config.METRICS_HOST, port), Handler)
+    except OSError as e:
+        logger.warning("Could not serve metrics on port %d: %s", port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", config.METRICS_HOST, port)
+    return server
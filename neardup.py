@@ -0,0 +1,83 @@
+"""MinHash signatures and LSH banding for near-duplicate detection.
+
+One wire story syndicated by several outlets arrives with slightly
+different titles and summaries. Each post is reduced to the set of words
+in its title and summary; two posts are near-duplicates when the Jaccard
+similarity of those sets is at least ``config.NEAR_DUP_THRESHOLD``.
+
+A MinHash signature of BANDS * ROWS values is split into BANDS band keys.
+Posts sharing any band key become candidates, so lookups are indexed
+equality matches instead of a scan over every stored post, and only the
+candidates are compared exactly. With 12 bands of 4 rows, pairs at 0.6
+similarity collide with probability ~0.8, pairs at 0.8 with ~0.99, and
+unrelated posts (similarity ~0.1) almost never.
+"""
+import re
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import chain
+
+import numpy as np
+
+import config
+
+_TAGS = re.compile(r"<[^>]+>")
+_WORDS = re.compile(r"\w+")
+
+BANDS = 12
+ROWS = 4
+
+# Each 64-byte blake2b digest yields 16 independent 32-bit hash values;
+# salting it differently gives the next 16. Band keys are stored, so the
+# salts must never change.
+_VALUES_PER_DIGEST = 16
+_SALTS = [b"neardup%d" % i for i in range(-(-BANDS * ROWS // _VALUES_PER_DIGEST))]
+_HASH_DTYPE = np.dtype("<u4")
+
+
+def shingles(title, content):
+    """Return the set of words in a post, or None if too short to compare."""
+    text = _TAGS.sub(" ", f"{title or ''} {content or ''}").lower()
+    words = set(_WORDS.findall(text))
+    if len(words) < config.NEAR_DUP_MIN_TOKENS:
+        return None
+    return words
+
+
+# Headline vocabulary is small and repetitive, so most words are cached
+@lru_cache(maxsize=100_000)
+def _word_hashes(word) -> bytes:
+    data = word.encode("utf-8")
+    return b"".join(blake2b(data, salt=salt).digest() for salt in _SALTS)
+
+
+def signatures(word_sets) -> np.ndarray:
+    """MinHash signatures of many word sets at once, one row per set.
+
+    Each row is the minimum of every hash function over the set's words.
+    Word sets must not be empty.
+    """
+    word_sets = list(word_sets)
+    if not word_sets:
+        return np.empty((0, BANDS * ROWS), _HASH_DTYPE)
+    vocabulary = {word: i for i, word in enumerate(set(chain.from_iterable(word_sets)))}
+    indices = np.fromiter(map(vocabulary.__getitem__, chain.from_iterable(word_sets)), np.intp)
+    offsets = np.cumsum([0] + [len(words) for words in word_sets[:-1]])
+    hashes = np.frombuffer(b"".join(map(_word_hashes, vocabulary)), _HASH_DTYPE)
+    hashes = hashes.reshape(len(vocabulary), -1)[:, :BANDS * ROWS]
+    return np.minimum.reduceat(hashes[indices], offsets, axis=0)
+
+
+def band_keys(signature) -> list[int]:
+    """Return the LSH band keys (signed 64-bit, one per band) of a signature."""
+    data = signature.astype(_HASH_DTYPE).tobytes()
+    size = ROWS * _HASH_DTYPE.itemsize
+    return [
+        int.from_bytes(blake2b(data[i:i + size], digest_size=8).digest(), "little", signed=True)
+        for i in range(0, len(data), size)
+    ]
+
+
+def similarity(a, b) -> float:
+    """Jaccard similarity of two word sets."""
+    return len(a & b) / len(a | b)
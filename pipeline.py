@@ -0,0 +1,182 @@
+"""Streaming crawl pipeline: fetch -> dedup -> score -> batched write.
+
+Crawler tasks yield posts into a bounded queue as soon as they are
+parsed. A dedup stage drops posts already seen this cycle, a scoring
+stage attaches sentiment (through the sentiment cache), and a writer
+stage inserts posts in batches. Every queue is bounded, so a slow stage
+pushes back on the fetchers instead of letting posts pile up in memory,
+and posts reach the database within PIPELINE_FLUSH_SECONDS of being
+scored.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import config
+import metrics
+import seen_index
+from crawlers.engine import run_crawlers, run_jobs
+from db import insert_posts, save_crawl_run
+from sentiment import score_post
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _dedup_stage(inbox, outbox):
+    seen = set()
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            outbox.put(_DONE)
+            return
+        _, post = item
+        key = (post["source"], post["external_id"])
+        if key not in seen:
+            seen.add(key)
+            outbox.put(item)
+
+
+def _score_stage(inbox, outbox):
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            outbox.put(_DONE)
+            return
+        _, post = item
+        if post.get("sentiment") is None:
+            try:
+                post["sentiment"] = score_post(post.get("title"), post.get("content"))
+            except Exception as e:
+                # Left unscored; backfill_sentiment picks it up later
+                logger.warning("Scoring failed for %s: %s", post.get("external_id"), e)
+        outbox.put(item)
+
+
+def _write_batch(batch):
+    by_result = {}
+    for result, post in batch:
+        by_result.setdefault(id(result), (result, []))[1].append(post)
+    for result, posts in by_result.values():
+        try:
+            result.new += insert_posts(posts)
+            seen_index.get_index().add_many((p["source"], p["external_id"]) for p in posts)
+        except Exception as e:
+            logger.error("Writing %s posts failed: %s", result.crawler.name, e)
+            result.errors.append(e)
+            result.write_failed = True
+
+
+def _write_stage(inbox):
+    batch = []
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            item = inbox.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        if item is not None and item is not _DONE:
+            if not batch:
+                deadline = time.monotonic() + config.PIPELINE_FLUSH_SECONDS
+            batch.append(item)
+        if batch and (
+            item is None or item is _DONE or len(batch) >= config.DB_BATCH_SIZE
+        ):
+            _write_batch(batch)
+            batch = []
+            deadline = None
+        if item is _DONE:
+            return
+
+
+def run_pipeline(crawler_classes):
+    """Crawl, dedupe, score and store posts as a stream.
+
+    Returns one CrawlResult per crawler with fetched/new counts and errors.
+    Crawl cursors are committed only for crawlers whose posts were all
+    written.
+    """
+    return _stream(lambda emit: run_crawlers(crawler_classes, emit), kind="crawl")
+
+
+def run_jobs_pipeline(jobs) -> list:
+    """Like run_pipeline, for prepared (CrawlResult, FetchTask) pairs.
+
+    Returns the results in job order; cursors are committed per result.
+    """
+    results = [result for result, _ in jobs]
+
+    def crawl(emit):
+        run_jobs(jobs, emit)
+        return results
+
+    return _stream(crawl, kind="queue")
+
+
+def _record_run(kind, started_at, duration, results, before):
+    after = metrics.totals()
+    delta = {name: after[name] - before.get(name, 0) for name in after}
+    delta = {name: value for name, value in delta.items() if value}
+    try:
+        save_crawl_run({
+            "kind": kind,
+            "started_at": started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_seconds": duration,
+            "tasks": delta.get("crawler_task_seconds_count", 0),
+            "fetched": sum(result.fetched for result in results),
+            "new_posts": sum(result.new for result in results),
+            "errors": sum(len(result.errors) for result in results),
+            "requests": delta.get("crawler_http_requests_total", 0),
+            "response_bytes": delta.get("crawler_http_response_bytes_total", 0),
+            "fetch_seconds": delta.get("crawler_task_seconds_sum", 0.0),
+            "parse_seconds": delta.get("crawler_parse_seconds_sum", 0.0),
+            "score_seconds": delta.get("crawler_sentiment_seconds_sum", 0.0),
+            "write_seconds": delta.get("crawler_db_write_seconds_sum", 0.0),
+            "metrics": json.dumps(delta, sort_keys=True),
+        })
+    except Exception as e:
+        logger.error("Recording the crawl run failed: %s", e)
+    metrics.flush()
+
+
+def _stream(crawl, kind):
+    """Run ``crawl(emit)`` with the dedup, score and write stages attached.
+
+    A summary of the cycle is saved to crawl_runs and the metrics file.
+    """
+    started_at = datetime.now(timezone.utc)
+    start = time.monotonic()
+    before = metrics.totals()
+
+    # Catch up on posts written since the last run, including by other processes
+    seen_index.get_index().refresh()
+
+    fetched = queue.Queue(config.PIPELINE_QUEUE_SIZE)
+    unique = queue.Queue(config.PIPELINE_QUEUE_SIZE)
+    scored = queue.Queue(config.PIPELINE_QUEUE_SIZE)
+    stages = [
+        threading.Thread(target=_dedup_stage, args=(fetched, unique), name="dedup"),
+        threading.Thread(target=_score_stage, args=(unique, scored), name="score"),
+        threading.Thread(target=_write_stage, args=(scored,), name="writer"),
+    ]
+    for stage in stages:
+        stage.start()
+
+    try:
+        results = crawl(lambda result, post: fetched.put((result, post)))
+    finally:
+        fetched.put(_DONE)
+        for stage in stages:
+            stage.join()
+
+    for result in results:
+        if not result.write_failed:
+            result.crawler.commit_cursors()
+    seen_index.save_snapshot()
+    _record_run(kind, started_at, time.monotonic() - start, results, before)
+    return results
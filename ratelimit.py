@@ -0,0 +1,132 @@
+"""Per-host token-bucket rate limiting shared by all crawlers.
+
+Every outgoing request calls ``acquire(host)`` first and ``report(...)``
+once the response (or failure) is known. Each host has its own bucket and
+lock, so a slow or throttled host never delays requests to another one.
+Buckets adapt to what the host tells us: a 429 or ``Retry-After`` blocks
+the host for the requested time, errors halve the rate, and successes
+grow it back towards the configured ceiling.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket with adaptive rate and an optional block window."""
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.min_rate = rate * config.RATE_LIMIT_MIN_FRACTION
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.updated - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            return wait
+
+    def block(self, seconds: float):
+        """Stop handing out usable tokens for the next ``seconds``."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, now + seconds)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * config.RATE_LIMIT_RECOVERY)
+
+
+class RateLimiter:
+    """Registry of token buckets keyed by host."""
+
+    def __init__(self, limits=None, default=None):
+        self.limits = config.RATE_LIMITS if limits is None else limits
+        self.default = config.DEFAULT_RATE_LIMIT if default is None else default
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.default)
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, host: str):
+        """Block the calling thread until a request to ``host`` may go out."""
+        wait = self.bucket(host).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def report(self, host: str, status=None, headers=None, error=False):
+        """Feed a response status (or a transport error) back into the bucket."""
+        bucket = self.bucket(host)
+        retry_after = _retry_after(headers)
+        if status == 429 or retry_after is not None:
+            seconds = retry_after if retry_after is not None else config.RATE_LIMIT_BACKOFF
+            logger.warning("%s throttled us (HTTP %s); pausing %.1fs", host, status, seconds)
+            bucket.block(seconds)
+            bucket.slow_down()
+        elif error or (status is not None and status >= 500):
+            bucket.slow_down()
+        else:
+            bucket.speed_up()
+
+
+def _retry_after(headers):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not headers:
+        return None
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+limiter = RateLimiter()
+
+
+def acquire(host: str):
+    limiter.acquire(host)
+
+
+def report(host: str, status=None, headers=None, error=False):
+    limiter.report(host, status=status, headers=headers, error=error)
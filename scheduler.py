@@ -1,60 +1,90 @@
 import logging
+import multiprocessing
 
 from apscheduler.schedulers.blocking import BlockingScheduler
 
+import analytics
 import config
 from crawlers import ALL_CRAWLERS
-from db import init_db, insert_posts
-from sentiment import backfill_sentiment
+from cadence import Cadence
+from db import init_db
+from pipeline import run_pipeline
+from taskqueue import run_worker
 
 logger = logging.getLogger(__name__)
 
 
 def run_all_crawlers():
-    """Execute all crawlers and store results."""
+    """Stream all crawlers through dedup, scoring and storage."""
     total = 0
-    for crawler_cls in ALL_CRAWLERS:
-        crawler = crawler_cls()
-        try:
-            posts = crawler.crawl()
-            new_count = insert_posts(posts)
-            total += new_count
-            logger.info(
-                "%s: %d fetched, %d new", crawler.name, len(posts), new_count
-            )
-        except Exception as e:
-            logger.error("Crawler %s failed: %s", crawler.name, e)
+    for result in run_pipeline(ALL_CRAWLERS):
+        crawler = result.crawler
+        for error in result.errors:
+            logger.error("Crawler %s failed: %s", crawler.name, error)
+        total += result.new
+        logger.info(
+            "%s: %d fetched, %d skipped as already stored, %d new",
+            crawler.name, result.fetched, result.skipped, result.new,
+        )
     logger.info("Crawl complete. %d new posts total.", total)
+    return total
 
-    # Auto-score new posts
-    if total > 0:
-        try:
-            scored = backfill_sentiment()
-            logger.info("Auto-scored %d new posts.", scored)
-        except Exception as e:
-            logger.error("Sentiment scoring failed: %s", e)
 
-    return total
+def _local_worker(log_level):
+    # A spawned process starts with no logging configured
+    logging.basicConfig(level=log_level, format=config.LOG_FORMAT)
+    run_worker()
+
+
+def start_local_workers(count):
+    """Start ``count`` worker processes that drain the crawl queue."""
+    # Spawned so each worker starts with its own connections and threads
+    context = multiprocessing.get_context("spawn")
+    log_level = logging.getLogger().getEffectiveLevel()
+    workers = []
+    for i in range(count):
+        process = context.Process(
+            target=_local_worker, args=(log_level,), name=f"crawl-worker-{i}", daemon=True
+        )
+        process.start()
+        workers.append(process)
+    return workers
 
 
 def start_scheduler():
-    """Start the blocking scheduler that runs crawlers on an interval."""
+    """Start the blocking scheduler that enqueues due crawl sources.
+
+    Every CADENCE_TICK_MINUTES the adaptive cadence queues the sources
+    that are due (see cadence.py). The crawling itself is done by queue
+    workers: QUEUE_LOCAL_WORKERS are started here, and more can join from
+    anywhere with `main.py --worker`. Older posts are compacted into the
+    columnar analytics store once a day.
+    """
     init_db()
     logger.info(
-        "Starting scheduler. Crawl interval: %d minutes.",
-        config.CRAWL_INTERVAL_MINUTES,
+        "Starting scheduler. Tick: %d minutes, %d local workers.",
+        config.CADENCE_TICK_MINUTES, config.QUEUE_LOCAL_WORKERS,
     )
+    start_local_workers(config.QUEUE_LOCAL_WORKERS)
 
-    # Run immediately on start
-    run_all_crawlers()
+    cadence = Cadence()
+    # Queue whatever is due immediately on start
+    cadence.tick()
 
     scheduler = BlockingScheduler()
     scheduler.add_job(
-        run_all_crawlers,
+        cadence.tick,
         "interval",
-        minutes=config.CRAWL_INTERVAL_MINUTES,
+        minutes=config.CADENCE_TICK_MINUTES,
         id="nvidia_crawl",
     )
+    scheduler.add_job(
+        analytics.compact,
+        "cron",
+        hour=config.ANALYTICS_COMPACT_HOUR,
+        timezone="UTC",
+        id="analytics_compact",
+    )
 
     try:
         scheduler.start()
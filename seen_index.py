@@ -0,0 +1,175 @@
+"""Compact in-memory index of the posts already stored.
+
+Crawlers consult it with (source, external_id) before doing any per-item
+parsing, so repeats of already-stored items cost one hash lookup instead
+of date parsing, dict building and an ignored INSERT. Keys are 64-bit
+blake2b hashes held in a sorted ``array('Q')`` (8 bytes per post) plus a
+small set of recent additions that is merged in periodically. The index
+is loaded from ``posts`` at startup, optionally warm-started from a
+snapshot file, and caught up incrementally by posts.id.
+
+A snapshot records which database it was taken of (path, device and
+inode) and the key of its newest post. It is ignored if the database has
+been replaced or restored from a backup since, so a stale snapshot
+cannot mark posts that are not stored as seen.
+"""
+import heapq
+import logging
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+import config
+from db import get_post_key, iter_post_keys
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT_MAGIC = b"SEENIDX2"
+# magic, max_id, key count, key of post max_id, st_dev, st_ino, path length
+_SNAPSHOT_HEADER = struct.Struct("<8sQQQQQH")
+
+
+def post_key(source: str, external_id: str) -> int:
+    digest = blake2b(f"{source}\0{external_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _db_identity() -> tuple:
+    path = os.path.realpath(config.DB_PATH)
+    stat = os.stat(path)
+    return path, stat.st_dev, stat.st_ino
+
+
+class SeenIndex:
+    """Set of post keys with sorted-array storage and a recent-additions set."""
+
+    def __init__(self):
+        self._sorted = array("Q")
+        self._recent = set()
+        self._lock = threading.Lock()
+        # Highest posts.id already folded into the index, and its key
+        self.max_id = 0
+        self._max_key = 0
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def contains(self, source: str, external_id: str) -> bool:
+        key = post_key(source, external_id)
+        with self._lock:
+            if key in self._recent:
+                return True
+            i = bisect_left(self._sorted, key)
+            return i < len(self._sorted) and self._sorted[i] == key
+
+    def add_many(self, pairs):
+        """Add (source, external_id) pairs."""
+        with self._lock:
+            self._recent.update(post_key(source, external_id) for source, external_id in pairs)
+            if len(self._recent) > max(65536, len(self._sorted) // 8):
+                self._compact()
+
+    def _compact(self):
+        merged = array("Q")
+        last = None
+        for key in heapq.merge(self._sorted, sorted(self._recent)):
+            if key != last:
+                merged.append(key)
+                last = key
+        self._sorted = merged
+        self._recent = set()
+
+    def refresh(self):
+        """Fold in every post stored since the last refresh."""
+        added = 0
+        for rows in iter_post_keys(self.max_id, config.SEEN_INDEX_LOAD_CHUNK):
+            self.add_many((source, external_id) for _, source, external_id in rows)
+            self.max_id, source, external_id = rows[-1]
+            self._max_key = post_key(source, external_id)
+            added += len(rows)
+        return added
+
+    def save_snapshot(self, path: str):
+        """Write the index to ``path`` atomically."""
+        db_path, dev, inode = _db_identity()
+        db_path = db_path.encode("utf-8")
+        with self._lock:
+            self._compact()
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(_SNAPSHOT_HEADER.pack(
+                    _SNAPSHOT_MAGIC, self.max_id, len(self._sorted), self._max_key,
+                    dev, inode, len(db_path),
+                ))
+                f.write(db_path)
+                self._sorted.tofile(f)
+            os.replace(tmp, path)
+
+    def load_snapshot(self, path: str) -> bool:
+        """Replace the index with a snapshot. Returns False if unusable.
+
+        A snapshot is unusable if it was taken of another database file,
+        or if its newest post is not in the database as recorded: past
+        MAX(id), or with another key, as after a restore from backup.
+        """
+        try:
+            with open(path, "rb") as f:
+                magic, max_id, count, max_key, dev, inode, path_length = (
+                    _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+                )
+                if magic != _SNAPSHOT_MAGIC:
+                    logger.warning("Ignoring seen-index snapshot %s: unknown format", path)
+                    return False
+                db_path = f.read(path_length).decode("utf-8")
+                if (db_path, dev, inode) != _db_identity():
+                    logger.warning(
+                        "Ignoring seen-index snapshot %s: taken of another database (%s)",
+                        path, db_path,
+                    )
+                    return False
+                stored = get_post_key(max_id) if max_id else None
+                if max_id and (stored is None or post_key(*stored) != max_key):
+                    logger.warning(
+                        "Ignoring seen-index snapshot %s: post %d is not in the database "
+                        "as recorded", path, max_id,
+                    )
+                    return False
+                keys = array("Q")
+                keys.fromfile(f, count)
+        except (OSError, EOFError, UnicodeDecodeError, struct.error) as e:
+            logger.warning("Ignoring seen-index snapshot %s: %s", path, e)
+            return False
+        with self._lock:
+            self._sorted = keys
+            self._recent = set()
+            self.max_id = max_id
+            self._max_key = max_key
+        return True
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SeenIndex:
+    """Return the process-wide index, loading it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SeenIndex()
+            path = config.SEEN_INDEX_SNAPSHOT
+            if path and os.path.exists(path) and index.load_snapshot(path):
+                logger.info("Seen index: %d keys from snapshot %s", len(index), path)
+            added = index.refresh()
+            logger.info("Seen index: loaded %d posts, %d keys total", added, len(index))
+            _index = index
+        return _index
+
+
+def save_snapshot():
+    """Persist the process-wide index if a snapshot path is configured."""
+    if config.SEEN_INDEX_SNAPSHOT and _index is not None:
+        _index.save_snapshot(config.SEEN_INDEX_SNAPSHOT)
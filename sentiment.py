@@ -1,66 +1,168 @@
 import logging
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from collections import defaultdict
+from importlib.metadata import version
+from itertools import chain
+
+import config
+import metrics
+import signals
+from db import (
+    DAILY_SENTIMENT_SQL, get_connection, inherit_cluster_sentiment, iter_unscored_posts,
+    update_sentiments,
+)
+from sentiment_cache import SentimentCache, normalize_text, text_key
 
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+logger = logging.getLogger(__name__)
 
-from db import get_connection
+# Bump the suffix when scoring changes so stale cache entries are ignored
+ANALYZER_VERSION = f"vader-nltk-{version('nltk')}-1"
 
-logger = logging.getLogger(__name__)
+cache = SentimentCache(ANALYZER_VERSION)
+
+# nltk and the VADER lexicon take most of a second to load, so the
+# analyzer is built on first use rather than at import
+_sia = None
+_sia_lock = threading.Lock()
 
-# Download VADER lexicon on first import
-try:
-    nltk.data.find("sentiment/vader_lexicon.zip")
-except LookupError:
-    nltk.download("vader_lexicon", quiet=True)
+# Analyzer owned by a backfill worker process
+_worker_sia = None
 
-_sia = SentimentIntensityAnalyzer()
+
+def _load_analyzer():
+    import nltk
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    # Download VADER lexicon on first use
+    try:
+        nltk.data.find("sentiment/vader_lexicon.zip")
+    except LookupError:
+        nltk.download("vader_lexicon", quiet=True)
+    return SentimentIntensityAnalyzer()
 
 
+def get_analyzer():
+    """Return this process's VADER analyzer, loading it on first use."""
+    global _sia
+    with _sia_lock:
+        if _sia is None:
+            _sia = _load_analyzer()
+        return _sia
+
+
+@metrics.SCORE_SECONDS.time(path="stream")
 def score_post(title, content):
     """Run VADER on title+content, return compound score (-1 to +1)."""
-    text = ""
-    if title:
-        text += title
-    if content:
-        text += " " + content
-    text = text.strip()
+    text = normalize_text(title, content)
+    key = text_key(text)
+    score = cache.get(key)
+    if score is None:
+        score = _score_text(get_analyzer(), text)
+        cache.put_many({key: score})
+    metrics.SCORED_POSTS.inc(path="stream")
+    return score
+
+
+def _score_text(analyzer, text):
     if not text:
         return 0.0
-    return _sia.polarity_scores(text)["compound"]
+    return analyzer.polarity_scores(text)["compound"]
 
 
-def backfill_sentiment():
-    """Score all posts where sentiment IS NULL, update the DB."""
-    conn = get_connection()
-    try:
-        rows = conn.execute(
-            "SELECT id, title, content FROM posts WHERE sentiment IS NULL"
-        ).fetchall()
-        if not rows:
+def _init_worker():
+    global _worker_sia
+    _worker_sia = _load_analyzer()
+
+
+def _score_texts(texts):
+    """Score a list of normalized texts; runs in a backfill worker."""
+    analyzer = _worker_sia or get_analyzer()
+    return [_score_text(analyzer, text) for text in texts]
+
+
+class _Chunk:
+    """A chunk of unscored rows split into cached and still-missing texts."""
+
+    def __init__(self, rows):
+        self.rows = []
+        for post_id, title, content in rows:
+            text = normalize_text(title, content)
+            self.rows.append((post_id, text_key(text), text))
+        self.scores = cache.get_many([key for _, key, _ in self.rows])
+        self.missing = {key: text for _, key, text in self.rows if key not in self.scores}
+
+    def finish(self, computed) -> int:
+        """Record scores for the missing texts and write the chunk back."""
+        fresh = dict(zip(self.missing, computed))
+        cache.put_many(fresh)
+        self.scores.update(fresh)
+        return update_sentiments((self.scores[key], post_id) for post_id, key, _ in self.rows)
+
+
+@metrics.SCORE_SECONDS.time(path="backfill")
+def backfill_sentiment(workers=None, chunk_size=None):
+    """Score all posts where sentiment IS NULL, update the DB.
+
+    Unscored rows are streamed in chunks. Texts already in the sentiment
+    cache are resolved directly; the rest are scored across a process
+    pool, with at most two chunks per worker in flight. Backlogs smaller
+    than one chunk are scored in-process. Only cluster representatives are
+    scored; their near-duplicates inherit the score afterwards.
+    """
+    workers = workers or config.SENTIMENT_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or config.SENTIMENT_CHUNK_SIZE
+
+    chunks = iter_unscored_posts(chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        inherited = inherit_cluster_sentiment()
+        if not inherited:
             logger.info("No posts need sentiment scoring.")
-            return 0
-
-        count = 0
-        for row in rows:
-            score = score_post(row["title"], row["content"])
-            conn.execute(
-                "UPDATE posts SET sentiment = ? WHERE id = ?",
-                (score, row["id"]),
-            )
-            count += 1
-
-        conn.commit()
-        logger.info("Backfilled sentiment for %d posts.", count)
-        return count
-    finally:
-        conn.close()
+        return inherited
+
+    count = 0
+    scored = 0
+    chunks = chain([first], chunks)
+    if workers == 1 or len(first) < chunk_size:
+        for rows in chunks:
+            chunk = _Chunk(rows)
+            scored += len(chunk.missing)
+            count += chunk.finish(_score_texts(list(chunk.missing.values())))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for rows in chunks:
+                chunk = _Chunk(rows)
+                scored += len(chunk.missing)
+                pending.append((chunk, pool.submit(_score_texts, list(chunk.missing.values()))))
+                if len(pending) >= workers * 2:
+                    chunk, future = pending.popleft()
+                    count += chunk.finish(future.result())
+            while pending:
+                chunk, future = pending.popleft()
+                count += chunk.finish(future.result())
+    count += inherit_cluster_sentiment()
+    metrics.SCORED_POSTS.inc(count, path="backfill")
+
+    stats = cache.stats()
+    logger.info(
+        "Backfilled sentiment for %d posts; %d unique texts needed scoring. "
+        "Cache since start: %d memory hits, %d db hits, %d misses (%.0f%% hit rate).",
+        count, scored, stats["memory_hits"], stats["db_hits"], stats["misses"],
+        stats["hit_rate"] * 100,
+    )
+    return count
 
 
-def get_daily_sentiment(days=14):
-    """Query posts grouped by date, return avg sentiment per day per source,
-    plus overall weighted avg (weight Reddit by upvotes, news equally).
+def get_daily_sentiment(days=14, ticker=None):
+    """Read the daily_sentiment rollup, return avg sentiment per day per source,
+    plus overall weighted avg (weight Reddit by upvotes, news equally), for
+    one ticker (default: the first in config.TICKERS). Posts count for
+    their primary ticker only, so a post mostly about AMD that also
+    mentions NVDA is not in NVDA's numbers.
 
     Returns list of dicts with keys: date, reddit_avg, news_avg, combined_avg,
     reddit_count, news_count, total_count.
@@ -69,77 +171,55 @@ def get_daily_sentiment(days=14):
     conn = get_connection()
     try:
         rows = conn.execute(
-            """SELECT date(published_at) as day, source,
-                      CAST(sentiment AS REAL) as sentiment,
-                      COALESCE(score, 1) as weight
-               FROM posts
-               WHERE sentiment IS NOT NULL
-                 AND published_at >= ?
-               ORDER BY day""",
-            (cutoff,),
+            DAILY_SENTIMENT_SQL, (ticker or config.TICKERS[0], cutoff)
         ).fetchall()
     finally:
         conn.close()
 
-    # Group by day
+    # Fold every non-reddit source into the news bucket
     days_data = defaultdict(lambda: {
-        "reddit_scores": [], "reddit_weights": [],
-        "news_scores": [], "news_weights": [],
+        "reddit": [0.0, 0.0, 0],
+        "news": [0.0, 0.0, 0],
     })
-
     for row in rows:
-        day = row["day"]
-        sentiment = row["sentiment"]
-        weight = max(row["weight"], 1)
-        source = row["source"]
-
-        if source == "reddit":
-            days_data[day]["reddit_scores"].append(sentiment)
-            days_data[day]["reddit_weights"].append(weight)
-        else:
-            days_data[day]["news_scores"].append(sentiment)
-            days_data[day]["news_weights"].append(1)
+        bucket = days_data[row["day"]]["reddit" if row["source"] == "reddit" else "news"]
+        bucket[0] += row["weighted_sum"]
+        bucket[1] += row["weight_total"]
+        bucket[2] += row["post_count"]
 
     result = []
     for day in sorted(days_data.keys()):
-        d = days_data[day]
-        reddit_avg = _weighted_avg(d["reddit_scores"], d["reddit_weights"])
-        news_avg = _weighted_avg(d["news_scores"], d["news_weights"])
-
-        # Combined: weighted average of all sources
-        all_scores = d["reddit_scores"] + d["news_scores"]
-        all_weights = d["reddit_weights"] + d["news_weights"]
-        combined_avg = _weighted_avg(all_scores, all_weights)
-
+        reddit_sum, reddit_weight, reddit_count = days_data[day]["reddit"]
+        news_sum, news_weight, news_count = days_data[day]["news"]
         result.append({
             "date": day,
-            "reddit_avg": reddit_avg,
-            "news_avg": news_avg,
-            "combined_avg": combined_avg,
-            "reddit_count": len(d["reddit_scores"]),
-            "news_count": len(d["news_scores"]),
-            "total_count": len(all_scores),
+            "reddit_avg": _ratio(reddit_sum, reddit_weight),
+            "news_avg": _ratio(news_sum, news_weight),
+            "combined_avg": _ratio(reddit_sum + news_sum, reddit_weight + news_weight),
+            "reddit_count": reddit_count,
+            "news_count": news_count,
+            "total_count": reddit_count + news_count,
         })
 
     return result
 
 
-def _weighted_avg(values, weights):
-    """Compute weighted average. Returns 0.0 if no values."""
-    if not values:
-        return 0.0
-    total_weight = sum(weights)
-    if total_weight == 0:
+def _ratio(weighted_sum, weight_total):
+    """Weighted average from its sum and total weight. Returns 0.0 if empty."""
+    if not weight_total:
         return 0.0
-    return sum(v * w for v, w in zip(values, weights)) / total_weight
+    return weighted_sum / weight_total
 
 
-def predict_trend():
-    """Analyze recent sentiment data and produce a prediction.
+def predict_trend(days=14, ticker=None):
+    """Analyze recent sentiment data for a ticker and produce a prediction.
+
+    ``days`` is how much daily history to load; the comparison is always
+    the last 7 days against everything before them in that window.
 
     Returns dict with: direction, confidence, summary, daily_scores.
     """
-    daily = get_daily_sentiment(days=14)
+    daily = get_daily_sentiment(days=days, ticker=ticker)
 
     if len(daily) < 2:
         return {
@@ -149,51 +229,17 @@ def predict_trend():
             "daily_scores": daily,
         }
 
-    # Split into this week (last 7 days) and prior week
-    today = datetime.utcnow().strftime("%Y-%m-%d")
-    week_ago = (datetime.utcnow() - timedelta(days=7)).strftime("%Y-%m-%d")
-
-    this_week = [d for d in daily if d["date"] >= week_ago]
-    last_week = [d for d in daily if d["date"] < week_ago]
-
-    # Averages
-    this_week_avg = _avg([d["combined_avg"] for d in this_week]) if this_week else 0.0
-    last_week_avg = _avg([d["combined_avg"] for d in last_week]) if last_week else 0.0
-
-    # Momentum
-    momentum = this_week_avg - last_week_avg
-
-    # Volume trend
-    this_week_count = sum(d["total_count"] for d in this_week)
-    last_week_count = sum(d["total_count"] for d in last_week)
-    volume_ratio = this_week_count / max(last_week_count, 1)
-
-    # Engagement-weighted score (this week)
-    engagement = this_week_avg  # already weighted by upvotes in get_daily_sentiment
-
-    # Direction
-    if momentum > 0.05 and engagement > 0.05:
-        direction = "Bullish"
-    elif momentum < -0.05 and engagement < -0.05:
-        direction = "Bearish"
-    else:
-        direction = "Neutral"
-
-    # Confidence (1-10)
-    abs_momentum = abs(momentum)
-    # Source agreement: do reddit and news agree on direction?
-    reddit_avgs = [d["reddit_avg"] for d in this_week if d["reddit_count"] > 0]
-    news_avgs = [d["news_avg"] for d in this_week if d["news_count"] > 0]
-    reddit_dir = _avg(reddit_avgs) if reddit_avgs else 0.0
-    news_dir = _avg(news_avgs) if news_avgs else 0.0
-    agreement = 1.0 if (reddit_dir >= 0) == (news_dir >= 0) else 0.5
-
-    confidence = min(10, max(1, int(
-        abs_momentum * 20 +
-        min(volume_ratio, 3) * 1.5 +
-        agreement * 2 +
-        min(this_week_count, 50) * 0.05
-    )))
+    # Compare the last 7 days with everything before them in the window
+    today = datetime.utcnow().date()
+    series = signals.from_daily(daily, start=today - timedelta(days=days), end=today)
+    latest = signals.latest(signals.compute(series, window=7, lookback=days))
+    this_week_avg, last_week_avg = latest["recent_avg"], latest["baseline_avg"]
+    momentum = latest["momentum"]
+    volume_ratio = latest["volume_ratio"]
+    this_week_count, last_week_count = latest["recent_count"], latest["baseline_count"]
+    reddit_dir, news_dir = latest["reddit_dir"], latest["news_dir"]
+    direction = {1: "Bullish", -1: "Bearish", 0: "Neutral"}[latest["direction"]]
+    confidence = latest["confidence"]
 
     # Summary
     vol_desc = "rising" if volume_ratio > 1.2 else "falling" if volume_ratio < 0.8 else "steady"
@@ -212,9 +258,3 @@ def predict_trend():
         "daily_scores": daily,
     }
 
-
-def _avg(values):
-    """Simple average."""
-    if not values:
-        return 0.0
-    return sum(values) / len(values)
@@ -0,0 +1,96 @@
+"""Content-hash cache for sentiment scores.
+
+Scores are keyed by a hash of the normalized post text plus the analyzer
+version, so the same headline syndicated across feeds or cross-posted
+between subreddits is only scored once, and a lexicon upgrade invalidates
+old entries. Lookups go to an in-memory LRU first, then to the
+``sentiment_cache`` table.
+"""
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import config
+from db import get_cached_sentiments, save_cached_sentiments
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(title, content) -> str:
+    """Join title and content the way they are scored, minus layout noise.
+
+    Case and punctuation are kept because VADER scores them.
+    """
+    text = f"{title or ''} {content or ''}"
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SentimentCache:
+    """Two-level (memory LRU, then SQLite) cache of sentiment scores."""
+
+    def __init__(self, version: str, max_size=None):
+        self.version = version
+        self.max_size = max_size or config.SENTIMENT_CACHE_SIZE
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get_many(self, keys) -> dict:
+        """Return {key: score} for every key that is cached."""
+        found = {}
+        remaining = []
+        with self._lock:
+            for key in set(keys):
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                else:
+                    remaining.append(key)
+            self.memory_hits += len(found)
+
+        if remaining:
+            stored = get_cached_sentiments(remaining, self.version)
+            with self._lock:
+                self.db_hits += len(stored)
+                self.misses += len(remaining) - len(stored)
+                self._remember(stored)
+            found.update(stored)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, scores: dict):
+        """Store freshly computed {key: score} entries in both levels."""
+        if not scores:
+            return
+        with self._lock:
+            self._remember(scores)
+        save_cached_sentiments(scores.items(), self.version)
+
+    def _remember(self, scores):
+        self._lru.update(scores)
+        for key in scores:
+            self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            hits = self.memory_hits + self.db_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,261 @@
+"""Trend signals over daily sentiment, computed for every day at once.
+
+A series is a dict of NumPy arrays over consecutive calendar days:
+"day" (datetime64[D]), "combined", "reddit" and "news" (weighted average
+sentiment, 0.0 on days without posts) and "reddit_count", "news_count"
+and "total_count". Build one from get_daily_sentiment() rows with
+from_daily(), or from the whole history with load().
+
+compute() evaluates the prediction rule as of each day in one pass. It
+compares the recent window (the last ``window`` days up to and including
+the day) with the days before it back to ``lookback``, using running sums
+instead of per-day loops. backtest() then scores those calls against
+what happened over the following days (by default, to sentiment itself;
+pass prices for a market backtest), so parameters can be swept over
+years of history in milliseconds.
+"""
+import numpy as np
+
+WINDOW_DAYS = 7
+LOOKBACK_DAYS = 14
+EWMA_SPAN_DAYS = 7
+THRESHOLD = 0.05
+
+
+def _calendar(days, values: dict, start=None, end=None) -> dict:
+    """Spread per-day ``values`` over every calendar day from start to end."""
+    days = np.asarray(days, dtype="datetime64[D]")
+    start = np.datetime64(start, "D") if start is not None else (days.min() if len(days) else None)
+    end = np.datetime64(end, "D") if end is not None else (days.max() if len(days) else start)
+    if start is None:
+        calendar = np.empty(0, dtype="datetime64[D]")
+    else:
+        calendar = np.arange(start, end + 1, dtype="datetime64[D]")
+    index = (days - calendar[0]).astype(np.int64) if len(calendar) else np.empty(0, np.int64)
+    inside = (index >= 0) & (index < len(calendar))
+
+    series = {"day": calendar}
+    for name, column in values.items():
+        column = np.asarray(column)
+        dense = np.zeros(len(calendar), dtype=np.int64 if name.endswith("_count") else np.float64)
+        dense[index[inside]] = column[inside]
+        series[name] = dense
+    series["total_count"] = series["reddit_count"] + series["news_count"]
+    return series
+
+
+def from_daily(daily, start=None, end=None) -> dict:
+    """Build a series from get_daily_sentiment() rows, between start and end if given."""
+    return _calendar(
+        [row["date"] for row in daily],
+        {
+            "combined": [row["combined_avg"] for row in daily],
+            "reddit": [row["reddit_avg"] for row in daily],
+            "news": [row["news_avg"] for row in daily],
+            "reddit_count": [row["reddit_count"] for row in daily],
+            "news_count": [row["news_count"] for row in daily],
+        },
+        start, end,
+    )
+
+
+def _average(weighted_sum, weight):
+    return np.divide(weighted_sum, weight, out=np.zeros_like(weighted_sum), where=weight > 0)
+
+
+def load(ticker=None, since=None, until=None, end=None) -> dict:
+    """Build a series for ``ticker`` from the columnar store and recent posts.
+
+    ``end`` extends the calendar, e.g. to today, past the last day with posts.
+    """
+    import analytics
+
+    daily = analytics.daily_series(since, until, ticker)
+    since = since[:10] if isinstance(since, str) else since
+    weight = daily["reddit_weight"] + daily["news_weight"]
+    return _calendar(
+        daily["day"],
+        {
+            "combined": _average(daily["reddit_sum"] + daily["news_sum"], weight),
+            "reddit": _average(daily["reddit_sum"], daily["reddit_weight"]),
+            "news": _average(daily["news_sum"], daily["news_weight"]),
+            "reddit_count": daily["reddit_count"],
+            "news_count": daily["news_count"],
+        },
+        since, end,
+    )
+
+
+def _window_sum(values, first, last):
+    """For every day t, the sum of values from day t - first to day t - last.
+
+    Offsets may be negative to look ahead; the span is clipped to the series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    running = np.concatenate(([0.0], np.cumsum(values)))
+    t = np.arange(n)
+    start = np.clip(t - first, 0, n)
+    stop = np.clip(t - last + 1, 0, n)
+    return running[stop] - running[np.minimum(start, stop)]
+
+
+def _window_mean(values, mask, first, last):
+    """Mean of values over the days in the span where ``mask`` holds, and how many there were."""
+    days = _window_sum(mask, first, last)
+    total = _window_sum(np.where(mask, values, 0.0), first, last)
+    return _average(total, days), days
+
+
+def _ewma(values, mask, span):
+    """Exponentially weighted average of values on the days where ``mask`` holds."""
+    alpha = 2 / (span + 1)
+    out = np.zeros(len(values))
+    level = None
+    for i in np.flatnonzero(mask):
+        level = values[i] if level is None else alpha * values[i] + (1 - alpha) * level
+        out[i] = level
+    # Carry the level over days without posts
+    filled = np.maximum.accumulate(np.where(mask, np.arange(len(values)), -1))
+    return np.where(filled >= 0, out[np.maximum(filled, 0)], 0.0)
+
+
+def compute(series, window=WINDOW_DAYS, lookback=LOOKBACK_DAYS, threshold=THRESHOLD,
+            ewma_span=EWMA_SPAN_DAYS) -> dict:
+    """Evaluate the trend rule as of every day in ``series``.
+
+    The recent window is the days from t - window to t, the baseline the
+    days from t - lookback to t - window - 1. Returns arrays aligned on
+    "day": recent_avg, baseline_avg, momentum, ewma, recent_count,
+    baseline_count, volume_ratio, volume_z, reddit_dir, news_dir,
+    agreement, direction (1 bullish, -1 bearish, 0 neutral) and
+    confidence (1-10).
+    """
+    recent, baseline = (window, 0), (lookback, window + 1)
+    present = series["total_count"] > 0
+    counts = series["total_count"].astype(np.float64)
+
+    recent_avg, recent_days = _window_mean(series["combined"], present, *recent)
+    baseline_avg, baseline_days = _window_mean(series["combined"], present, *baseline)
+    momentum = recent_avg - baseline_avg
+
+    recent_count = _window_sum(counts, *recent)
+    baseline_count = _window_sum(counts, *baseline)
+    volume_ratio = recent_count / np.maximum(baseline_count, 1)
+
+    # Recent daily volume in standard deviations of the baseline's
+    ones = np.ones(len(counts))
+    recent_length = _window_sum(ones, *recent)
+    baseline_length = _window_sum(ones, *baseline)
+    baseline_mean = _average(baseline_count, baseline_length)
+    baseline_var = _average(_window_sum(counts ** 2, *baseline), baseline_length) - baseline_mean ** 2
+    baseline_std = np.sqrt(np.maximum(baseline_var, 0.0))
+    volume_z = _average(_average(recent_count, recent_length) - baseline_mean, baseline_std)
+
+    # Source agreement: do reddit and news lean the same way?
+    reddit_dir, _ = _window_mean(series["reddit"], series["reddit_count"] > 0, *recent)
+    news_dir, _ = _window_mean(series["news"], series["news_count"] > 0, *recent)
+    agreement = np.where((reddit_dir >= 0) == (news_dir >= 0), 1.0, 0.5)
+
+    # Momentum and the recent (engagement-weighted) level must agree
+    direction = np.where(
+        (momentum > threshold) & (recent_avg > threshold), 1,
+        np.where((momentum < -threshold) & (recent_avg < -threshold), -1, 0),
+    )
+    confidence = np.clip((
+        np.abs(momentum) * 20
+        + np.minimum(volume_ratio, 3) * 1.5
+        + agreement * 2
+        + np.minimum(recent_count, 50) * 0.05
+    ).astype(np.int64), 1, 10)
+
+    # Fewer than two days with posts: no call
+    enough = recent_days + baseline_days >= 2
+    direction = np.where(enough, direction, 0)
+    confidence = np.where(enough, confidence, 1)
+
+    return {
+        "day": series["day"],
+        "recent_avg": recent_avg,
+        "baseline_avg": baseline_avg,
+        "momentum": momentum,
+        "ewma": _ewma(series["combined"], present, ewma_span),
+        "recent_count": recent_count.astype(np.int64),
+        "baseline_count": baseline_count.astype(np.int64),
+        "volume_ratio": volume_ratio,
+        "volume_z": volume_z,
+        "reddit_dir": reddit_dir,
+        "news_dir": news_dir,
+        "agreement": agreement,
+        "enough": enough,
+        "direction": direction,
+        "confidence": confidence,
+    }
+
+
+def latest(signals) -> dict:
+    """The signals as of the last day, as Python scalars."""
+    return {name: values[-1].item() for name, values in signals.items()}
+
+
+def backtest(series, horizon=7, outcome=None, min_confidence=1, **params) -> dict:
+    """Score the rule's calls on every day against the following ``horizon`` days.
+
+    ``outcome`` is an array aligned with series["day"] whose sign is what
+    a call should have predicted, e.g. forward price returns. Without one
+    this is only a sentiment-persistence check: the outcome is average
+    sentiment over the next ``horizon`` days minus the recent window's
+    average, i.e. whether sentiment kept moving the way it was called.
+    ``params`` go to compute(). Days without a call, below
+    ``min_confidence``, or without an outcome are skipped.
+
+    Returns calls, hits, hit_rate, mean_outcome (signed by the call's
+    direction) and by_confidence ({confidence: (calls, hit_rate)}).
+    """
+    signals = compute(series, **params)
+    if outcome is None:
+        present = series["total_count"] > 0
+        future_avg, future_days = _window_mean(series["combined"], present, -1, -horizon)
+        outcome = np.where(future_days > 0, future_avg - signals["recent_avg"], np.nan)
+    outcome = np.asarray(outcome, dtype=np.float64)
+
+    called = (
+        (signals["direction"] != 0)
+        & (signals["confidence"] >= min_confidence)
+        & ~np.isnan(outcome)
+    )
+    direction = signals["direction"][called]
+    confidence = signals["confidence"][called]
+    signed = direction * outcome[called]
+    hits = signed > 0
+
+    by_confidence = {}
+    for level in np.unique(confidence):
+        at_level = confidence == level
+        by_confidence[int(level)] = (int(at_level.sum()), float(hits[at_level].mean()))
+    return {
+        "calls": int(called.sum()),
+        "hits": int(hits.sum()),
+        "hit_rate": float(hits.mean()) if len(hits) else 0.0,
+        "mean_outcome": float(signed.mean()) if len(signed) else 0.0,
+        "by_confidence": by_confidence,
+    }
+
+
+def sweep(series, windows=(3, 5, 7, 10, 14), lookback_factors=(2, 3, 4),
+          thresholds=(0.02, 0.05, 0.1), horizon=7, outcome=None, min_calls=10) -> list:
+    """Backtest every combination of parameters, best hit rate first.
+
+    The lookback is each window times each factor. Combinations making
+    fewer than ``min_calls`` calls are left out.
+    """
+    results = []
+    for window in windows:
+        for factor in lookback_factors:
+            for threshold in thresholds:
+                params = {"window": window, "lookback": window * factor, "threshold": threshold}
+                result = backtest(series, horizon, outcome, **params)
+                if result["calls"] >= min_calls:
+                    results.append({**params, **result})
+    results.sort(key=lambda r: (r["hit_rate"], r["calls"]), reverse=True)
+    return results
@@ -0,0 +1,337 @@
+"""Durable crawl task queue and the worker loop that drains it.
+
+The scheduler enqueues one task per crawler fetch (a subreddit and query,
+a feed, a search term). Workers, in any number of processes or on any
+number of machines sharing the backend, claim batches of tasks under a
+lease, run them through the crawl pipeline, and report each one done or
+failed. Failed tasks are retried with exponential backoff; a task whose
+worker dies is claimed again once its lease expires.
+
+Backends implement QueueBackend and are registered in BACKENDS;
+``config.QUEUE_BACKEND`` picks one. SQLiteQueue suits a single host.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+import config
+from crawlers import ALL_CRAWLERS
+from crawlers.base import FetchTask
+from crawlers.engine import CrawlResult
+from db import record_source_fetch
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedTask(NamedTuple):
+    """A claimed task: ``crawler``'s FetchTask plus its queue bookkeeping."""
+
+    id: int
+    crawler: str
+    host: str
+    method: str
+    args: tuple
+    attempts: int
+
+
+class QueueBackend(ABC):
+    """Storage for crawl tasks."""
+
+    @abstractmethod
+    def enqueue(self, tasks) -> int:
+        """Add (crawler name, FetchTask) pairs, skipping any already queued.
+
+        Returns the number added.
+        """
+
+    @abstractmethod
+    def claim(self, worker: str, limit: int, lease_seconds: float) -> list[QueuedTask]:
+        """Lease up to ``limit`` tasks that are due to ``worker``."""
+
+    @abstractmethod
+    def renew(self, task_ids, worker: str, lease_seconds: float):
+        """Extend ``worker``'s leases on ``task_ids`` to ``lease_seconds`` from now."""
+
+    @abstractmethod
+    def complete(self, task_id: int, worker: str):
+        """Mark a leased task done."""
+
+    @abstractmethod
+    def fail(self, task_id: int, worker: str, error: str):
+        """Release a leased task for a retry later, or give up on it."""
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """Return {status: number of tasks}."""
+
+
+def source_key(crawler: str, method: str, args) -> tuple:
+    """Key identifying one crawl source: (crawler, method, args as JSON)."""
+    return crawler, method, json.dumps(list(args))
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before retrying a task that has failed ``attempts`` times."""
+    return config.QUEUE_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+
+
+class SQLiteQueue(QueueBackend):
+    """Queue stored in a crawl_tasks table.
+
+    Claims are a single UPDATE ... RETURNING, so concurrent workers never
+    lease the same task. A partial unique index keeps a task from being
+    queued twice while an earlier copy is still pending or running.
+    """
+
+    def __init__(self, path=None):
+        self._conn = sqlite3.connect(
+            path or config.QUEUE_DB_PATH, check_same_thread=False, timeout=30
+        )
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS crawl_tasks (
+                       id INTEGER PRIMARY KEY,
+                       crawler TEXT NOT NULL,
+                       host TEXT NOT NULL,
+                       method TEXT NOT NULL,
+                       args TEXT NOT NULL,
+                       status TEXT NOT NULL DEFAULT 'pending',
+                       attempts INTEGER NOT NULL DEFAULT 0,
+                       available_at REAL NOT NULL,
+                       lease_owner TEXT,
+                       lease_expires REAL,
+                       last_error TEXT,
+                       created_at REAL NOT NULL,
+                       finished_at REAL
+                   );
+                   CREATE UNIQUE INDEX IF NOT EXISTS idx_crawl_tasks_active
+                       ON crawl_tasks(crawler, method, args)
+                       WHERE status IN ('pending', 'leased');
+                   CREATE INDEX IF NOT EXISTS idx_crawl_tasks_due
+                       ON crawl_tasks(status, available_at);"""
+            )
+
+    def enqueue(self, tasks) -> int:
+        now = time.time()
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO crawl_tasks
+                       (crawler, host, method, args, available_at, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (crawler, task.host, task.method, json.dumps(list(task.args)), now, now)
+                    for crawler, task in tasks
+                ],
+            )
+            added = self._conn.total_changes - before
+            self._conn.execute(
+                "DELETE FROM crawl_tasks WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (now - config.QUEUE_RETENTION_HOURS * 3600,),
+            )
+        return added
+
+    def claim(self, worker, limit, lease_seconds) -> list[QueuedTask]:
+        now = time.time()
+        with self._lock, self._conn:
+            # A task that keeps killing its worker is given up on, not re-leased
+            self._conn.execute(
+                """UPDATE crawl_tasks
+                   SET status = 'failed', finished_at = ?, lease_owner = NULL,
+                       last_error = 'lease expired'
+                   WHERE status = 'leased' AND lease_expires <= ? AND attempts >= ?""",
+                (now, now, config.QUEUE_MAX_ATTEMPTS),
+            )
+            rows = self._conn.execute(
+                """UPDATE crawl_tasks
+                   SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                       attempts = attempts + 1
+                   WHERE id IN (
+                       SELECT id FROM crawl_tasks
+                       WHERE status = 'pending' AND available_at <= ?
+                       UNION ALL
+                       SELECT id FROM crawl_tasks
+                       WHERE status = 'leased' AND lease_expires <= ?
+                       LIMIT ?)
+                   RETURNING id, crawler, host, method, args, attempts""",
+                (worker, now + lease_seconds, now, now, limit),
+            ).fetchall()
+        return [
+            QueuedTask(task_id, crawler, host, method, tuple(json.loads(args)), attempts)
+            for task_id, crawler, host, method, args, attempts in rows
+        ]
+
+    def renew(self, task_ids, worker, lease_seconds):
+        expires = time.time() + lease_seconds
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """UPDATE crawl_tasks SET lease_expires = ?
+                   WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                [(expires, task_id, worker) for task_id in task_ids],
+            )
+
+    def complete(self, task_id, worker):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE crawl_tasks
+                   SET status = 'done', finished_at = ?, lease_owner = NULL, last_error = NULL
+                   WHERE id = ? AND lease_owner = ?""",
+                (time.time(), task_id, worker),
+            )
+
+    def fail(self, task_id, worker, error):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT attempts FROM crawl_tasks WHERE id = ? AND lease_owner = ?",
+                (task_id, worker),
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            if attempts >= config.QUEUE_MAX_ATTEMPTS:
+                self._conn.execute(
+                    """UPDATE crawl_tasks
+                       SET status = 'failed', finished_at = ?, lease_owner = NULL,
+                           last_error = ?
+                       WHERE id = ?""",
+                    (now, error, task_id),
+                )
+            else:
+                self._conn.execute(
+                    """UPDATE crawl_tasks
+                       SET status = 'pending', available_at = ?, lease_owner = NULL,
+                           lease_expires = NULL, last_error = ?
+                       WHERE id = ?""",
+                    (now + retry_delay(attempts), error, task_id),
+                )
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM crawl_tasks GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+BACKENDS = {
+    "sqlite": SQLiteQueue,
+}
+
+
+def get_queue() -> QueueBackend:
+    """Open the queue backend named by config.QUEUE_BACKEND."""
+    return BACKENDS[config.QUEUE_BACKEND]()
+
+
+def list_crawl_tasks() -> list:
+    """Return (crawler name, FetchTask) for every fetch of every crawler."""
+    tasks = []
+    for crawler_cls in ALL_CRAWLERS:
+        try:
+            tasks.extend((crawler_cls.name, task) for task in crawler_cls().tasks())
+        except Exception as e:
+            logger.error("Could not list %s tasks: %s", crawler_cls.name, e)
+    return tasks
+
+
+def enqueue_crawl(queue=None, tasks=None) -> int:
+    """Queue ``tasks``, by default one per fetch of every crawler.
+
+    Returns the number added.
+    """
+    queue = queue or get_queue()
+    if tasks is None:
+        tasks = list_crawl_tasks()
+    added = queue.enqueue(tasks)
+    logger.info("Enqueued %d of %d crawl tasks; queue: %s", added, len(tasks), queue.counts())
+    return added
+
+
+def _renew_leases(queue, worker, task_ids, stop):
+    """Keep the leases on ``task_ids`` alive until ``stop`` is set."""
+    interval = config.QUEUE_LEASE_SECONDS / 3
+    while not stop.wait(interval):
+        try:
+            queue.renew(task_ids, worker, config.QUEUE_LEASE_SECONDS)
+        except Exception as e:
+            logger.warning("Renewing leases of worker %s failed: %s", worker, e)
+
+
+def run_worker(worker=None, once=False, queue=None):
+    """Claim and run crawl tasks until stopped.
+
+    Each batch of claimed tasks runs through the crawl pipeline together,
+    concurrently per host. A task is reported done once its posts are
+    stored and its cursors committed, and failed if it raised, hit a
+    fetch error its crawler recovered from, or its posts could not be
+    written; completed tasks feed their source's yield estimate for the
+    adaptive cadence. Leases are renewed for as long as the batch runs.
+    With ``once``, returns when the queue has nothing due.
+    """
+    from pipeline import run_jobs_pipeline
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = queue or get_queue()
+    crawlers = {crawler_cls.name: crawler_cls for crawler_cls in ALL_CRAWLERS}
+    logger.info("Worker %s started.", worker)
+
+    while True:
+        claimed = queue.claim(worker, config.QUEUE_CLAIM_BATCH, config.QUEUE_LEASE_SECONDS)
+        if not claimed:
+            if once:
+                return
+            time.sleep(config.QUEUE_POLL_SECONDS)
+            continue
+
+        jobs = []
+        for task in claimed:
+            crawler_cls = crawlers.get(task.crawler)
+            if crawler_cls is None:
+                queue.fail(task.id, worker, f"unknown crawler {task.crawler!r}")
+                continue
+            fetch = FetchTask(task.host, task.method, task.args)
+            jobs.append((task, (CrawlResult(crawler_cls()), fetch)))
+
+        # A batch can outlast one lease; renew it so no other worker re-runs it
+        stop = threading.Event()
+        renewer = threading.Thread(
+            target=_renew_leases,
+            args=(queue, worker, [task.id for task, _ in jobs], stop),
+            name="lease-renewer", daemon=True,
+        )
+        renewer.start()
+        try:
+            run_jobs_pipeline([job for _, job in jobs])
+        finally:
+            stop.set()
+            renewer.join()
+
+        for task, (result, _) in jobs:
+            if result.errors or result.write_failed:
+                error = "; ".join(map(str, result.errors)) or "write failed"
+                logger.warning(
+                    "Task %d %s.%s%s failed (attempt %d): %s",
+                    task.id, task.crawler, task.method, task.args, task.attempts, error,
+                )
+                queue.fail(task.id, worker, error)
+            else:
+                queue.complete(task.id, worker)
+                record_source_fetch(
+                    source_key(task.crawler, task.method, task.args), result.new, time.time(),
+                    prior_hours=config.CRAWL_INTERVAL_MINUTES / 60,
+                    alpha=config.CADENCE_EWMA_ALPHA,
+                )
+                logger.info(
+                    "Task %d %s.%s%s: %d fetched, %d skipped, %d new",
+                    task.id, task.crawler, task.method, task.args,
+                    result.fetched, result.skipped, result.new,
+                )
@@ -0,0 +1,46 @@
+import pytest
+
+import config
+import db
+from benchmarks.bench_db import make_posts
+
+
+@pytest.fixture
+def plans_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "plans.db"))
+    db.close_writer()
+    db.init_db()
+    yield
+    db.close_writer()
+
+
+def test_hot_queries_use_indexes_on_a_fresh_database(plans_db):
+    assert db.find_full_scans() == {}
+
+
+def test_hot_queries_use_indexes_with_statistics(plans_db):
+    # ANALYZE over a few thousand posts gives the planner realistic statistics
+    posts = make_posts(3000)
+    for i, post in enumerate(posts):
+        if i % 10:
+            post["sentiment"] = 0.1
+    db.insert_posts(posts)
+    conn = db.get_connection()
+    try:
+        conn.execute("ANALYZE")
+        assert db.find_full_scans(conn) == {}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("step", ["SCAN posts", "SCAN TABLE posts", "USE TEMP B-TREE FOR ORDER BY"])
+def test_full_scan_steps_are_recognized(step):
+    assert db._FULL_SCAN.search(step)
+
+
+@pytest.mark.parametrize("step", [
+    "SEARCH posts USING INDEX idx_posts_unscored (sentiment=? AND rowid>?)",
+    "SCAN posts USING INDEX idx_posts_published_source",
+])
+def test_index_steps_are_not_full_scans(step):
+    assert not db._FULL_SCAN.search(step)
@@ -0,0 +1,46 @@
+import pytest
+
+import config
+import db
+
+
+@pytest.fixture
+def posts_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "search.db"))
+    db.close_writer()
+    db.init_db()
+    db.insert_posts([
+        {
+            "source": "news",
+            "external_id": "1",
+            "title": "NVIDIA ships the H-200",
+            "content": "AI-chips demand keeps growing, nvidia: record quarter",
+            "published_at": "2024-01-02 00:00:00",
+        },
+        {
+            "source": "reddit",
+            "external_id": "2",
+            "title": "AMD earnings",
+            "content": "MI300 outlook",
+            "published_at": "2024-01-03 00:00:00",
+        },
+    ])
+    yield
+    db.close_writer()
+
+
+@pytest.mark.parametrize("query", ["H-200", "AI-chips", "nvidia:", '"H-200 nvidia'])
+def test_non_fts_input_is_searched_as_words(posts_db, query):
+    rows = db.search_posts(query)
+    assert [row["title"] for row in rows] == ["NVIDIA ships the H-200"]
+
+
+@pytest.mark.parametrize("query", ['"unbalanced', "", "   "])
+def test_non_fts_input_without_matches_returns_nothing(posts_db, query):
+    assert db.search_posts(query) == []
+
+
+def test_fts_syntax_still_works(posts_db):
+    assert len(db.search_posts("nvidia OR amd")) == 2
+    assert len(db.search_posts('"earnings" NOT nvidia')) == 1
+    assert len(db.search_posts("nvid*", source="news")) == 1